@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Порівняння бекендів парсингу HTML (html.parser vs lxml) на реальних сторінках:
+перевіряє, що текст і посилання однакові, та вимірює швидкість.
+
+Використання:
+    python scripts/benchmark_parsers.py https://example.com/ page.html ...
+"""
+
+import os
+import sys
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import requests
+
+from shared.html_parser import PARSER_BACKENDS, parse_page
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+def load_page(source: str) -> tuple:
+    """Завантажує сторінку за URL або читає локальний файл"""
+    if source.startswith(('http://', 'https://')):
+        response = requests.get(source, headers=HEADERS, timeout=30)
+        return source, response.text
+    
+    with open(source, encoding='utf-8', errors='replace') as f:
+        return f"file://{os.path.abspath(source)}", f.read()
+
+def main(sources: list, rounds: int = 5):
+    timings = {backend: 0.0 for backend in PARSER_BACKENDS}
+    mismatches = 0
+    
+    for source in sources:
+        try:
+            url, html = load_page(source)
+        except Exception as e:
+            print(f"❌ {source}: {e}")
+            continue
+        
+        domain = urlparse(url).netloc.replace('www.', '')
+        results = {}
+        
+        for backend in PARSER_BACKENDS:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                results[backend] = parse_page(html, url, domain, backend=backend)
+            timings[backend] += (time.perf_counter() - start) / rounds
+        
+        reference = results['html.parser']
+        same = all(result == reference for result in results.values())
+        if not same:
+            mismatches += 1
+        
+        links, text, _ = reference
+        print(f"{'✅' if same else '⚠️'} {source}: {len(html)} байт, {len(links)} посилань, {len(text)} символів тексту")
+    
+    print()
+    for backend, total in timings.items():
+        speedup = timings['html.parser'] / total if total else 0
+        print(f"{backend:12} {total:8.3f}с  x{speedup:.1f}")
+    print(f"Розбіжностей: {mismatches}/{len(sources)}")
+    
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(main(sys.argv[1:]))
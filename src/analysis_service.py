@@ -9,35 +9,155 @@ import os
 import sys
 sys.path.append('/app')
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, HttpUrl, Field
 from typing import List, Dict, Optional
 import asyncio
 import aiohttp
-from bs4 import BeautifulSoup
-from openai import OpenAI
-import re
+from openai import AsyncOpenAI
 from urllib.parse import urljoin, urlparse
 import json
 import time
+import hashlib
 from dataclasses import dataclass, asdict
 import pandas as pd
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 from collections import defaultdict
 import uuid
+import itertools
 from datetime import datetime
 
 # Локальні імпорти
 from shared.logger import setup_logger
 from shared.database import db_manager
 from shared.redis_client import analysis_redis, analysis_cache
-from shared.utils import generate_task_id, clean_url, ProgressTracker
+from shared.keyword_matcher import KeywordMatcher, extract_snippet
+from shared.html_parser import decode_html, filter_links, parse_page, get_parse_executor, shutdown_parse_executor, PARSE_WORKERS
+from shared.frontier import CrawlFrontier, VisitedSet
+from shared.http_session import get_http_session, close_http_session, get_http_pool_stats
+from shared.rate_limiter import HostRateLimiter, CircuitOpenError, RETRY_STATUSES
+from shared.simhash import NearDuplicateIndex
+from shared.distributed_crawl import DistributedCrawl, REPLICA_ID
+from shared.job_queue import JobQueue
+from shared.task_events import TaskEvents
+from shared.task_store import TaskStore, FINAL_STATUSES
+from shared.sitemap import fetch_robots, iter_sitemap_urls
+from shared.utils import generate_task_id, canonicalize_url, url_key, ProgressTracker, get_env_int, get_env_float, get_env_bool
 
 # Налаштування логування
 logger = setup_logger('analysis_service')
 
+# Налаштування краулера
+CRAWL_CONCURRENCY = get_env_int('MAX_WORKERS', 5)
+CRAWL_PER_HOST_LIMIT = get_env_int('CRAWL_PER_HOST_LIMIT', 5)
+CRAWL_HOST_DELAY = get_env_float('CRAWL_HOST_DELAY', 0.1)
+
+# Адаптивна пауза між запитами до хоста (до CRAWL_MAX_HOST_DELAY с), повтори тимчасових
+# помилок та вимкнення хоста після CRAWL_FAILURE_THRESHOLD збоїв поспіль
+CRAWL_MAX_RETRIES = get_env_int('CRAWL_MAX_RETRIES', 2)
+CRAWL_MAX_HOST_DELAY = get_env_float('CRAWL_MAX_HOST_DELAY', 30.0)
+CRAWL_TARGET_LATENCY = get_env_float('CRAWL_TARGET_LATENCY', 2.0)
+CRAWL_FAILURE_THRESHOLD = get_env_int('CRAWL_FAILURE_THRESHOLD', 5)
+CRAWL_CIRCUIT_COOLDOWN = get_env_float('CRAWL_CIRCUIT_COOLDOWN', 60.0)
+
+# Кількість контекстів для кожного ключового слова на сторінці
+CONTEXT_SNIPPETS = get_env_int('CONTEXT_SNIPPETS', 1)
+
+# Розмір черг між етапами конвеєра завантаження -> парсинг -> пошук
+PIPELINE_QUEUE_SIZE = get_env_int('PIPELINE_QUEUE_SIZE', 20)
+
+# Скільки релевантних сторінок і скільки символів з кожної передаємо в ШІ аналіз
+AI_PAGES_LIMIT = 10
+AI_PREVIEW_CHARS = 1500
+
+# Запити до OpenAI: таймаут (с), кількість повторів та одночасних запитів на процес
+AI_REQUEST_TIMEOUT = get_env_float('AI_REQUEST_TIMEOUT', 60.0)
+AI_MAX_RETRIES = get_env_int('AI_MAX_RETRIES', 3)
+AI_CONCURRENCY = get_env_int('AI_CONCURRENCY', 3)
+ai_semaphore = asyncio.Semaphore(max(1, AI_CONCURRENCY))
+
+# Кеш відповідей ШІ: час життя та максимальна кількість записів
+LLM_CACHE_TTL_HOURS = get_env_int('LLM_CACHE_TTL_HOURS', 168)
+LLM_CACHE_MAX_ENTRIES = get_env_int('LLM_CACHE_MAX_ENTRIES', 1000)
+
+# HTTP кеш сторінок з умовними запитами (ETag / Last-Modified)
+HTTP_CACHE_ENABLED = get_env_bool('HTTP_CACHE_ENABLED', True)
+HTTP_CACHE_TTL_HOURS = get_env_int('HTTP_CACHE_TTL_HOURS', 72)
+
+# Час життя збережених збігів сторінки (за хешем її тексту) для інкрементального аналізу
+PAGE_MATCHES_TTL_HOURS = get_env_int('PAGE_MATCHES_TTL_HOURS', 168)
+
+# Обмеження відповіді: лише HTML і не більше PAGE_MAX_BYTES байт
+PAGE_MAX_BYTES = get_env_int('PAGE_MAX_BYTES', 5 * 1024 * 1024)
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+# Майже однакові сторінки (SimHash) перевіряються до пошуку слів: flag - шукати, але не
+# враховувати збіги, що повторюють схожу сторінку; skip - не шукати й не враховувати
+# (швидше, але сторінку з іншим брендом у тому ж шаблоні буде пропущено); off - вимкнено.
+# Яка зі схожих сторінок вважається оригіналом - залежить від порядку завантаження
+NEAR_DUPLICATE_MODE = os.getenv('NEAR_DUPLICATE_MODE', 'flag').lower()
+NEAR_DUPLICATE_MAX_DISTANCE = get_env_int('NEAR_DUPLICATE_MAX_DISTANCE', 3)
+NEAR_DUPLICATE_REPORT_LIMIT = 100
+
+# Скільки посилань (у max_links) знаходимо, щоб вибрати з них найкращі для завантаження
+FRONTIER_DISCOVERY_FACTOR = get_env_int('FRONTIER_DISCOVERY_FACTOR', 10)
+
+# robots.txt (Disallow, Crawl-delay) та sitemap для початкового наповнення черги
+ROBOTS_TXT_ENABLED = get_env_bool('ROBOTS_TXT_ENABLED', True)
+MAX_CRAWL_DELAY = get_env_float('MAX_CRAWL_DELAY', 10.0)
+SITEMAP_ENABLED = get_env_bool('SITEMAP_ENABLED', True)
+SITEMAP_MAX_FILES = get_env_int('SITEMAP_MAX_FILES', 20)
+SITEMAP_TIMEOUT = get_env_float('SITEMAP_TIMEOUT', 30.0)
+# Скільки адрес з sitemap додається в чергу разом
+SITEMAP_BATCH_SIZE = 100
+
+# Контрольні точки краулу в Redis: незавершений аналіз продовжується після перезапуску сервісу
+CRAWL_CHECKPOINT_ENABLED = get_env_bool('CRAWL_CHECKPOINT_ENABLED', True)
+CRAWL_CHECKPOINT_INTERVAL = get_env_float('CRAWL_CHECKPOINT_INTERVAL', 30.0)
+CRAWL_CHECKPOINT_TTL_HOURS = get_env_int('CRAWL_CHECKPOINT_TTL_HOURS', 24)
+# Процес, що виконує аналіз, продовжує оренду його контрольної точки кожну третину
+# CRAWL_CHECKPOINT_LEASE_SECONDS; аналіз без продовженої оренди відновлює інший процес
+CRAWL_CHECKPOINT_LEASE_SECONDS = get_env_int('CRAWL_CHECKPOINT_LEASE_SECONDS', 90)
+
+# Розподілений краул: черга та відвідані сторінки в Redis, інші репліки допомагають
+# завантажувати той самий сайт; результати реплік об'єднуються координатором
+DISTRIBUTED_CRAWL_ENABLED = get_env_bool('DISTRIBUTED_CRAWL_ENABLED', False)
+DISTRIBUTED_POLL_INTERVAL = get_env_float('DISTRIBUTED_POLL_INTERVAL', 2.0)
+DISTRIBUTED_MERGE_TIMEOUT = get_env_float('DISTRIBUTED_MERGE_TIMEOUT', 30.0)
+# Скільки краулів інших реплік процес допомагає завантажувати одночасно
+DISTRIBUTED_MAX_JOINED = get_env_int('DISTRIBUTED_MAX_JOINED', 2)
+
+# Черга аналізів у Redis: API лише ставить задачі, виконують їх окремі воркери (analysis_worker.py).
+# Задача, не підтверджена за ANALYSIS_JOB_VISIBILITY_TIMEOUT секунд, видається іншому воркеру
+ANALYSIS_QUEUE_ENABLED = get_env_bool('ANALYSIS_QUEUE_ENABLED', False)
+ANALYSIS_JOB_VISIBILITY_TIMEOUT = get_env_float('ANALYSIS_JOB_VISIBILITY_TIMEOUT', 300.0)
+ANALYSIS_JOB_MAX_ATTEMPTS = get_env_int('ANALYSIS_JOB_MAX_ATTEMPTS', 3)
+ANALYSIS_WORKER_CONCURRENCY = get_env_int('ANALYSIS_WORKER_CONCURRENCY', 2)
+ANALYSIS_QUEUE_POLL_INTERVAL = get_env_float('ANALYSIS_QUEUE_POLL_INTERVAL', 1.0)
+ANALYSIS_RESULT_TTL_HOURS = get_env_int('ANALYSIS_RESULT_TTL_HOURS', 24)
+
+# Стан задач спільний для всіх процесів (Redis + PostgreSQL), тож API можна запускати
+# в кількох процесах uvicorn; локальний кеш прочитаних статусів, результатів та
+# відсутніх задач (секунди)
+ANALYSIS_API_WORKERS = get_env_int('ANALYSIS_API_WORKERS', 1)
+TASK_STORE_DATABASE_ENABLED = get_env_bool('TASK_STORE_DATABASE_ENABLED', True)
+TASK_STATE_CACHE_SECONDS = get_env_float('TASK_STATE_CACHE_SECONDS', 2.0)
+TASK_RESULT_CACHE_SECONDS = get_env_float('TASK_RESULT_CACHE_SECONDS', 300.0)
+TASK_MISSING_CACHE_SECONDS = get_env_float('TASK_MISSING_CACHE_SECONDS', 1.0)
+
+# Межі кешу задач у пам'яті процесу (LRU); стан, не збережений ні в Redis, ні в БД,
+# при витісненні записується у файли TASK_SPILL_DIR (порожнє значення - не записується)
+TASK_CACHE_MAX_MB = get_env_int('TASK_CACHE_MAX_MB', 64)
+TASK_CACHE_MAX_ENTRIES = get_env_int('TASK_CACHE_MAX_ENTRIES', 1000)
+TASK_SPILL_DIR = os.getenv('TASK_SPILL_DIR', 'data/task_spill')
+
+# Потоки прогресу задач (Server-Sent Events): як часто публікується кількість сторінок
+# під час краулу та пауза між keep-alive коментарями (секунди)
+TASK_PROGRESS_INTERVAL = get_env_float('TASK_PROGRESS_INTERVAL', 2.0)
+SSE_KEEPALIVE_SECONDS = get_env_float('SSE_KEEPALIVE_SECONDS', 15.0)
+
 # Pydantic моделі для API
 class AnalysisRequest(BaseModel):
     site_url: HttpUrl = Field(..., description="URL сайту для аналізу")
@@ -54,6 +174,7 @@ class AnalysisStatus(BaseModel):
     message: str
     started_at: datetime
     completed_at: Optional[datetime] = None
+    pages_fetched: int = 0
 
 class KeywordMatch(BaseModel):
     keyword: str
@@ -89,261 +210,233 @@ class SimpleAnalysisResult:
     pages_with_forbidden: List[str]
     detailed_stats: Dict
 
-class AsyncPartnerSiteAnalyzer:
-    def __init__(self, openai_api_key: str = None, max_workers: int = 5):
-        """
-        Ініціалізація асинхронного аналізатора
-        """
-        self.openai_api_key = openai_api_key
-        if openai_api_key:
-            self.client = OpenAI(api_key=openai_api_key)
-        else:
-            self.client = None
-            
-        self.max_workers = max_workers
-        self.lock = threading.Lock()
+class MatchAggregator:
+    """
+    Інкрементальний пошук ключових слів: сторінки додаються по одній, зберігаються
+    лише компактні записи збігів та початок кількох релевантних сторінок для ШІ аналізу
+    """
+    
+    def __init__(self, keywords: List[str], forbidden_words: List[str], context_snippets: int = 1,
+                 near_duplicate_mode: str = 'off', near_duplicate_distance: int = 3):
+        self.keywords = list(keywords)
+        self.forbidden_words = list(forbidden_words)
+        self.context_snippets = max(1, context_snippets)
         
-        # Налаштування сесії
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+        # Один автомат на всі позитивні та заборонені слова
+        self.matcher = KeywordMatcher(self.keywords + self.forbidden_words)
         
-    async def find_all_links(self, base_url: str, max_links: int = 300) -> set:
+        self.pages_analyzed = 0
+        self.page_matches: Dict[str, List[dict]] = defaultdict(list)
+        self.relevant_pages: Dict[str, str] = {}
+        
+        # Майже однакові сторінки (SimHash) перевіряються до пошуку слів: "skip" - не шукаються
+        # і не враховуються; "flag" - шукаються, але збіги, що повторюють схожу сторінку
+        # (те саме слово з тією ж кількістю), не враховуються
+        self.near_duplicate_mode = near_duplicate_mode
+        self.near_duplicates = NearDuplicateIndex(near_duplicate_distance) if near_duplicate_mode in ('skip', 'flag') else None
+        # Кількість збігів кожного слова на сторінках, доданих в індекс
+        self.near_duplicate_matches: Dict[str, Dict[str, int]] = {}
+        self.near_duplicate_pages: List[dict] = []
+        self.near_duplicate_count = 0
+        self.near_duplicate_skipped = 0
+        self.near_duplicate_matches_dropped = 0
+        self.fingerprint_seconds = 0.0
+        # Час пошуку слів - для оцінки часу, заощадженого пропущеними сторінками
+        self.match_seconds = 0.0
+        self.pages_matched = 0
+    
+    @property
+    def fingerprint(self) -> str:
+        """Відбиток налаштувань пошуку: збіги сторінки можна повторно використати лише з тим самим"""
+        payload = json.dumps([self.keywords, self.forbidden_words, self.context_snippets], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+    
+    def add_page(self, url: str, content: str, matches: Optional[Dict[str, dict]] = None) -> Optional[Dict[str, dict]]:
         """
-        Асинхронно знаходить всі посилання на сайті
+        Шукає всі слова на сторінці за один прохід. Готові записи збігів (збережені
+        для того ж тексту) додаються без повторного пошуку. Повертає записи збігів
+        або None, якщо сторінку пропущено як майже однакову з уже доданою (режим skip).
         """
-        logger.info(f"🔍 Шукаємо посилання на {base_url}")
+        duplicate_of = None
+        if self.near_duplicates is not None:
+            started = time.perf_counter()
+            duplicate_of = self.near_duplicates.check(url, content)
+            self.fingerprint_seconds += time.perf_counter() - started
+            
+            if duplicate_of is not None:
+                self.near_duplicate_count += 1
+                if len(self.near_duplicate_pages) < NEAR_DUPLICATE_REPORT_LIMIT:
+                    self.near_duplicate_pages.append({'url': url, 'duplicate_of': duplicate_of})
+                if self.near_duplicate_mode == 'skip':
+                    self.near_duplicate_skipped += 1
+                    return None
         
-        domain = urlparse(base_url).netloc.replace('www.', '')
-        found_links = set()
-        links_to_check = {base_url}
-        checked_links = set()
+        if matches is None:
+            started = time.perf_counter()
+            matches = self._match_page(content)
+            self.match_seconds += time.perf_counter() - started
+            self.pages_matched += 1
         
-        # Додаємо варіанти головної сторінки
-        variations = [
-            f"https://{domain}",
-            f"https://www.{domain}",
-            f"http://{domain}",
-            f"http://www.{domain}"
-        ]
-        links_to_check.update(variations)
+        counts = {keyword: record['count'] for keyword, record in matches.items()}
+        if duplicate_of is None:
+            if self.near_duplicates is not None:
+                self.near_duplicate_matches[url] = counts
+            counted = matches
+        else:
+            # Шаблонний текст схожої сторінки вже враховано - лишаємо лише нові збіги (напр. інший бренд)
+            original = self.near_duplicate_matches.get(duplicate_of, {})
+            counted = {keyword: record for keyword, record in matches.items()
+                       if original.get(keyword) != record['count']}
+            self.near_duplicate_matches_dropped += len(matches) - len(counted)
         
-        async with aiohttp.ClientSession(headers=self.headers) as session:
-            while links_to_check and len(found_links) < max_links:
-                current_url = links_to_check.pop()
-                
-                if current_url in checked_links:
-                    continue
-                    
-                checked_links.add(current_url)
-                
-                try:
-                    logger.info(f"📄 Сканую: {current_url}")
-                    async with session.get(current_url, timeout=10) as response:
-                        if response.status == 200:
-                            content = await response.text()
-                            soup = BeautifulSoup(content, 'html.parser')
-                            
-                            # Знаходимо всі посилання
-                            for link in soup.find_all('a', href=True):
-                                href = link['href']
-                                full_url = urljoin(current_url, href)
-                                parsed_url = urlparse(full_url)
-                                
-                                # Перевіряємо чи посилання з того ж домену
-                                if (parsed_url.netloc.endswith(domain) or 
-                                    parsed_url.netloc == domain or
-                                    parsed_url.netloc == f"www.{domain}"):
-                                    
-                                    # Фільтруємо небажані посилання
-                                    if not any(skip in full_url.lower() for skip in 
-                                             ['#', 'javascript:', 'mailto:', 'tel:', '.pdf', '.jpg', 
-                                              '.png', '.gif', '.zip', '.rar', '.exe', '.doc', '.docx', 
-                                              '.xls', '.xlsx', 'wp-admin', 'wp-content']):
-                                        
-                                        # Очищуємо URL
-                                        clean_url_result = clean_url(full_url)
-                                        
-                                        if clean_url_result and clean_url_result not in found_links:
-                                            found_links.add(clean_url_result)
-                                            
-                                            # Додаємо до перевірки важливі сторінки
-                                            if any(keyword in clean_url_result.lower() for keyword in 
-                                                  ['product', 'catalog', 'category', 'товар', 'каталог', 
-                                                   'категор', 'новин', 'news', 'about', 'contact']):
-                                                if clean_url_result not in checked_links:
-                                                    links_to_check.add(clean_url_result)
-                    
-                    await asyncio.sleep(0.5)  # Пауза між запитами
-                    
-                except Exception as e:
-                    logger.error(f"❌ Помилка при сканування {current_url}: {e}")
-                    continue
+        self.pages_analyzed += 1
+        for keyword, record in counted.items():
+            self.page_matches[keyword].append({'url': url, **record})
         
-        logger.info(f"✅ Знайдено {len(found_links)} унікальних посилань")
-        return found_links
+        if counted:
+            self._keep_relevant_page(url, content)
+        
+        return matches
     
-    async def scrape_page_content(self, session: aiohttp.ClientSession, url: str) -> tuple:
-        """
-        Асинхронно скрапить контент однієї сторінки
-        """
-        try:
-            async with session.get(url, timeout=15) as response:
-                if response.status == 200:
-                    content = await response.text()
-                    soup = BeautifulSoup(content, 'html.parser')
-                    
-                    # Видаляємо непотрібні елементи
-                    for element in soup(['script', 'style', 'nav', 'footer', 'header', 'aside']):
-                        element.decompose()
-                    
-                    # Витягуємо текст
-                    text_content = soup.get_text(separator=' ', strip=True)
-                    text_content = re.sub(r'\s+', ' ', text_content)
-                    
-                    # Фільтруємо дуже короткі сторінки
-                    if len(text_content) < 100:
-                        return None, None
-                    
-                    logger.info(f"✅ Отримано: {url} ({len(text_content)} символів)")
-                    return url, text_content
-                    
-        except Exception as e:
-            logger.error(f"❌ Помилка {url}: {e}")
-            
-        return None, None
+    def get_state(self) -> dict:
+        """Проміжні результати для контрольної точки краулу"""
+        return {
+            'fingerprint': self.fingerprint,
+            'pages_analyzed': self.pages_analyzed,
+            'page_matches': self.page_matches,
+            'relevant_pages': self.relevant_pages,
+            'near_duplicates': self.near_duplicates.get_state() if self.near_duplicates is not None else None,
+            'near_duplicate_matches': self.near_duplicate_matches,
+            'near_duplicate_pages': self.near_duplicate_pages,
+            'near_duplicate_count': self.near_duplicate_count,
+            'near_duplicate_skipped': self.near_duplicate_skipped,
+            'near_duplicate_matches_dropped': self.near_duplicate_matches_dropped,
+            'fingerprint_seconds': self.fingerprint_seconds,
+            'match_seconds': self.match_seconds,
+            'pages_matched': self.pages_matched
+        }
     
-    async def scrape_all_pages(self, links: set, max_time_minutes: int = 20) -> dict:
+    def load_state(self, state: dict) -> bool:
+        """Відновлює проміжні результати; стан з іншими налаштуваннями пошуку не приймається"""
+        if state.get('fingerprint') != self.fingerprint:
+            return False
+        
+        self.pages_analyzed = state['pages_analyzed']
+        self.page_matches = defaultdict(list, state['page_matches'])
+        self.relevant_pages = dict(state['relevant_pages'])
+        if self.near_duplicates is not None and state['near_duplicates']:
+            self.near_duplicates.load_state(state['near_duplicates'])
+        self.near_duplicate_matches = dict(state.get('near_duplicate_matches', {}))
+        self.near_duplicate_pages = list(state['near_duplicate_pages'])
+        self.near_duplicate_count = state['near_duplicate_count']
+        self.near_duplicate_skipped = state.get('near_duplicate_skipped', 0)
+        self.near_duplicate_matches_dropped = state.get('near_duplicate_matches_dropped', 0)
+        self.fingerprint_seconds = state['fingerprint_seconds']
+        self.match_seconds = state.get('match_seconds', 0.0)
+        self.pages_matched = state.get('pages_matched', 0)
+        return True
+    
+    def merge_state(self, state: dict) -> bool:
         """
-        Асинхронно скрапить всі сторінки
+        Додає проміжні результати іншої репліки розподіленого краулу. Майже однакові
+        сторінки виявляються в межах кожної репліки окремо
         """
-        start_time = time.time()
-        max_time_seconds = max_time_minutes * 60
+        if state.get('fingerprint') != self.fingerprint:
+            return False
         
-        logger.info(f"📥 Завантажуємо контент з {len(links)} сторінок...")
+        self.pages_analyzed += state['pages_analyzed']
+        for keyword, entries in state['page_matches'].items():
+            self.page_matches[keyword].extend(entries)
+        for url, preview in state['relevant_pages'].items():
+            self._keep_relevant_page(url, preview)
         
-        pages_content = {}
+        room = NEAR_DUPLICATE_REPORT_LIMIT - len(self.near_duplicate_pages)
+        self.near_duplicate_pages.extend(state['near_duplicate_pages'][:max(0, room)])
+        self.near_duplicate_count += state['near_duplicate_count']
+        self.near_duplicate_skipped += state.get('near_duplicate_skipped', 0)
+        self.near_duplicate_matches_dropped += state.get('near_duplicate_matches_dropped', 0)
+        self.fingerprint_seconds += state['fingerprint_seconds']
+        self.match_seconds += state.get('match_seconds', 0.0)
+        self.pages_matched += state.get('pages_matched', 0)
+        return True
+    
+    def _match_page(self, content: str) -> Dict[str, dict]:
+        """Записи збігів сторінки: кількість та контекст для кожного знайденого слова"""
+        matches = {}
         
-        async with aiohttp.ClientSession(headers=self.headers) as session:
-            tasks = []
-            for url in links:
-                if time.time() - start_time > max_time_seconds:
-                    break
-                task = asyncio.create_task(self.scrape_page_content(session, url))
-                tasks.append(task)
-            
-            completed = 0
-            for task in asyncio.as_completed(tasks):
-                if time.time() - start_time > max_time_seconds:
-                    logger.info("⏰ Досягнуто ліміт часу!")
-                    break
-                
-                url, content = await task
-                if url and content:
-                    pages_content[url] = content
-                
-                completed += 1
-                if completed % 20 == 0:
-                    logger.info(f"📊 Оброблено {completed}/{len(links)} сторінок")
+        for keyword, spans in self.matcher.find_all(content).items():
+            snippets = [extract_snippet(content, start, end, 200)
+                        for start, end in spans[:self.context_snippets]]
+            record = {
+                'count': len(spans),
+                'context': snippets[0]
+            }
+            if self.context_snippets > 1:
+                record['snippets'] = snippets
+            matches[keyword] = record
         
-        logger.info(f"✅ Завантажено контент з {len(pages_content)} сторінок")
-        return pages_content
+        return matches
     
-    def search_keywords_static(self, pages_content: dict, 
-                              keywords: List[str], forbidden_words: List[str]) -> tuple:
+    def _keep_relevant_page(self, url: str, content: str):
         """
-        Статичний пошук ключових слів з детальною статистикою
+        Зберігає початок сторінки для ШІ аналізу. Лишаємо AI_PAGES_LIMIT сторінок з
+        найменшими URL, щоб вибір не залежав від порядку завантаження
         """
-        logger.info("🔍 Статичний пошук ключових слів...")
+        if len(self.relevant_pages) >= AI_PAGES_LIMIT:
+            largest_url = max(self.relevant_pages)
+            if url >= largest_url:
+                return
+            del self.relevant_pages[largest_url]
         
-        keyword_data = []
-        forbidden_data = []
-        
-        # Детальна статистика по ключових словах
-        keyword_stats = {}
-        found_keywords = set()
+        self.relevant_pages[url] = content[:AI_PREVIEW_CHARS]
+    
+    def _collect(self, words: List[str], word_column: str) -> tuple:
+        """Статистика та рядки таблиці для групи слів"""
+        stats = {}
+        rows = []
+        found = set()
         
-        # Пошук ключових слів
-        for keyword in keywords:
-            keyword_stats[keyword] = {
+        for word in words:
+            stats[word] = {
                 'total_mentions': 0,
                 'pages_found': [],
                 'contexts': []
             }
             
-            for url, content in pages_content.items():
-                pattern = re.compile(re.escape(keyword), re.IGNORECASE)
-                matches = pattern.findall(content)
+            # Порядок сторінок за URL, а не за часом завантаження - результат відтворюваний
+            for page_entry in sorted(self.page_matches.get(word, []), key=lambda entry: entry['url']):
+                found.add(word)
                 
-                if matches:
-                    count = len(matches)
-                    context = self._extract_context(content, keyword, 200)
-                    found_keywords.add(keyword)
-                    
-                    # Оновлюємо статистику
-                    keyword_stats[keyword]['total_mentions'] += count
-                    keyword_stats[keyword]['pages_found'].append({
-                        'url': url,
-                        'count': count,
-                        'context': context
-                    })
-                    keyword_stats[keyword]['contexts'].append(context)
-                    
-                    keyword_data.append({
-                        'Ключове слово': keyword,
-                        'URL': url,
-                        'Кількість згадок': count,
-                        'Контекст': context
-                    })
-        
-        # Детальна статистика по забороненим словам
-        forbidden_stats = {}
-        found_forbidden = set()
-        
-        # Пошук заборонених слів
-        for forbidden_word in forbidden_words:
-            forbidden_stats[forbidden_word] = {
-                'total_mentions': 0,
-                'pages_found': [],
-                'contexts': []
-            }
-            
-            for url, content in pages_content.items():
-                pattern = re.compile(re.escape(forbidden_word), re.IGNORECASE)
-                matches = pattern.findall(content)
+                # Оновлюємо статистику
+                stats[word]['total_mentions'] += page_entry['count']
+                stats[word]['pages_found'].append(dict(page_entry))
+                stats[word]['contexts'].append(page_entry['context'])
                 
-                if matches:
-                    count = len(matches)
-                    context = self._extract_context(content, forbidden_word, 200)
-                    found_forbidden.add(forbidden_word)
-                    
-                    # Оновлюємо статистику
-                    forbidden_stats[forbidden_word]['total_mentions'] += count
-                    forbidden_stats[forbidden_word]['pages_found'].append({
-                        'url': url,
-                        'count': count,
-                        'context': context
-                    })
-                    forbidden_stats[forbidden_word]['contexts'].append(context)
-                    
-                    forbidden_data.append({
-                        'Заборонене слово': forbidden_word,
-                        'URL': url,
-                        'Кількість згадок': count,
-                        'Контекст': context
-                    })
+                rows.append({
+                    word_column: word,
+                    'URL': page_entry['url'],
+                    'Кількість згадок': page_entry['count'],
+                    'Контекст': page_entry['context']
+                })
+        
+        return stats, rows, found
+    
+    def finalize(self) -> tuple:
+        """Формує таблиці збігів та детальну статистику"""
+        keyword_stats, keyword_data, found_keywords = self._collect(self.keywords, 'Ключове слово')
+        forbidden_stats, forbidden_data, found_forbidden = self._collect(self.forbidden_words, 'Заборонене слово')
         
         # Визначаємо незнайдені слова
-        not_found_keywords = [kw for kw in keywords if kw not in found_keywords]
-        not_found_forbidden = [fw for fw in forbidden_words if fw not in found_forbidden]
+        not_found_keywords = [kw for kw in self.keywords if kw not in found_keywords]
+        not_found_forbidden = [fw for fw in self.forbidden_words if fw not in found_forbidden]
         
         keyword_df = pd.DataFrame(keyword_data)
         forbidden_df = pd.DataFrame(forbidden_data)
         
         logger.info(f"✅ Знайдено {len(keyword_df)} згадок ключових слів")
         logger.info(f"⚠️ Знайдено {len(forbidden_df)} згадок заборонених слів")
-        logger.info(f"📊 Ключових слів знайдено: {len(found_keywords)}/{len(keywords)}")
-        logger.info(f"📊 Заборонених слів знайдено: {len(found_forbidden)}/{len(forbidden_words)}")
+        logger.info(f"📊 Ключових слів знайдено: {len(found_keywords)}/{len(self.keywords)}")
+        logger.info(f"📊 Заборонених слів знайдено: {len(found_forbidden)}/{len(self.forbidden_words)}")
         
         if not_found_keywords:
             logger.info(f"❌ Не знайдено ключових слів: {', '.join(not_found_keywords)}")
@@ -357,41 +450,686 @@ class AsyncPartnerSiteAnalyzer:
             'not_found_keywords': not_found_keywords,
             'not_found_forbidden': not_found_forbidden,
             'summary': {
-                'total_keywords': len(keywords),
+                'total_keywords': len(self.keywords),
                 'found_keywords': len(found_keywords),
                 'not_found_keywords': len(not_found_keywords),
-                'total_forbidden': len(forbidden_words),
+                'total_forbidden': len(self.forbidden_words),
                 'found_forbidden': len(found_forbidden),
                 'not_found_forbidden': len(not_found_forbidden)
             }
         }
         
+        if self.near_duplicates is not None:
+            detailed_stats['near_duplicates'] = self._near_duplicate_stats()
+            if self.near_duplicate_count:
+                logger.info(f"🧬 Майже однакових сторінок: {self.near_duplicate_count} ({self.near_duplicate_mode})")
+        
         return keyword_df, forbidden_df, detailed_stats
     
-    def _extract_context(self, text: str, keyword: str, context_length: int = 200) -> str:
-        """Витягує контекст навколо ключового слова"""
-        pattern = re.compile(re.escape(keyword), re.IGNORECASE)
-        match = pattern.search(text)
+    def _near_duplicate_stats(self) -> dict:
+        """
+        Скільки сторінок виявлено як майже однакові, скільки з них не шукалось (skip)
+        і скільки часу це заощадило (за середнім часом пошуку на сторінку) проти
+        часу на відбитки; скільки повторених збігів не враховано (flag)
+        """
+        match_seconds_per_page = self.match_seconds / self.pages_matched if self.pages_matched else 0.0
+        return {
+            'mode': self.near_duplicate_mode,
+            'max_distance': self.near_duplicates.max_distance,
+            'pages_detected': self.near_duplicate_count,
+            'pages_skipped': self.near_duplicate_skipped,
+            'matches_dropped': self.near_duplicate_matches_dropped,
+            'match_seconds_saved': round(self.near_duplicate_skipped * match_seconds_per_page, 4),
+            'fingerprint_seconds': round(self.fingerprint_seconds, 4),
+            'pages': self.near_duplicate_pages
+        }
+
+class AsyncPartnerSiteAnalyzer:
+    def __init__(self, openai_api_key: str = None, max_workers: int = CRAWL_CONCURRENCY,
+                 per_host_limit: int = CRAWL_PER_HOST_LIMIT, per_host_delay: float = CRAWL_HOST_DELAY,
+                 context_snippets: int = CONTEXT_SNIPPETS):
+        """
+        Ініціалізація асинхронного аналізатора
+        
+        max_workers - кількість паралельних воркерів краулера,
+        per_host_limit / per_host_delay - ліміт одночасних запитів та пауза між запитами до одного хоста,
+        context_snippets - скільки контекстів зберігати для кожного слова на сторінці
+        """
+        self.openai_api_key = openai_api_key
+        if openai_api_key:
+            # Асинхронний клієнт не блокує event loop; SDK сам повторює запити
+            # при 429/5xx/таймаутах з експоненційною затримкою
+            self.client = AsyncOpenAI(
+                api_key=openai_api_key,
+                timeout=AI_REQUEST_TIMEOUT,
+                max_retries=AI_MAX_RETRIES
+            )
+        else:
+            self.client = None
+            
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.per_host_delay = per_host_delay
+        self.context_snippets = max(1, context_snippets)
+        
+        # Лічильники краулу для detailed_stats
+        self.crawl_stats: Dict[str, int] = defaultdict(int)
+        self.lock = threading.Lock()
+    
+    async def _crawl(self, base_url: str, max_links: int, sink, max_time_minutes: int = None,
+                     keywords: List[str] = (), checkpoint_id: str = None,
+                     distributed: DistributedCrawl = None, progress=None) -> set:
+        """
+        Потоковий конвеєр завантаження -> парсинг (у пулі PARSE_EXECUTOR) -> обробка тексту.
+        
+        Пул з max_workers воркерів завантажує сторінки зі спільної черги і передає HTML
+        в обмежену чергу парсингу; розібраний текст іде в обмежену чергу, з якої
+        sink.add_page(url, text) обробляє сторінки одразу по мірі надходження. Заповнена
+        черга пригальмовує попередній етап, тож у пам'яті одночасно лише кілька сторінок.
+        
+        Сторінки з ETag/Last-Modified кешуються (HTTP_CACHE_ENABLED) разом із посиланнями
+        та текстом; при наступному краулі відповідь 304 пропускає завантаження і парсинг.
+        Збіги ключових слів зберігаються за хешем тексту сторінки та відбитком sink,
+        тож повторний пошук виконується лише для сторінок, текст яких змінився.
+        
+        Перед краулом читається robots.txt (заборонені шляхи не скануються, Crawl-delay
+        збільшує паузу між запитами), а сторінки з sitemap (включно з індексами та gzip)
+        додаються в чергу паралельно з краулом.
+        
+        Усі адреси канонізуються (canonicalize_url, <link rel="canonical">): варіанти
+        http/https, www., кінцевого слеша та перша сторінка пагінації (/page/1)
+        завантажуються й враховуються як одна сторінка.
+        
+        Черга - CrawlFrontier: першими завантажуються неглибокі сторінки каталогу/товарів
+        та посилання, в тексті або URL яких є keywords. Завантажує max_links найкращих з
+        max_links * FRONTIER_DISCOVERY_FACTOR знайдених посилань (крім головної сторінки).
+        
+        З checkpoint_id (і sink з get_state/load_state) кожні CRAWL_CHECKPOINT_INTERVAL
+        секунд стан краулу - черга, відбитки відвіданих сторінок, проміжні збіги sink
+        та витрачений час - зберігається в Redis. Якщо контрольна точка вже є, краул
+        продовжується з неї; сторінки, що були в обробці, завантажуються повторно.
+        
+        З distributed (і sink з get_state/merge_state) черга, відбитки сторінок, ліміт
+        завантажень та розклад запитів до хостів спільні в Redis: координатор
+        краулить разом з репліками, що приєдналися (join_distributed_crawl), і в кінці
+        додає до sink їх проміжні результати. Контрольні точки тоді не потрібні.
+        
+        progress(pages_fetched) викликається кожні TASK_PROGRESS_INTERVAL секунд,
+        якщо з попереднього виклику завантажено нові сторінки.
+        """
+        match_fingerprint = getattr(sink, 'fingerprint', None)
+        domain = urlparse(base_url).netloc.lower().replace('www.', '')
+        # Знайдені посилання - компактні відбитки, а не рядки адрес
+        found_links = VisitedSet()
+        seen_pages = VisitedSet()
+        frontier = CrawlFrontier(keywords)
+        link_limit = max_links * FRONTIER_DISCOVERY_FACTOR
+        parse_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        text_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        throttle = self._rate_limiter(distributed.host_schedule() if distributed else None)
+        deadline = time.time() + max_time_minutes * 60 if max_time_minutes else None
+        request_timeout = 15
+        stopped = False
+        in_flight = 0
+        fetches_started = 0
+        
+        # Сторінки від вибору з черги до завершення обробки; в контрольній точці вони
+        # повертаються в чергу, а їх адреси не вважаються обробленими
+        in_progress: Dict[int, dict] = {}
+        page_ids = itertools.count()
+        started = time.time()
+        elapsed_before = 0.0
+        sitemap_done = False
+        
+        if distributed:
+            frontier = distributed.frontier(keywords)
+            found_links = distributed.visited('found')
+            seen_pages = distributed.visited('pages')
+            # Стан краулу і так у Redis, а множини відвіданих сторінок там не мають dump() -
+            # контрольні точки (snapshot) в розподіленому режимі не зберігаються
+            checkpoint_id = None
+            if not distributed.coordinator:
+                # Sitemap розбирає координатор; час - до його дедлайну
+                sitemap_done = True
+                deadline = distributed.job['deadline']
+                distributed.join()
+        
+        robots = None
+        # Заборонені robots.txt посилання (кожне рахуємо в статистиці один раз)
+        robots_blocked = set()
+        
+        def schedule(links: List[tuple], depth: int) -> int:
+            """
+            Нові посилання (URL, текст посилання[, пріоритет з sitemap]) в межах link_limit -
+            у чергу. Разом, а не по одному: у розподіленому краулі це два запити до Redis
+            на сторінку. Повертає кількість нових посилань
+            """
+            if stopped:
+                return 0
+            # robots.txt - до found_links, щоб заборонені посилання не займали місце в link_limit
+            if robots is not None:
+                allowed = []
+                for link in links:
+                    if robots.can_fetch('*', link[0]):
+                        allowed.append(link)
+                    elif link[0] not in robots_blocked:
+                        robots_blocked.add(link[0])
+                        self.crawl_stats['pages_skipped_robots'] += 1
+                links = allowed
+            
+            added = found_links.add_all([link[0] for link in links], link_limit)
+            items = []
+            for (url, anchor_text, *sitemap_priority), is_new in zip(links, added):
+                if is_new:
+                    items.append((url, depth, anchor_text, sitemap_priority[0] if sitemap_priority else None))
+            frontier.push_all(items)
+            return sum(added)
+        
+        def claim_fetch() -> bool:
+            nonlocal fetches_started
+            if distributed:
+                if not distributed.claim_fetch(max_links):
+                    return False
+            elif fetches_started >= max_links:
+                return False
+            fetches_started += 1
+            return True
+        
+        # Головна сторінка та її варіанти
+        seeds = [
+            base_url,
+            f"https://{domain}",
+            f"https://www.{domain}",
+            f"http://{domain}",
+            f"http://www.{domain}"
+        ]
+        state = None
+        if checkpoint_id and hasattr(sink, 'load_state'):
+            state = (analysis_cache.get_crawl_checkpoint(checkpoint_id) or {}).get('state')
+        else:
+            checkpoint_id = None
+        
+        if state and sink.load_state(state['sink']):
+            frontier.restore(state['frontier'], state['frontier_seen'])
+            found_links = VisitedSet.load(state['found_links'])
+            seen_pages = VisitedSet.load(state['seen_pages'])
+            fetches_started = state['fetches_started']
+            elapsed_before = state['elapsed']
+            sitemap_done = state['sitemap_done']
+            self.crawl_stats.update(state['crawl_stats'])
+            if deadline:
+                deadline -= elapsed_before
+            logger.info(f"♻️ Краул {base_url} відновлено з контрольної точки: "
+                        f"{sink.pages_analyzed} сторінок оброблено, {frontier.qsize()} в черзі")
+            
+            if state['completed']:
+                return found_links
+        elif not distributed or distributed.coordinator:
+            for url in seeds:
+                frontier.push(url, force=True)
+        
+        def mark_seen(page: dict, url: str) -> bool:
+            # Сторінка обробляється вперше: запам'ятовуємо адресу як зайняту цією сторінкою
+            if not seen_pages.add(url):
+                return False
+            in_progress[page['page_id']]['seen'].append(url)
+            return True
+        
+        def snapshot(completed: bool = False) -> dict:
+            pending = list(in_progress.values())
+            entries = frontier.snapshot()
+            # Незавершені сторінки - на початок черги
+            front = min((entry[0] for entry in entries), default=0.0) - 1
+            return {
+                'completed': completed,
+                'elapsed': elapsed_before + time.time() - started,
+                'fetches_started': fetches_started - sum(1 for page in pending if page['depth'] > 0),
+                'frontier': [(front, page['url'], page['depth']) for page in pending] + entries,
+                'frontier_seen': frontier.seen.dump(),
+                'found_links': found_links.dump(),
+                'seen_pages': seen_pages.dump(exclude=[url for page in pending for url in page['seen']]),
+                'sitemap_done': sitemap_done,
+                'crawl_stats': dict(self.crawl_stats),
+                'sink': sink.get_state()
+            }
+        
+        def save_checkpoint(completed: bool = False):
+            analysis_cache.save_crawl_checkpoint(
+                checkpoint_id, snapshot(completed), ttl_hours=CRAWL_CHECKPOINT_TTL_HOURS
+            )
+            self.crawl_stats['checkpoints_saved'] += 1
+        
+        async def checkpointer():
+            while True:
+                await asyncio.sleep(CRAWL_CHECKPOINT_INTERVAL)
+                try:
+                    save_checkpoint()
+                except Exception as e:
+                    logger.error(f"❌ Помилка збереження контрольної точки {checkpoint_id}: {e}")
+        
+        async def progress_reporter():
+            reported = None
+            while True:
+                await asyncio.sleep(TASK_PROGRESS_INTERVAL)
+                pages_fetched = self.crawl_stats['pages_fetched']
+                if pages_fetched != reported:
+                    reported = pages_fetched
+                    progress(pages_fetched)
+        
+        async def fetch_worker(session: aiohttp.ClientSession):
+            nonlocal in_flight
+            while True:
+                current_url, depth = await frontier.pop()
+                handed_off = False
+                page_id = None
+                try:
+                    # Варіанти головної сторінки не враховуються в ліміті
+                    if depth > 0 and not claim_fetch():
+                        self.crawl_stats['pages_skipped_budget'] += 1
+                        continue
+                    
+                    page_id = next(page_ids)
+                    in_progress[page_id] = {'url': current_url, 'depth': depth, 'seen': []}
+                    
+                    logger.info(f"📄 Сканую: {current_url}")
+                    in_flight += 1
+                    try:
+                        page = await self._fetch_page(session, throttle, current_url, request_timeout)
+                    finally:
+                        in_flight -= 1
+                    
+                    if page is None:
+                        continue
+                    
+                    page['depth'] = depth
+                    page['page_id'] = page_id
+                    self.crawl_stats['pages_fetched'] += 1
+                    # frontier.task_done() викличе етап парсингу, коли додасть нові посилання
+                    await parse_queue.put(page)
+                    handed_off = True
+                
+                except Exception as e:
+                    logger.error(f"❌ Помилка при сканування {current_url}: {e}")
+                finally:
+                    if not handed_off:
+                        in_progress.pop(page_id, None)
+                        frontier.task_done()
+        
+        async def parse_worker():
+            while True:
+                page = await parse_queue.get()
+                current_url = page['url']
+                queued = False
+                try:
+                    # Сторінку, вже отриману за іншою адресою (редірект, http/https, www.),
+                    # не обробляємо вдруге
+                    if not mark_seen(page, page['final_url']):
+                        self.crawl_stats['pages_duplicate'] += 1
+                        continue
+                    
+                    if page['cached']:
+                        # 304: беремо розібрані посилання та текст з кешу
+                        links = page['links']
+                        text_content = page['text']
+                    else:
+                        links, text_content, canonical = await self._parse_page(
+                            page.pop('content'), current_url, domain
+                        )
+                        page['links'] = links
+                        page['text'] = text_content
+                        
+                        # <link rel="canonical">: сторінка обліковується під канонічною адресою
+                        if canonical and url_key(canonical) != url_key(page['final_url']):
+                            frontier.seen.add(canonical)
+                            if not mark_seen(page, canonical):
+                                self.crawl_stats['pages_duplicate'] += 1
+                                continue
+                            page['final_url'] = canonical
+                    
+                    schedule(links, page['depth'] + 1)
+                    
+                    # Фільтруємо дуже короткі сторінки
+                    if len(text_content) >= 100:
+                        logger.info(f"✅ Отримано: {page['final_url']} ({len(text_content)} символів)")
+                        await text_queue.put(page)
+                        queued = True
+                    elif page['cacheable']:
+                        await self._store_page_cache(page)
+                
+                except Exception as e:
+                    logger.error(f"❌ Помилка парсингу {current_url}: {e}")
+                finally:
+                    if not queued:
+                        in_progress.pop(page['page_id'], None)
+                    parse_queue.task_done()
+                    frontier.task_done()
+        
+        async def page_consumer():
+            while True:
+                page = await text_queue.get()
+                try:
+                    if page is None:
+                        return
+                    
+                    # Сторінку з тим самим текстом повторно не шукаємо: беремо збіги за хешем вмісту
+                    content_hash = None
+                    cached_matches = None
+                    if match_fingerprint:
+                        content_hash = hashlib.sha256(page['text'].encode('utf-8')).hexdigest()
+                        cached_matches = await asyncio.to_thread(
+                            analysis_cache.get_cached_page_matches, match_fingerprint, content_hash
+                        )
+                    
+                    matches = sink.add_page(page['final_url'], page['text'], cached_matches)
+                    
+                    if matches is None:
+                        self.crawl_stats['pages_near_duplicate'] += 1
+                    elif cached_matches is not None:
+                        self.crawl_stats['pages_matches_reused'] += 1
+                    elif content_hash:
+                        self.crawl_stats['pages_matched'] += 1
+                        await asyncio.to_thread(
+                            analysis_cache.cache_page_matches,
+                            match_fingerprint, content_hash, matches, ttl_hours=PAGE_MATCHES_TTL_HOURS
+                        )
+                    
+                    # Запис оновлюємо і для 304, щоб подовжити його TTL
+                    if page['cacheable'] or page['cached']:
+                        await self._store_page_cache(page)
+                except Exception as e:
+                    logger.error(f"❌ Помилка обробки {page['final_url']}: {e}")
+                finally:
+                    if page is not None:
+                        in_progress.pop(page['page_id'], None)
+                    text_queue.task_done()
+        
+        async def seed_from_sitemaps():
+            sitemap_urls = (robots.site_maps() if robots else None) or [urljoin(base_url, '/sitemap.xml')]
+            sitemap_pages = iter_sitemap_urls(
+                session, sitemap_urls, link_limit, max_files=SITEMAP_MAX_FILES, stats=self.crawl_stats
+            )
+            
+            batch = []
+            try:
+                async for url, priority in sitemap_pages:
+                    if len(batch) >= SITEMAP_BATCH_SIZE:
+                        self.crawl_stats['sitemap_urls'] += schedule(batch, 1)
+                        batch = []
+                        if len(found_links) >= link_limit:
+                            break
+                    for link, _ in filter_links([(url, '')], url, domain):
+                        # Пріоритет за замовчуванням за протоколом sitemaps.org - 0.5
+                        batch.append((link, '', 0.5 if priority is None else priority))
+            finally:
+                # Зібрані адреси додаємо, навіть якщо розбір перервано за таймаутом
+                self.crawl_stats['sitemap_urls'] += schedule(batch, 1)
+        
+        async def discover():
+            nonlocal sitemap_done
+            # Sitemap розбирається паралельно з краулом; чекаємо черги лише після нього
+            if SITEMAP_ENABLED and not sitemap_done:
+                try:
+                    await asyncio.wait_for(seed_from_sitemaps(), timeout=SITEMAP_TIMEOUT)
+                except asyncio.TimeoutError:
+                    logger.info(f"⏰ Розбір sitemap перервано за таймаутом ({SITEMAP_TIMEOUT}с)")
+                except Exception as e:
+                    logger.error(f"❌ Помилка розбору sitemap {base_url}: {e}")
+                if self.crawl_stats.get('sitemap_urls'):
+                    logger.info(f"🗺️ З sitemap додано {self.crawl_stats['sitemap_urls']} сторінок")
+                sitemap_done = True
+            await frontier.join()
+        
+        session = get_http_session()
+        
+        # robots.txt: заборонені шляхи, Crawl-delay та адреси sitemap
+        if ROBOTS_TXT_ENABLED:
+            robots = await fetch_robots(session, base_url)
+            crawl_delay = robots.crawl_delay('*') if robots else None
+            if crawl_delay:
+                throttle.min_delay = max(throttle.min_delay, min(float(crawl_delay), MAX_CRAWL_DELAY))
+                logger.info(f"🤖 robots.txt: Crawl-delay {throttle.min_delay}с")
+        
+        fetchers = [asyncio.create_task(fetch_worker(session)) for _ in range(self.max_workers)]
+        parsers = [asyncio.create_task(parse_worker()) for _ in range(PARSE_WORKERS)]
+        consumer = asyncio.create_task(page_consumer())
+        saver = asyncio.create_task(checkpointer()) if checkpoint_id else None
+        reporter = asyncio.create_task(progress_reporter()) if progress else None
+        try:
+            timeout = max(0, deadline - time.time()) if deadline else None
+            await asyncio.wait_for(discover(), timeout=timeout)
+        except asyncio.CancelledError:
+            # Сервіс зупиняється: зберігаємо стан, поки незавершені сторінки ще в обробці
+            if checkpoint_id:
+                save_checkpoint()
+            raise
+        except asyncio.TimeoutError:
+            # Незавершені та ще не розпочаті (в межах ліміту) завантаження скасовуємо
+            pending = min(frontier.qsize(), max(0, max_links - fetches_started))
+            skipped = pending + in_flight
+            self.crawl_stats['pages_skipped_time_budget'] += skipped
+            logger.info(f"⏰ Досягнуто ліміт часу! Пропущено {skipped} сторінок")
+        finally:
+            stopped = True
+            if saver:
+                saver.cancel()
+            if reporter:
+                reporter.cancel()
+            if distributed and distributed.coordinator:
+                distributed.finish()
+            for task in fetchers:
+                task.cancel()
+            await asyncio.gather(*fetchers, return_exceptions=True)
+            frontier.close()
+            
+            # Вже завантажені сторінки дообробляємо
+            await parse_queue.join()
+            for task in parsers:
+                task.cancel()
+            if not consumer.done():
+                await text_queue.put(None)
+            await asyncio.gather(*parsers, consumer, return_exceptions=True)
+        
+        # Краул завершено: після перезапуску лишиться тільки сформувати результат
+        if checkpoint_id:
+            save_checkpoint(completed=True)
+        
+        if distributed:
+            await self._merge_distributed(distributed, sink)
+        
+        return found_links
+    
+    async def _merge_distributed(self, distributed: DistributedCrawl, sink):
+        """Допоміжна репліка публікує проміжні результати, координатор їх об'єднує"""
+        if not distributed.coordinator:
+            distributed.publish_partial({'sink': sink.get_state(), 'crawl_stats': dict(self.crawl_stats)})
+            return
+        
+        partials = await distributed.collect_partials(DISTRIBUTED_MERGE_TIMEOUT)
+        for partial in partials:
+            if sink.merge_state(partial['sink']):
+                for name, value in partial['crawl_stats'].items():
+                    self.crawl_stats[name] += value
+        
+        self.crawl_stats['distributed_replicas'] = len(partials) + 1
+        distributed.expire()
+        logger.info(f"🧩 Розподілений краул: об'єднано результати {len(partials)} реплік")
+    
+    async def join_distributed_crawl(self, distributed: DistributedCrawl):
+        """Допомагає іншій репліці з її розподіленим краулом (DistributedCrawl.job)"""
+        job = distributed.job
+        aggregator = MatchAggregator(
+            job['keywords'], job['forbidden_words'], job['context_snippets'],
+            near_duplicate_mode=job['near_duplicate_mode'],
+            near_duplicate_distance=job['near_duplicate_distance']
+        )
+        logger.info(f"🧩 Приєднуємось до розподіленого краулу {job['site_url']}")
+        await self._crawl(
+            job['site_url'], job['max_links'], sink=aggregator,
+            keywords=job['keywords'] + job['forbidden_words'], distributed=distributed
+        )
+        logger.info(f"🧩 Розподілений краул {job['site_url']}: оброблено {aggregator.pages_analyzed} сторінок")
+    
+    def _rate_limiter(self, schedule=None) -> HostRateLimiter:
+        """Ліміт запитів по хостах для одного краулу (schedule - спільний розклад реплік)"""
+        return HostRateLimiter(
+            self.per_host_limit, self.per_host_delay,
+            max_delay=CRAWL_MAX_HOST_DELAY,
+            target_latency=CRAWL_TARGET_LATENCY,
+            failure_threshold=CRAWL_FAILURE_THRESHOLD,
+            circuit_cooldown=CRAWL_CIRCUIT_COOLDOWN,
+            stats=self.crawl_stats,
+            schedule=schedule
+        )
+    
+    async def _fetch_page(self, session: aiohttp.ClientSession, throttle: HostRateLimiter,
+                          url: str, request_timeout: int) -> Optional[dict]:
+        """
+        Завантажує сторінку. Якщо в кеші є її ETag/Last-Modified, надсилає умовний запит;
+        відповідь 304 повертає кешований запис без завантаження тіла.
+        
+        429/5xx, таймаути та помилки з'єднання повторюються до CRAWL_MAX_RETRIES разів
+        з експоненційною паузою; throttle враховує кожну відповідь і пропускає
+        сторінки вимкненого (circuit breaker) хоста.
+        """
+        # Redis - у потоці, щоб очікування відповіді не зупиняло інші воркери краулера
+        cached = await asyncio.to_thread(analysis_cache.get_cached_site_content, url) if HTTP_CACHE_ENABLED else None
+        if not isinstance(cached, dict):
+            cached = None
+        
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
         
-        if match:
-            start = max(0, match.start() - context_length)
-            end = min(len(text), match.end() + context_length)
-            context = text[start:end].strip()
+        for attempt in range(CRAWL_MAX_RETRIES + 1):
+            if attempt:
+                self.crawl_stats['requests_retried'] += 1
+                await asyncio.sleep(throttle.backoff(attempt))
             
-            # Обмежуємо кількість слів
-            words = context.split()
-            if len(words) > 40:
-                words = words[:40]
-                context = ' '.join(words) + "..."
+            try:
+                page = await self._request_page(session, throttle, url, request_timeout, headers, cached)
+            except CircuitOpenError:
+                self.crawl_stats['pages_skipped_circuit_open'] += 1
+                return None
+            except aiohttp.ClientSSLError:
+                # Помилку TLS (напр. https-варіант http-сайту) повтор не виправить
+                raise
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as e:
+                throttle.record_failure(url)
+                if attempt == CRAWL_MAX_RETRIES:
+                    raise
+                logger.warning(f"⚠️ Повтор {url}: {type(e).__name__}")
+                continue
             
-            return f"...{context}..."
+            if page != 'retry':
+                return page
+        
+        self.crawl_stats['pages_skipped_status'] += 1
+        return None
+    
+    async def _request_page(self, session: aiohttp.ClientSession, throttle: HostRateLimiter, url: str,
+                            request_timeout: int, headers: dict, cached: Optional[dict]):
+        """Один запит сторінки; 'retry' - тимчасова помилка сервера"""
+        async with throttle.slot(url):
+            started = time.monotonic()
+            async with session.get(url, timeout=request_timeout, headers=headers) as response:
+                throttle.record_response(url, response.status, time.monotonic() - started,
+                                         response.headers.get('Retry-After'))
+                if response.status in RETRY_STATUSES:
+                    return 'retry'
+                
+                if response.status == 304 and cached:
+                    self.crawl_stats['http_cache_not_modified'] += 1
+                    return {
+                        'url': url,
+                        'final_url': cached['final_url'],
+                        'cached': True,
+                        'cacheable': False,
+                        'etag': cached.get('etag'),
+                        'last_modified': cached.get('last_modified'),
+                        'links': cached['links'],
+                        'text': cached['text']
+                    }
+                
+                if response.status != 200:
+                    self.crawl_stats['pages_skipped_status'] += 1
+                    return None
+                
+                content = await self._read_html(response)
+                if content is None:
+                    return None
+                
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                return {
+                    'url': url,
+                    'final_url': canonicalize_url(str(response.url)),
+                    'content': content,
+                    'cached': False,
+                    'cacheable': HTTP_CACHE_ENABLED and bool(etag or last_modified),
+                    'etag': etag,
+                    'last_modified': last_modified
+                }
+    
+    async def _read_html(self, response: aiohttp.ClientResponse) -> Optional[str]:
+        """
+        Читає тіло HTML відповіді потоком, не більше PAGE_MAX_BYTES. Відповіді не-HTML
+        (за Content-Type) та завеликі (за Content-Length або фактичним розміром)
+        відкидаються до повного завантаження; причини рахуються в crawl_stats.
+        """
+        # Без Content-Type вважаємо відповідь HTML, як і раніше
+        if response.headers.get('Content-Type') and response.content_type not in HTML_CONTENT_TYPES:
+            self.crawl_stats['pages_skipped_content_type'] += 1
+            return None
+        
+        if response.content_length is not None and response.content_length > PAGE_MAX_BYTES:
+            self.crawl_stats['pages_skipped_too_large'] += 1
+            return None
         
-        return ""
+        body = bytearray()
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            body.extend(chunk)
+            if len(body) > PAGE_MAX_BYTES:
+                self.crawl_stats['pages_skipped_too_large'] += 1
+                return None
+        
+        return decode_html(bytes(body), response.charset)
+    
+    async def _store_page_cache(self, page: dict):
+        """Зберігає розібрану сторінку з валідаторами для умовних запитів (запис у Redis - у потоці)"""
+        await asyncio.to_thread(analysis_cache.cache_site_content, page['url'], {
+            'final_url': page['final_url'],
+            'etag': page['etag'],
+            'last_modified': page['last_modified'],
+            'links': page['links'],
+            'text': page['text']
+        }, ttl_hours=HTTP_CACHE_TTL_HOURS)
+        self.crawl_stats['http_cache_stored'] += 1
     
-    def ai_analyze_relevant_pages(self, pages_content: dict, 
-                                 keyword_df: pd.DataFrame, forbidden_df: pd.DataFrame) -> str:
+    async def _parse_page(self, content: str, current_url: str, domain: str = None) -> tuple:
         """
-        ШІ аналіз тільки релевантних сторінок
+        Парсинг HTML у пулі процесів (PARSE_EXECUTOR), щоб великі сторінки
+        не блокували event loop та інші запити
+        """
+        domain = domain or urlparse(current_url).netloc.lower().replace('www.', '')
+        executor = get_parse_executor()
+        if executor is None:
+            return parse_page(content, current_url, domain)
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, parse_page, content, current_url, domain
+        )
+    
+    async def ai_analyze_relevant_pages(self, pages_content: dict, 
+                                 keyword_df: pd.DataFrame, forbidden_df: pd.DataFrame,
+                                 pages_analyzed: int = None) -> str:
+        """
+        ШІ аналіз тільки релевантних сторінок.
+        pages_content може містити лише релевантні сторінки - тоді pages_analyzed
+        передає загальну кількість проаналізованих сторінок.
         """
         if not self.client:
             return "ШІ аналіз недоступний (не вказано API ключ)"
@@ -414,10 +1152,11 @@ class AsyncPartnerSiteAnalyzer:
         
         # Підготовка контенту для ШІ
         relevant_content = ""
-        for url in list(relevant_pages)[:10]:
-            if url in pages_content:
-                content_preview = pages_content[url][:1500]
-                relevant_content += f"\n--- СТОРІНКА: {url} ---\n{content_preview}\n"
+        # Стабільний порядок сторінок - однаковий промпт для незміненого сайту
+        relevant_urls = sorted(url for url in pages_content if url in relevant_pages)[:AI_PAGES_LIMIT]
+        for url in relevant_urls:
+            content_preview = pages_content[url][:AI_PREVIEW_CHARS]
+            relevant_content += f"\n--- СТОРІНКА: {url} ---\n{content_preview}\n"
         
         # Статистика
         keyword_stats = {}
@@ -432,7 +1171,7 @@ class AsyncPartnerSiteAnalyzer:
 Проаналізуй присутність бренду на партнерському сайті:
 
 СТАТИСТИКА:
-- Всього проаналізовано сторінок: {len(pages_content)}
+- Всього проаналізовано сторінок: {pages_analyzed if pages_analyzed is not None else len(pages_content)}
 - Сторінок з ключовими словами: {len(pages_with_keywords)}
 - Сторінок з забороненими словами: {len(pages_with_forbidden)}
 
@@ -454,40 +1193,89 @@ class AsyncPartnerSiteAnalyzer:
 }}
 """
 
+        request_params = {
+            "model": "gpt-3.5-turbo",
+            "messages": [
+                {"role": "system", "content": "Ти експерт з аналізу присутності брендів на партнерських сайтах."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.3,
+            "max_tokens": 1500
+        }
+        
+        # Однаковий запит (модель + промпт + параметри) повертаємо з кешу
+        request_hash = hashlib.sha256(
+            json.dumps(request_params, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        # Читання оновлює LRU-індекс, а запис може витісняти старі відповіді - обидва в потоці
+        cached_response = await asyncio.to_thread(analysis_cache.get_cached_llm_response, request_hash)
+        if cached_response is not None:
+            logger.info("🤖 ШІ аналіз взято з кешу")
+            return cached_response
+        
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "Ти експерт з аналізу присутності брендів на партнерських сайтах."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1500
-            )
+            # Обмежуємо кількість одночасних запитів до моделі на процес
+            async with ai_semaphore:
+                response = await self.client.chat.completions.create(**request_params)
             
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            await asyncio.to_thread(
+                analysis_cache.cache_llm_response,
+                request_hash, content, ttl_hours=LLM_CACHE_TTL_HOURS, max_entries=LLM_CACHE_MAX_ENTRIES
+            )
+            return content
             
         except Exception as e:
             logger.error(f"❌ Помилка ШІ аналізу: {e}")
             return f"Помилка ШІ аналізу: {e}"
     
+    async def aclose(self):
+        """Закриває HTTP клієнт OpenAI"""
+        if self.client:
+            await self.client.close()
+    
     async def analyze_site(self, site_url: str, keywords: List[str], 
                           forbidden_words: List[str], max_time_minutes: int = 20,
-                          max_links: int = 300) -> SimpleAnalysisResult:
+                          max_links: int = 300, checkpoint_id: str = None,
+                          progress=None) -> SimpleAnalysisResult:
         """
-        Повний асинхронний аналіз сайту
+        Повний асинхронний аналіз сайту.
+        checkpoint_id - ключ контрольної точки краулу (див. _crawl); з DISTRIBUTED_CRAWL_ENABLED
+        краул розподіляється між репліками; progress(pages_fetched) - прогрес краулу
         """
         start_time = time.time()
         
         logger.info(f"🚀 Починаємо аналіз сайту: {site_url}")
         
-        # 1. Знаходимо всі посилання
-        all_links = await self.find_all_links(site_url, max_links)
+        # 1-3. Краул і пошук ключових слів потоково: сторінки обробляються по мірі
+        # завантаження, в пам'яті лишаються тільки збіги та сторінки для ШІ аналізу
+        aggregator = MatchAggregator(
+            keywords, forbidden_words, self.context_snippets,
+            near_duplicate_mode=NEAR_DUPLICATE_MODE,
+            near_duplicate_distance=NEAR_DUPLICATE_MAX_DISTANCE
+        )
+        distributed = None
+        if DISTRIBUTED_CRAWL_ENABLED:
+            distributed = DistributedCrawl.start(analysis_redis, checkpoint_id or generate_task_id(), {
+                'site_url': site_url,
+                'max_links': max_links,
+                'keywords': keywords,
+                'forbidden_words': forbidden_words,
+                'context_snippets': self.context_snippets,
+                'near_duplicate_mode': NEAR_DUPLICATE_MODE,
+                'near_duplicate_distance': NEAR_DUPLICATE_MAX_DISTANCE,
+                'deadline': start_time + max_time_minutes * 60
+            })
         
-        # 2. Завантажуємо контент
-        pages_content = await self.scrape_all_pages(all_links, max_time_minutes)
+        found_links = await self._crawl(
+            site_url, max_links, max_time_minutes=max_time_minutes, sink=aggregator,
+            keywords=keywords + forbidden_words, checkpoint_id=checkpoint_id,
+            distributed=distributed, progress=progress
+        )
+        logger.info(f"✅ Знайдено {len(found_links)} посилань, "
+                    f"проаналізовано {aggregator.pages_analyzed} сторінок")
         
-        if not pages_content:
+        if not aggregator.pages_analyzed:
             return SimpleAnalysisResult(
                 site_url=site_url,
                 pages_analyzed=0,
@@ -497,16 +1285,17 @@ class AsyncPartnerSiteAnalyzer:
                 analysis_time=time.time() - start_time,
                 pages_with_keywords=[],
                 pages_with_forbidden=[],
-                detailed_stats={}
+                detailed_stats={'crawl_stats': dict(self.crawl_stats)}
             )
         
-        # 3. Статичний пошук ключових слів
-        keyword_df, forbidden_df, detailed_stats = self.search_keywords_static(
-            pages_content, keywords, forbidden_words
-        )
+        keyword_df, forbidden_df, detailed_stats = aggregator.finalize()
+        
+        detailed_stats['crawl_stats'] = dict(self.crawl_stats)
         
         # 4. ШІ аналіз
-        ai_analysis = self.ai_analyze_relevant_pages(pages_content, keyword_df, forbidden_df)
+        ai_analysis = await self.ai_analyze_relevant_pages(
+            aggregator.relevant_pages, keyword_df, forbidden_df, aggregator.pages_analyzed
+        )
         
         # 5. Збираємо результат
         pages_with_keywords = list(keyword_df['URL'].unique()) if not keyword_df.empty else []
@@ -514,7 +1303,7 @@ class AsyncPartnerSiteAnalyzer:
         
         return SimpleAnalysisResult(
             site_url=site_url,
-            pages_analyzed=len(pages_content),
+            pages_analyzed=aggregator.pages_analyzed,
             keyword_table=keyword_df,
             forbidden_table=forbidden_df,
             ai_analysis=ai_analysis,
@@ -531,9 +1320,156 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Глобальні змінні для зберігання результатів
-analysis_tasks = {}
-analysis_results = {}
+# Зміни статусів задач для потоків /status/{task_id}/stream (між процесами - через Redis)
+task_events = TaskEvents(analysis_redis)
+
+# Статуси та результати задач, спільні для всіх процесів сервісу
+task_store = TaskStore(
+    analysis_cache, AnalysisStatus, AnalysisResult,
+    db=db_manager if TASK_STORE_DATABASE_ENABLED else None,
+    ttl_hours=ANALYSIS_RESULT_TTL_HOURS,
+    state_cache_seconds=TASK_STATE_CACHE_SECONDS,
+    result_cache_seconds=TASK_RESULT_CACHE_SECONDS,
+    missing_cache_seconds=TASK_MISSING_CACHE_SECONDS,
+    memory_max_bytes=TASK_CACHE_MAX_MB * 1024 * 1024,
+    memory_max_entries=TASK_CACHE_MAX_ENTRIES,
+    spill_dir=TASK_SPILL_DIR or None,
+    on_update=task_events.publish
+)
+
+def fail_buried_job(task_id: str, job: dict):
+    """
+    Задача вичерпала спроби (воркери падали на ній) і більше не виконуватиметься:
+    позначаємо її невдалою, інакше вона назавжди лишиться pending/running
+    """
+    try:
+        status = task_store.get_status(task_id)
+        if status and status.status in FINAL_STATUSES:
+            return
+        
+        task_store.create((status or AnalysisStatus(
+            task_id=task_id,
+            status="pending",
+            progress=0,
+            message="Задача створена",
+            started_at=datetime.now()
+        )).model_copy(update={
+            'status': "failed",
+            'progress': 0,
+            'message': "Помилка: max attempts exceeded",
+            'completed_at': datetime.now()
+        }))
+        task_store.release(task_id)
+        logger.error(f"❌ Задачу {task_id} відкинуто: вичерпано {ANALYSIS_JOB_MAX_ATTEMPTS} спроб")
+    except Exception as e:
+        logger.error(f"❌ Не вдалося позначити задачу {task_id} невдалою: {e}")
+
+# Черга задач аналізу для воркерів
+analysis_queue = JobQueue(
+    analysis_redis, 'analysis',
+    visibility_timeout=ANALYSIS_JOB_VISIBILITY_TIMEOUT,
+    max_attempts=ANALYSIS_JOB_MAX_ATTEMPTS,
+    on_bury=fail_buried_job
+)
+
+# Аналізи, відновлені після перезапуску (посилання, щоб задачі не зібрав GC)
+resumed_analyses = set()
+
+async def resume_interrupted_analyses():
+    """Продовжує аналізи, процес яких зупинився (оренда контрольної точки закінчилась)"""
+    jobs = await asyncio.to_thread(analysis_cache.get_unclaimed_crawl_jobs)
+    for task_id, job in jobs.items():
+        # Оренду отримує лише один з процесів, що помітили задачу
+        if task_id in task_store.statuses or not analysis_cache.claim_crawl_checkpoint(
+                task_id, REPLICA_ID, CRAWL_CHECKPOINT_LEASE_SECONDS):
+            continue
+        
+        task_store.create(AnalysisStatus(
+            task_id=task_id,
+            status="pending",
+            progress=0,
+            message="Відновлення після перезапуску сервісу",
+            started_at=datetime.fromisoformat(job['started_at'])
+        ))
+        task = asyncio.create_task(perform_analysis(
+            task_id,
+            job['site_url'],
+            job['positive_keywords'],
+            job['negative_keywords'],
+            job['max_time_minutes'],
+            job['max_links'],
+            job.get('openai_api_key')
+        ))
+        resumed_analyses.add(task)
+        task.add_done_callback(resumed_analyses.discard)
+        logger.info(f"♻️ Відновлюємо аналіз {task_id} ({job['site_url']})")
+
+async def watch_interrupted_analyses():
+    """Періодично шукає аналізи, процес яких зупинився, поки оренда не закінчиться"""
+    while True:
+        try:
+            await resume_interrupted_analyses()
+        except Exception as e:
+            logger.error(f"❌ Помилка відновлення перерваних аналізів: {e}")
+        
+        await asyncio.sleep(CRAWL_CHECKPOINT_LEASE_SECONDS)
+
+@app.on_event("startup")
+async def start_resume_watcher():
+    """Запускає відновлення аналізів, перерваних перезапуском сервісу"""
+    # Задачі з черги після перезапуску повторно видаються воркерам (тайм-аут видимості)
+    if CRAWL_CHECKPOINT_ENABLED and not ANALYSIS_QUEUE_ENABLED:
+        app.state.resume_watcher = asyncio.create_task(watch_interrupted_analyses())
+
+async def help_distributed_crawls():
+    """Періодично приєднується до розподілених краулів, які координують інші репліки"""
+    joined: Dict[str, asyncio.Task] = {}
+    
+    while True:
+        try:
+            active = DistributedCrawl.active_jobs(analysis_redis)
+            running = sum(1 for task in joined.values() if not task.done())
+            for crawl_id, job in active.items():
+                if running >= DISTRIBUTED_MAX_JOINED:
+                    break
+                if crawl_id in joined or job.get('coordinator') == REPLICA_ID or job['deadline'] <= time.time():
+                    continue
+                
+                analyzer = AsyncPartnerSiteAnalyzer()
+                joined[crawl_id] = asyncio.create_task(
+                    analyzer.join_distributed_crawl(DistributedCrawl(analysis_redis, crawl_id, job=job))
+                )
+                running += 1
+            
+            # Завершені краули забуваємо, коли їх вже немає в реєстрі
+            for crawl_id in [crawl_id for crawl_id, task in joined.items()
+                             if task.done() and crawl_id not in active]:
+                del joined[crawl_id]
+        except Exception as e:
+            logger.error(f"❌ Помилка приєднання до розподіленого краулу: {e}")
+        
+        await asyncio.sleep(DISTRIBUTED_POLL_INTERVAL)
+
+@app.on_event("startup")
+async def start_distributed_helper():
+    """Запускає допомогу іншим реплікам з розподіленими краулами"""
+    # З чергою аналізів допомагають воркери - event loop API лишається для запитів
+    if DISTRIBUTED_CRAWL_ENABLED and not ANALYSIS_QUEUE_ENABLED:
+        app.state.distributed_helper = asyncio.create_task(help_distributed_crawls())
+        logger.info(f"🧩 Розподілений краул увімкнено (репліка {REPLICA_ID})")
+
+@app.on_event("startup")
+async def start_task_events():
+    """Підписка на зміни статусів задач з інших процесів"""
+    task_events.start(asyncio.get_running_loop())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Звільнення ресурсів при зупинці сервісу"""
+    task_events.stop()
+    task_store.close()
+    shutdown_parse_executor()
+    await close_http_session()
 
 @app.get("/")
 async def root():
@@ -549,6 +1485,26 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Статистика кешу відповідей ШІ"""
+    return {"llm_cache": analysis_cache.get_llm_cache_stats()}
+
+@app.get("/http/stats")
+async def get_http_stats():
+    """Статистика спільного пулу HTTP з'єднань"""
+    return {"http_pool": get_http_pool_stats()}
+
+@app.get("/queue/stats")
+async def get_queue_stats():
+    """Стан черги аналізів"""
+    return {"enabled": ANALYSIS_QUEUE_ENABLED, "analysis_queue": analysis_queue.stats()}
+
+@app.get("/tasks/stats")
+async def get_task_store_stats():
+    """Задачі в пам'яті цього процесу: розмір кешу, витіснення та збереження у файли"""
+    return {"task_store": task_store.stats(), "streamed_tasks": task_events.subscribers()}
+
 @app.post("/analyze", response_model=Dict[str, str])
 async def start_analysis(request: AnalysisRequest, background_tasks: BackgroundTasks):
     """
@@ -557,25 +1513,32 @@ async def start_analysis(request: AnalysisRequest, background_tasks: BackgroundT
     task_id = generate_task_id()
     
     # Зберігаємо статус задачі
-    analysis_tasks[task_id] = AnalysisStatus(
+    task_store.create(AnalysisStatus(
         task_id=task_id,
         status="pending",
         progress=0,
         message="Задача створена",
         started_at=datetime.now()
-    )
+    ))
     
-    # Запускаємо аналіз в фоновому режимі
-    background_tasks.add_task(
-        perform_analysis,
-        task_id,
-        str(request.site_url),
-        request.positive_keywords,
-        request.negative_keywords,
-        request.max_time_minutes,
-        request.max_links,
-        request.openai_api_key
-    )
+    job = {
+        'task_id': task_id,
+        'site_url': str(request.site_url),
+        'positive_keywords': request.positive_keywords,
+        'negative_keywords': request.negative_keywords,
+        'max_time_minutes': request.max_time_minutes,
+        'max_links': request.max_links,
+        'openai_api_key': request.openai_api_key
+    }
+    
+    # З чергою аналіз виконає воркер; без неї (або якщо Redis недоступний) - цей процес у фоні
+    if ANALYSIS_QUEUE_ENABLED and analysis_queue.enqueue(task_id, job):
+        # Статус далі оновлює воркер
+        task_store.release(task_id)
+    else:
+        if ANALYSIS_QUEUE_ENABLED:
+            logger.warning(f"⚠️ Черга недоступна - аналіз {task_id} виконується в процесі API")
+        background_tasks.add_task(perform_analysis, **job)
     
     return {
         "task_id": task_id,
@@ -583,37 +1546,91 @@ async def start_analysis(request: AnalysisRequest, background_tasks: BackgroundT
         "message": "Аналіз запущено. Використайте /status/{task_id} для перевірки статусу"
     }
 
+async def run_analysis_job(job: dict):
+    """Виконує задачу з черги в процесі воркера"""
+    task_id = job['task_id']
+    status = await task_store.get_status_async(task_id)
+    
+    # Повторна видача вже завершеної задачі (воркер впав до підтвердження)
+    if status and status.status in ("completed", "failed"):
+        logger.info(f"⏭️ Задача {task_id} вже завершена ({status.status})")
+        return
+    
+    task_store.create(status or AnalysisStatus(
+        task_id=task_id,
+        status="pending",
+        progress=0,
+        message="Задача створена",
+        started_at=datetime.now()
+    ))
+    try:
+        await perform_analysis(**job)
+    finally:
+        # Перервана задача (зупинка воркера) продовжиться в іншому процесі
+        task_store.release(task_id)
+
+async def hold_checkpoint_lease(task_id: str):
+    """Продовжує оренду контрольної точки, поки аналіз (краул і ШІ аналіз) виконується в цьому процесі"""
+    while True:
+        await asyncio.sleep(CRAWL_CHECKPOINT_LEASE_SECONDS / 3)
+        if not analysis_cache.claim_crawl_checkpoint(task_id, REPLICA_ID, CRAWL_CHECKPOINT_LEASE_SECONDS):
+            logger.warning(f"⚠️ Не вдалося продовжити оренду контрольної точки {task_id}")
+
 async def perform_analysis(task_id: str, site_url: str, positive_keywords: List[str], 
                           negative_keywords: List[str], max_time_minutes: int, 
                           max_links: int, openai_api_key: str = None):
     """
-    Виконує аналіз сайту
+    Виконує аналіз сайту. Параметри зберігаються разом з контрольними точками краулу,
+    щоб після перезапуску сервісу аналіз продовжився (resume_interrupted_analyses)
     """
+    started_at = task_store.statuses[task_id].started_at
+    checkpoint_id = task_id if CRAWL_CHECKPOINT_ENABLED else None
+    if checkpoint_id:
+        analysis_cache.save_crawl_job(task_id, {
+            'site_url': site_url,
+            'positive_keywords': positive_keywords,
+            'negative_keywords': negative_keywords,
+            'max_time_minutes': max_time_minutes,
+            'max_links': max_links,
+            'openai_api_key': openai_api_key,
+            'started_at': started_at.isoformat()
+        }, ttl_hours=CRAWL_CHECKPOINT_TTL_HOURS)
+        analysis_cache.claim_crawl_checkpoint(task_id, REPLICA_ID, CRAWL_CHECKPOINT_LEASE_SECONDS)
+    lease = asyncio.create_task(hold_checkpoint_lease(task_id)) if checkpoint_id else None
+    
     try:
         # Оновлюємо статус
-        analysis_tasks[task_id].status = "running"
-        analysis_tasks[task_id].progress = 10
-        analysis_tasks[task_id].message = "Ініціалізація аналізатора..."
+        task_store.update(task_id, status="running", progress=10,
+                          message="Ініціалізація аналізатора...")
         
         # Створюємо аналізатор
         analyzer = AsyncPartnerSiteAnalyzer(openai_api_key)
         
         # Оновлюємо прогрес
-        analysis_tasks[task_id].progress = 20
-        analysis_tasks[task_id].message = "Пошук посилань..."
+        task_store.update(task_id, progress=20, message="Пошук посилань...")
+        
+        def report_progress(pages_fetched: int):
+            # Краул займає від 20 до 85% прогресу
+            task_store.update(task_id, pages_fetched=pages_fetched,
+                              progress=20 + int(65 * min(1.0, pages_fetched / max_links)),
+                              message=f"Сканування сторінок: {pages_fetched}")
         
         # Виконуємо аналіз
-        result = await analyzer.analyze_site(
-            site_url=site_url,
-            keywords=positive_keywords,
-            forbidden_words=negative_keywords,
-            max_time_minutes=max_time_minutes,
-            max_links=max_links
-        )
+        try:
+            result = await analyzer.analyze_site(
+                site_url=site_url,
+                keywords=positive_keywords,
+                forbidden_words=negative_keywords,
+                max_time_minutes=max_time_minutes,
+                max_links=max_links,
+                checkpoint_id=checkpoint_id,
+                progress=report_progress
+            )
+        finally:
+            await analyzer.aclose()
         
         # Оновлюємо прогрес
-        analysis_tasks[task_id].progress = 90
-        analysis_tasks[task_id].message = "Обробка результатів..."
+        task_store.update(task_id, progress=90, message="Обробка результатів...")
         
         # Конвертуємо результат у зручний формат
         positive_matches = []
@@ -647,7 +1664,7 @@ async def perform_analysis(task_id: str, site_url: str, positive_keywords: List[
         }
         
         # Зберігаємо результат
-        analysis_results[task_id] = AnalysisResult(
+        task_store.save_result(AnalysisResult(
             task_id=task_id,
             site_url=site_url,
             status="completed",
@@ -661,60 +1678,151 @@ async def perform_analysis(task_id: str, site_url: str, positive_keywords: List[
             summary_stats=summary_stats,
             detailed_stats=result.detailed_stats,
             completed_at=datetime.now()
-        )
+        ), started_at=started_at)
         
         # Оновлюємо статус
-        analysis_tasks[task_id].status = "completed"
-        analysis_tasks[task_id].progress = 100
-        analysis_tasks[task_id].message = "Аналіз завершено успішно"
-        analysis_tasks[task_id].completed_at = datetime.now()
+        task_store.update(task_id, status="completed", progress=100,
+                          message="Аналіз завершено успішно", completed_at=datetime.now())
         
         logger.info(f"✅ Аналіз {task_id} завершено успішно")
         
+        if checkpoint_id:
+            analysis_cache.delete_crawl_checkpoint(task_id)
+        
     except Exception as e:
         logger.error(f"❌ Помилка при аналізі {task_id}: {e}")
         
         # Оновлюємо статус з помилкою
-        analysis_tasks[task_id].status = "failed"
-        analysis_tasks[task_id].progress = 0
-        analysis_tasks[task_id].message = f"Помилка: {str(e)}"
-        analysis_tasks[task_id].completed_at = datetime.now()
+        task_store.update(task_id, status="failed", progress=0,
+                          message=f"Помилка: {str(e)}", completed_at=datetime.now())
+        
+        # Помилка повториться і після перезапуску - контрольна точка не потрібна
+        if checkpoint_id:
+            analysis_cache.delete_crawl_checkpoint(task_id)
+    
+    finally:
+        if lease:
+            lease.cancel()
+            analysis_cache.release_crawl_checkpoint(task_id, REPLICA_ID)
+        # Стан завершеної задачі далі читається зі сховища
+        task_store.release(task_id)
 
 @app.get("/status/{task_id}", response_model=AnalysisStatus)
 async def get_analysis_status(task_id: str):
     """
     Отримує статус аналізу
     """
-    if task_id not in analysis_tasks:
+    status = await task_store.get_status_async(task_id)
+    if status is None:
         raise HTTPException(status_code=404, detail="Задача не знайдена")
     
-    return analysis_tasks[task_id]
+    return status
+
+def sse_event(event: str, data: dict) -> str:
+    """Подія у форматі Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def task_event_stream(task_ids: List[str]):
+    """Поточні статуси задач, далі кожна їх зміна, поки всі задачі не завершаться"""
+    # Підписуємось до читання статусів, щоб не пропустити зміну між ними
+    queue = task_events.subscribe(task_ids)
+    try:
+        pending = set()
+        for task_id in task_ids:
+            status = await task_store.get_status_async(task_id)
+            if status is None:
+                yield sse_event("error", {"task_id": task_id, "detail": "Задача не знайдена"})
+                continue
+            
+            yield sse_event("status", status.model_dump(mode='json'))
+            if status.status not in FINAL_STATUSES:
+                pending.add(task_id)
+        
+        while pending:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Подію могло бути втрачено (напр. Redis був недоступний) - звіряємо стан
+                yield ": keep-alive\n\n"
+                for task_id in list(pending):
+                    status = await task_store.get_status_async(task_id)
+                    if status is None:
+                        pending.discard(task_id)
+                        yield sse_event("error", {"task_id": task_id, "detail": "Задача не знайдена"})
+                    elif status.status in FINAL_STATUSES:
+                        pending.discard(task_id)
+                        yield sse_event("status", status.model_dump(mode='json'))
+                continue
+            
+            if event['task_id'] not in pending:
+                continue
+            yield sse_event("status", event)
+            if event['status'] in FINAL_STATUSES:
+                pending.discard(event['task_id'])
+        
+        yield sse_event("done", {"task_ids": task_ids})
+    finally:
+        task_events.unsubscribe(queue, task_ids)
+
+def task_event_response(task_ids: List[str]) -> StreamingResponse:
+    return StreamingResponse(
+        task_event_stream(task_ids),
+        media_type="text/event-stream",
+        # X-Accel-Buffering вимикає буферизацію потоку в nginx
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/status/{task_id}/stream")
+async def stream_analysis_status(task_id: str):
+    """
+    Потік статусу аналізу (Server-Sent Events): подія status при кожній зміні етапу,
+    кількості сторінок та при завершенні, після чого подія done закриває потік
+    """
+    if await task_store.get_status_async(task_id) is None:
+        raise HTTPException(status_code=404, detail="Задача не знайдена")
+    
+    return task_event_response([task_id])
+
+@app.get("/tasks/stream")
+async def stream_tasks_status(task_ids: List[str] = Query(..., description="ID задач (параметр можна повторювати або перелічити через кому)")):
+    """
+    Один потік статусів для багатьох задач (Server-Sent Events); done - коли
+    завершено всі задачі
+    """
+    task_ids = list(dict.fromkeys(
+        task_id.strip() for value in task_ids for task_id in value.split(',') if task_id.strip()
+    ))
+    return task_event_response(task_ids)
 
 @app.get("/result/{task_id}", response_model=AnalysisResult)
 async def get_analysis_result(task_id: str):
     """
     Отримує результат аналізу
     """
-    if task_id not in analysis_results:
-        if task_id not in analysis_tasks:
+    result = await task_store.get_result_async(task_id)
+    if result is None:
+        task_status = await task_store.get_status_async(task_id)
+        if task_status is None:
             raise HTTPException(status_code=404, detail="Задача не знайдена")
         
-        status = analysis_tasks[task_id].status
+        status = task_status.status
         if status == "pending" or status == "running":
             raise HTTPException(status_code=202, detail="Аналіз ще не завершено")
         elif status == "failed":
             raise HTTPException(status_code=500, detail="Аналіз завершився з помилкою")
+        raise HTTPException(status_code=404, detail="Результат не знайдено")
     
-    return analysis_results[task_id]
+    return result
 
 @app.get("/tasks")
 async def get_all_tasks():
     """
     Отримує список всіх задач
     """
+    task_ids = task_store.task_ids()
     return {
-        "tasks": list(analysis_tasks.keys()),
-        "total": len(analysis_tasks)
+        "tasks": task_ids,
+        "total": len(task_ids)
     }
 
 @app.delete("/task/{task_id}")
@@ -722,21 +1830,15 @@ async def delete_task(task_id: str):
     """
     Видаляє задачу та її результати
     """
-    deleted = False
-    
-    if task_id in analysis_tasks:
-        del analysis_tasks[task_id]
-        deleted = True
-    
-    if task_id in analysis_results:
-        del analysis_results[task_id]
-        deleted = True
-    
-    if not deleted:
+    if not task_store.delete(task_id):
         raise HTTPException(status_code=404, detail="Задача не знайдена")
     
     return {"message": "Задача видалена"}
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    if ANALYSIS_API_WORKERS > 1:
+        # Кілька процесів можливі, бо стан задач спільний (task_store)
+        uvicorn.run("analysis_service:app", host="0.0.0.0", port=8000, workers=ANALYSIS_API_WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
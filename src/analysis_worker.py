@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Воркер аналізів: бере задачі з черги Redis (ANALYSIS_QUEUE_ENABLED) і виконує їх
+окремо від API, тож довгі краули не ділять event loop з обробкою запитів, а воркери
+масштабуються незалежно (docker compose up --scale analysis-worker=N)
+"""
+
+import sys
+sys.path.append('/app')
+
+import asyncio
+import signal
+
+from shared.logger import setup_logger
+from shared.html_parser import shutdown_parse_executor
+from shared.http_session import close_http_session
+from shared.job_queue import QueuedJob
+from analysis_service import (
+    analysis_queue, run_analysis_job, help_distributed_crawls,
+    ANALYSIS_WORKER_CONCURRENCY, ANALYSIS_QUEUE_POLL_INTERVAL, DISTRIBUTED_CRAWL_ENABLED
+)
+
+logger = setup_logger('analysis_worker')
+
+async def keep_lease(job: QueuedJob):
+    """Подовжує оренду задачі, поки вона виконується"""
+    while True:
+        await asyncio.sleep(analysis_queue.visibility_timeout / 3)
+        analysis_queue.extend(job.id)
+
+async def process_job(job: QueuedJob):
+    """Виконує задачу і підтверджує її; при зупинці воркера повертає в чергу"""
+    logger.info(f"📥 Задача {job.id} (спроба {job.attempts}): {job.payload.get('site_url')}")
+    lease = asyncio.create_task(keep_lease(job))
+    try:
+        await run_analysis_job(job.payload)
+        analysis_queue.ack(job.id)
+        logger.info(f"✅ Задачу {job.id} виконано")
+    except asyncio.CancelledError:
+        analysis_queue.release(job.id)
+        logger.info(f"↩️ Задачу {job.id} повернено в чергу")
+        raise
+    except Exception as e:
+        logger.error(f"❌ Помилка задачі {job.id}: {e}")
+        analysis_queue.fail(job.id)
+    finally:
+        lease.cancel()
+
+async def run_worker(stop: asyncio.Event):
+    """Бере до ANALYSIS_WORKER_CONCURRENCY задач одночасно, поки не отримано сигнал зупинки"""
+    slots = asyncio.Semaphore(max(1, ANALYSIS_WORKER_CONCURRENCY))
+    running = set()
+    
+    while not stop.is_set():
+        await slots.acquire()
+        job = analysis_queue.reserve()
+        if job is None:
+            slots.release()
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=ANALYSIS_QUEUE_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        
+        task = asyncio.create_task(process_job(job))
+        running.add(task)
+        task.add_done_callback(running.discard)
+        task.add_done_callback(lambda _: slots.release())
+    
+    # Незавершені задачі повертаються в чергу і продовжаться з контрольних точок краулу
+    for task in list(running):
+        task.cancel()
+    await asyncio.gather(*running, return_exceptions=True)
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    
+    logger.info(f"🚀 Воркер аналізів запущено ({ANALYSIS_WORKER_CONCURRENCY} задач одночасно)")
+    helper = asyncio.create_task(help_distributed_crawls()) if DISTRIBUTED_CRAWL_ENABLED else None
+    try:
+        await run_worker(stop)
+    finally:
+        if helper:
+            helper.cancel()
+        shutdown_parse_executor()
+        await close_http_session()
+        logger.info("🛑 Воркер аналізів зупинено")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -10,7 +10,7 @@ from typing import Optional, Dict, Any, List
 from sqlalchemy import create_engine, Column, String, Integer, DateTime, Text, JSON, Float, Boolean
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, insert
 from datetime import datetime
 import uuid
 
@@ -184,6 +184,27 @@ class DatabaseManager:
                 }
             return None
     
+    def upsert_analysis_result(self, result_data: Dict[str, Any]) -> str:
+        """Збереження результату аналізу або оновлення існуючого з тим самим task_id"""
+        with self.get_session() as session:
+            statement = insert(AnalysisResult).values(**result_data)
+            statement = statement.on_conflict_do_update(
+                index_elements=[AnalysisResult.task_id],
+                set_={key: value for key, value in result_data.items() if key != 'task_id'}
+            ).returning(AnalysisResult.id)
+            result_id = session.execute(statement).scalar()
+            session.commit()
+            return str(result_id)
+    
+    def delete_analysis_result(self, task_id: str) -> bool:
+        """Видалення результату аналізу"""
+        with self.get_session() as session:
+            deleted = session.query(AnalysisResult).filter(
+                AnalysisResult.task_id == task_id
+            ).delete()
+            session.commit()
+            return deleted > 0
+    
     def update_analysis_result(self, task_id: str, update_data: Dict[str, Any]):
         """Оновлення результату аналізу"""
         with self.get_session() as session:
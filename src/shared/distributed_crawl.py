@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Розподілений краул одного сайту кількома репліками analysis-service: черга,
+відвідані сторінки, ліміт завантажень та паузи між запитами до хостів - у Redis,
+а кожна репліка збирає власні проміжні збіги, які потім об'єднуються
+"""
+
+import asyncio
+import json
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from shared.frontier import CrawlFrontier, PRIORITY_URL_PATTERNS, VisitedSet
+from shared.redis_client import RedisClient
+
+# Ідентифікатор цього процесу серед реплік
+REPLICA_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Реєстр активних розподілених краулів: crawl_id -> параметри задачі
+ACTIVE_CRAWLS_KEY = "crawl:active"
+# Через скільки секунд після дедлайну краул, який координатор так і не завершив
+# (репліка впала), видаляється з реєстру
+STALE_CRAWL_GRACE = 60
+
+# Ключі стану одного краулу (crawl:{crawl_id}:{name})
+CRAWL_KEYS = ('queue', 'order', 'queued', 'pending', 'fetches', 'found', 'pages', 'helpers', 'partials', 'finished')
+
+# Скільки BZPOPMIN чекає на нові елементи черги (с) та як часто перевіряється завершення краулу
+POP_TIMEOUT = 1.0
+JOIN_POLL_INTERVAL = 0.2
+
+# Резервування часу запиту до хоста: наступний дозволений час спільний для всіх реплік
+_RESERVE_HOST_SLOT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local next_allowed = tonumber(redis.call('GET', KEYS[1]) or '0')
+local start_at = math.max(now, next_allowed)
+redis.call('SET', KEYS[1], tostring(start_at + interval), 'PX', math.ceil((start_at - now + interval) * 1000) + 1000)
+return tostring(start_at)
+"""
+
+# Додавання відбитків у множину, поки в ній менше ARGV[1] елементів (-1 - без ліміту);
+# для кожного відбитка - 1, якщо його додано
+_ADD_ALL = """
+local limit = tonumber(ARGV[1])
+local size = redis.call('SCARD', KEYS[1])
+local added = {}
+for i = 2, #ARGV do
+    local new = 0
+    if limit < 0 or size < limit then
+        new = redis.call('SADD', KEYS[1], ARGV[i])
+        size = size + new
+    end
+    added[i - 1] = new
+end
+return added
+"""
+
+# Додавання в чергу трійок (відбиток, -оцінка, [url, глибина]) сторінок, яких ще не було
+# (ARGV[1] == '1' - без перевірки); порядковий номер на початку елемента зберігає
+# порядок знаходження серед однакових оцінок, як у CrawlFrontier
+_PUSH_ALL = """
+local force = ARGV[1] == '1'
+local added = 0
+for i = 2, #ARGV, 3 do
+    if redis.call('SADD', KEYS[1], ARGV[i]) == 1 or force then
+        local order = redis.call('INCR', KEYS[3])
+        redis.call('ZADD', KEYS[4], ARGV[i + 1], string.format('%012d', order) .. ARGV[i + 2])
+        added = added + 1
+    end
+end
+if added > 0 then
+    redis.call('INCRBY', KEYS[2], added)
+end
+return added
+"""
+
+class RedisVisitedSet:
+    """VisitedSet у Redis: відбитки сторінок спільні для всіх реплік"""
+    
+    def __init__(self, redis: RedisClient, key: str):
+        self.redis = redis
+        self.key = key
+    
+    def __contains__(self, url: str) -> bool:
+        return self.redis.sismember(self.key, VisitedSet.fingerprint(url))
+    
+    def __len__(self) -> int:
+        return self.redis.scard(self.key)
+    
+    def add(self, url: str) -> bool:
+        """Додає сторінку. Повертає True, якщо її ще не було в жодній репліці"""
+        return self.redis.sadd(self.key, VisitedSet.fingerprint(url)) == 1
+    
+    def add_all(self, urls: Iterable[str], limit: Optional[int] = None) -> List[bool]:
+        """Як VisitedSet.add_all, але за один запит до Redis"""
+        urls = list(urls)
+        if not urls:
+            return []
+        
+        fingerprints = [VisitedSet.fingerprint(url) for url in urls]
+        added = self.redis.eval(_ADD_ALL, [self.key], [-1 if limit is None else limit, *fingerprints]) or []
+        return [bool(new) for new in added] + [False] * (len(urls) - len(added))
+
+class RedisFrontier(CrawlFrontier):
+    """
+    CrawlFrontier у Redis: відсортована множина URL за оцінкою, з якої воркери всіх
+    реплік беруть сторінки. Лічильник незавершених сторінок (pending) спільний,
+    тож join() координатора чекає на сторінки, які обробляють інші репліки
+    """
+    
+    def __init__(self, crawl: 'DistributedCrawl', keywords: Iterable[str] = (),
+                 priority_patterns: Iterable[str] = PRIORITY_URL_PATTERNS):
+        super().__init__(keywords, priority_patterns)
+        self.crawl = crawl
+        self.redis = crawl.redis
+        self.seen = RedisVisitedSet(crawl.redis, crawl.key('queued'))
+        # Воркери репліки чекають на чергу по черзі - одним BZPOPMIN у власному потоці краулу,
+        # щоб очікування одних краулів не затримувало інші
+        self._pop_lock = asyncio.Lock()
+        self._pop_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='crawl-pop')
+    
+    def push(self, url: str, depth: int = 0, anchor_text: str = '',
+             sitemap_priority: Optional[float] = None, force: bool = False) -> bool:
+        return self._push([(url, depth, anchor_text, sitemap_priority)], force) == 1
+    
+    def push_all(self, items: Iterable[Tuple[str, int, str, Optional[float]]]) -> int:
+        return self._push(items)
+    
+    def _push(self, items: Iterable[Tuple[str, int, str, Optional[float]]], force: bool = False) -> int:
+        """Додає сторінки в чергу за один запит до Redis; повертає кількість доданих"""
+        args = ['1' if force else '0']
+        for url, depth, anchor_text, sitemap_priority in items:
+            score = self.score(url, depth, anchor_text, sitemap_priority)
+            args.extend([VisitedSet.fingerprint(url), -score, json.dumps([url, depth], ensure_ascii=False)])
+        if len(args) == 1:
+            return 0
+        
+        keys = [self.seen.key, self.crawl.key('pending'), self.crawl.key('order'), self.crawl.key('queue')]
+        return self.redis.eval(_PUSH_ALL, keys, args) or 0
+    
+    async def pop(self) -> Tuple[str, int]:
+        """
+        Наступний URL: BZPOPMIN у потоці, щоб не блокувати event loop і не опитувати
+        Redis, поки черга порожня
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            async with self._pop_lock:
+                started = time.monotonic()
+                future = loop.run_in_executor(self._pop_executor, self.redis.bzpopmin, self.crawl.key('queue'), POP_TIMEOUT)
+                try:
+                    item = await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    # Воркер зупинено, а BZPOPMIN ще чекає - вилучений елемент повертаємо в чергу
+                    future.add_done_callback(self._requeue)
+                    raise
+            
+            if item is not None:
+                # Перші 12 символів - порядковий номер
+                url, depth = json.loads(item[0][12:])
+                return url, depth
+            
+            # Без Redis bzpopmin повертається одразу - не крутимо цикл
+            if time.monotonic() - started < POP_TIMEOUT / 2:
+                await asyncio.sleep(POP_TIMEOUT)
+    
+    def _requeue(self, future: asyncio.Future):
+        if future.cancelled() or future.exception() is not None or future.result() is None:
+            return
+        member, score = future.result()
+        self.redis.zadd(self.crawl.key('queue'), {member: score})
+    
+    def task_done(self):
+        self.redis.increment(self.crawl.key('pending'), -1)
+    
+    def close(self):
+        # BZPOPMIN, що ще чекає, завершиться за POP_TIMEOUT і звільнить потік
+        self._pop_executor.shutdown(wait=False)
+    
+    def qsize(self) -> int:
+        return self.redis.zcard(self.crawl.key('queue'))
+    
+    async def join(self):
+        """
+        Координатор чекає, поки всі репліки оброблять усі сторінки; допоміжна
+        репліка - поки координатор не завершить краул
+        """
+        while not self.crawl.is_finished():
+            if self.crawl.coordinator and int(self.redis.get(self.crawl.key('pending')) or 0) <= 0:
+                return
+            await asyncio.sleep(JOIN_POLL_INTERVAL)
+    
+    def snapshot(self) -> List[Tuple[float, str, int]]:
+        """
+        Черга у форматі CrawlFrontier.snapshot(). Контрольні точки розподіленого
+        краулу не зберігаються - його стан і так у Redis
+        """
+        return [(score, *json.loads(member[12:])) for member, score in
+                self.redis.zrange(self.crawl.key('queue'), 0, -1, withscores=True)]
+
+class RedisHostSchedule:
+    """Спільний для всіх реплік розклад запитів до хостів (HostRateLimiter(schedule=...))"""
+    
+    def __init__(self, redis: RedisClient):
+        self.redis = redis
+    
+    def reserve(self, host: str, interval: float) -> float:
+        """Резервує наступний запит до хоста; повертає, скільки секунд чекати"""
+        now = time.time()
+        start_at = self.redis.eval(_RESERVE_HOST_SLOT, [f"crawl:host:{host}:next"], [now, interval])
+        # Без Redis розклад не координується - не чекаємо
+        return max(0.0, float(start_at) - now) if start_at is not None else 0.0
+
+class DistributedCrawl:
+    """
+    Спільний стан одного краулу в Redis. Координатор (репліка, що отримала задачу)
+    реєструє краул в ACTIVE_CRAWLS_KEY, інші репліки приєднуються до нього, а після
+    завершення публікують свої проміжні результати, які координатор об'єднує
+    """
+    
+    def __init__(self, redis: RedisClient, crawl_id: str, coordinator: bool = False,
+                 job: Dict[str, Any] = None):
+        self.redis = redis
+        self.crawl_id = crawl_id
+        self.coordinator = coordinator
+        self.job = job or {}
+        self.replica_id = REPLICA_ID
+    
+    @classmethod
+    def start(cls, redis: RedisClient, crawl_id: str, job: Dict[str, Any]) -> Optional['DistributedCrawl']:
+        """Реєструє краул для інших реплік; None, якщо Redis недоступний"""
+        if redis.client is None:
+            return None
+        
+        crawl = cls(redis, crawl_id, coordinator=True, job={**job, 'coordinator': REPLICA_ID})
+        # Стан попереднього запуску (напр. до перезапуску сервісу) не використовуємо
+        for name in CRAWL_KEYS:
+            redis.delete(crawl.key(name))
+        redis.hset(ACTIVE_CRAWLS_KEY, crawl_id, crawl.job)
+        return crawl
+    
+    @classmethod
+    def active_jobs(cls, redis: RedisClient) -> Dict[str, Dict[str, Any]]:
+        """
+        Розподілені краули, до яких ще можна приєднатися. Краули з дедлайном, що минув
+        понад STALE_CRAWL_GRACE секунд тому, видаляються з реєстру, а їх стан - через TTL
+        """
+        jobs = redis.hgetall(ACTIVE_CRAWLS_KEY)
+        stale_before = time.time() - STALE_CRAWL_GRACE
+        for crawl_id, job in list(jobs.items()):
+            if job['deadline'] < stale_before:
+                redis.hdel(ACTIVE_CRAWLS_KEY, crawl_id)
+                cls(redis, crawl_id).expire()
+                del jobs[crawl_id]
+        return jobs
+    
+    def key(self, name: str) -> str:
+        return f"crawl:{self.crawl_id}:{name}"
+    
+    def frontier(self, keywords: Iterable[str] = ()) -> RedisFrontier:
+        return RedisFrontier(self, keywords)
+    
+    def visited(self, name: str) -> RedisVisitedSet:
+        return RedisVisitedSet(self.redis, self.key(name))
+    
+    def host_schedule(self) -> RedisHostSchedule:
+        return RedisHostSchedule(self.redis)
+    
+    def claim_fetch(self, limit: int) -> bool:
+        """Резервує одне завантаження в спільному ліміті max_links"""
+        return self.redis.increment(self.key('fetches')) <= limit
+    
+    def join(self):
+        """Допоміжна репліка починає роботу над краулом"""
+        self.redis.sadd(self.key('helpers'), self.replica_id)
+    
+    def publish_partial(self, partial: Dict[str, Any]):
+        """Допоміжна репліка передає свої проміжні результати координатору"""
+        self.redis.hset(self.key('partials'), self.replica_id, partial)
+        self.redis.srem(self.key('helpers'), self.replica_id)
+    
+    def finish(self):
+        """Координатор завершує краул: нові репліки не приєднуються, активні зупиняються"""
+        self.redis.set(self.key('finished'), 1)
+        self.redis.hdel(ACTIVE_CRAWLS_KEY, self.crawl_id)
+    
+    def is_finished(self) -> bool:
+        return self.redis.exists(self.key('finished'))
+    
+    async def collect_partials(self, timeout: float) -> List[Dict[str, Any]]:
+        """Чекає (не довше timeout), поки допоміжні репліки опублікують результати"""
+        deadline = time.time() + timeout
+        while self.redis.scard(self.key('helpers')) and time.time() < deadline:
+            await asyncio.sleep(JOIN_POLL_INTERVAL)
+        return list(self.redis.hgetall(self.key('partials')).values())
+    
+    def expire(self, ttl: int = 3600):
+        """Спільний стан краулу більше не потрібен - видаляється через ttl секунд"""
+        for name in CRAWL_KEYS:
+            self.redis.expire(self.key(name), ttl)
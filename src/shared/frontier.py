@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Пріоритетна черга краулера: сторінки, які найімовірніше згадують
+бренд або конкурентів, завантажуються першими
+"""
+
+import asyncio
+import base64
+import hashlib
+import itertools
+import re
+from array import array
+from bisect import bisect_left
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from shared.keyword_matcher import KeywordMatcher
+from shared.utils import url_key
+
+# Шляхи каталогу, товарів та новин - пріоритетні
+PRIORITY_URL_PATTERNS = ['product', 'catalog', 'category', 'товар', 'каталог',
+                         'категор', 'новин', 'news', 'about', 'contact']
+
+# Ваги оцінки URL
+DEPTH_PENALTY = 1.0
+PATTERN_BONUS = 2.0
+KEYWORD_BONUS = 4.0
+SITEMAP_WEIGHT = 3.0
+
+_URL_SEPARATORS = re.compile(r'[/\-_.+=&?]+')
+
+class VisitedSet:
+    """
+    Компактна множина відвіданих сторінок: 64-бітні відбитки канонічних адрес (url_key)
+    у відсортованому масиві - 8 байт на URL - та невеликий буфер нових відбитків,
+    який періодично зливається в масив
+    """
+    
+    MIN_BUFFER = 1024
+    
+    def __init__(self, urls: Iterable[str] = ()):
+        self._sorted = array('Q')
+        self._recent = set()
+        for url in urls:
+            self.add(url)
+    
+    @staticmethod
+    def fingerprint(url: str) -> int:
+        """64-бітний відбиток сторінки; http/https, www. та дрібні відмінності URL не враховуються"""
+        digest = hashlib.blake2b(url_key(url).encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big')
+    
+    def _contains(self, fingerprint: int) -> bool:
+        if fingerprint in self._recent:
+            return True
+        index = bisect_left(self._sorted, fingerprint)
+        return index < len(self._sorted) and self._sorted[index] == fingerprint
+    
+    def __contains__(self, url: str) -> bool:
+        return self._contains(self.fingerprint(url))
+    
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._recent)
+    
+    def add(self, url: str) -> bool:
+        """Додає сторінку. Повертає True, якщо її ще не було"""
+        fingerprint = self.fingerprint(url)
+        if self._contains(fingerprint):
+            return False
+        
+        self._recent.add(fingerprint)
+        # Буфер росте разом з масивом, тож злиття коштує амортизовано O(1) на елемент
+        if len(self._recent) >= max(self.MIN_BUFFER, len(self._sorted) // 8):
+            self._merge()
+        return True
+    
+    def add_all(self, urls: Iterable[str], limit: Optional[int] = None) -> List[bool]:
+        """Додає сторінки, поки в множині менше limit сторінок; для кожної - чи її додано"""
+        return [(limit is None or len(self) < limit) and self.add(url) for url in urls]
+    
+    def _merge(self):
+        merged = array('Q', self._sorted)
+        merged.extend(sorted(self._recent))
+        self._sorted = array('Q', sorted(merged))
+        self._recent.clear()
+    
+    def dump(self, exclude: Iterable[str] = ()) -> str:
+        """Відбитки у base64 для контрольної точки; exclude - сторінки, яких не зберігати"""
+        self._merge()
+        excluded = {self.fingerprint(url) for url in exclude}
+        fingerprints = array('Q', (fp for fp in self._sorted if fp not in excluded)) if excluded else self._sorted
+        return base64.b64encode(fingerprints.tobytes()).decode('ascii')
+    
+    @classmethod
+    def load(cls, data: str) -> 'VisitedSet':
+        """Множина з відбитків, збережених dump()"""
+        visited = cls()
+        visited._sorted.frombytes(base64.b64decode(data))
+        return visited
+
+class CrawlFrontier(asyncio.PriorityQueue):
+    """
+    Черга URL на купі, впорядкована за оцінкою: глибина, пріоритетні шляхи,
+    ключові слова в тексті посилання або в URL та пріоритет з sitemap.
+    Кожна сторінка (за канонічною адресою) додається лише один раз.
+    join()/task_done() як у asyncio.Queue.
+    """
+    
+    def __init__(self, keywords: Iterable[str] = (), priority_patterns: Iterable[str] = PRIORITY_URL_PATTERNS):
+        super().__init__()
+        self.matcher = KeywordMatcher(keywords)
+        self.priority_patterns = [pattern.lower() for pattern in priority_patterns]
+        self.seen = VisitedSet()
+        self._order = itertools.count()
+    
+    def score(self, url: str, depth: int = 0, anchor_text: str = '',
+              sitemap_priority: Optional[float] = None) -> float:
+        """Оцінка URL: чим більша, тим раніше сторінка буде завантажена"""
+        score = -DEPTH_PENALTY * depth
+        
+        path = unquote(urlparse(url).path).lower()
+        if any(pattern in path for pattern in self.priority_patterns):
+            score += PATTERN_BONUS
+        
+        # Ключові слова шукаємо в тексті посилання та в словах шляху (samsung-galaxy -> samsung galaxy)
+        if self.matcher.keywords:
+            haystack = f"{anchor_text} {_URL_SEPARATORS.sub(' ', path)}"
+            if self.matcher.find_all(haystack):
+                score += KEYWORD_BONUS
+        
+        if sitemap_priority is not None:
+            score += SITEMAP_WEIGHT * sitemap_priority
+        
+        return score
+    
+    def push(self, url: str, depth: int = 0, anchor_text: str = '',
+             sitemap_priority: Optional[float] = None, force: bool = False) -> bool:
+        """
+        Додає URL, якщо цієї сторінки ще не було (force - без перевірки, для варіантів
+        головної сторінки). Повертає True, якщо URL додано
+        """
+        if not self.seen.add(url) and not force:
+            return False
+        
+        score = self.score(url, depth, anchor_text, sitemap_priority)
+        # Порядковий номер: серед однакових оцінок - у порядку знаходження
+        self.put_nowait((-score, next(self._order), url, depth))
+        return True
+    
+    def push_all(self, items: Iterable[Tuple[str, int, str, Optional[float]]]) -> int:
+        """Додає кілька URL: (url, depth, anchor_text, sitemap_priority). Повертає кількість доданих"""
+        return sum(self.push(*item) for item in items)
+    
+    async def pop(self) -> Tuple[str, int]:
+        """Наступний URL з найбільшою оцінкою та його глибина"""
+        _, _, url, depth = await self.get()
+        return url, depth
+    
+    def snapshot(self) -> List[Tuple[float, str, int]]:
+        """Черга для контрольної точки: (пріоритет, URL, глибина) у порядку завантаження"""
+        return [(priority, url, depth) for priority, _, url, depth in sorted(self._queue)]
+    
+    def close(self):
+        """Звільняє ресурси черги, коли краул завершено"""
+    
+    def restore(self, entries: Iterable[Tuple[float, str, int]], seen: str = None):
+        """Відновлює чергу зі snapshot() та відбитки відвіданих сторінок з VisitedSet.dump()"""
+        if seen is not None:
+            self.seen = VisitedSet.load(seen)
+        for priority, url, depth in entries:
+            self.put_nowait((priority, next(self._order), url, depth))
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Парсинг HTML сторінок: посилання та очищений текст.
+Функції модульного рівня, щоб їх можна було виконувати в пулі процесів.
+Бекенди: html.parser (BeautifulSoup, за замовчуванням) та lxml - швидший шлях
+з тим самим результатом, крім неправильно вкладених тегів (напр. <a> в <a>),
+які libxml2 виправляє, як браузер.
+"""
+
+import html
+import os
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import charset_normalizer
+import lxml.etree
+import lxml.html
+from bs4 import BeautifulSoup
+from bs4.dammit import EntitySubstitution
+
+from shared.utils import canonicalize_url, get_env_int
+
+# Посилання, які не скануємо
+SKIP_URL_PATTERNS = ['#', 'javascript:', 'mailto:', 'tel:', '.pdf', '.jpg',
+                     '.png', '.gif', '.zip', '.rar', '.exe', '.doc', '.docx',
+                     '.xls', '.xlsx', 'wp-admin', 'wp-content']
+
+# Елементи, текст яких не враховуємо
+REMOVED_ELEMENTS = ['script', 'style', 'nav', 'footer', 'header', 'aside']
+
+# Результат розбору: посилання (URL, текст посилання), текст сторінки, канонічна адреса
+ParsedPage = Tuple[List[Tuple[str, str]], Optional[str], Optional[str]]
+
+# Скільки символів тексту посилання зберігаємо для пріоритезації краулу
+ANCHOR_TEXT_LENGTH = 200
+
+_LXML_PARSER = lxml.html.HTMLParser(encoding='utf-8')
+
+# Розмітка, яку libxml2 розбирає інакше, ніж html.parser: CDATA (libxml2 відкидає),
+# теги (пропускаємо, крім </body> і </html> - після них libxml2 відкидає вміст)
+# та іменовані посилання на символи в тексті
+_LXML_MARKUP_FIXES = re.compile(r'<!\[CDATA\[(.*?)\]\]>|(<[^>]*>)|&([a-zA-Z][-.a-zA-Z0-9]*);?', re.DOTALL)
+_DOCUMENT_END_TAG = re.compile(r'</(?:body|html)\s*>', re.IGNORECASE)
+
+# CDATA стає окремим елементом: його текст html.parser повертає навіть усередині <template>
+_LXML_CDATA_TAG = 'bs-cdata'
+
+# Елементи, текст яких get_text не повертає і до видалення REMOVED_ELEMENTS (для тексту посилань)
+_ANCHOR_REMOVED_ELEMENTS = ('script', 'style')
+
+# Кодування з <meta charset=...> або <meta http-equiv=... content="...; charset=...">
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+
+# Скільки байт тіла без вказаного кодування аналізує charset_normalizer
+CHARSET_DETECT_BYTES = 64 * 1024
+
+def decode_html(body: bytes, charset: Optional[str] = None) -> str:
+    """
+    Декодує тіло сторінки кодуванням із заголовка чи <meta>. Якщо його не вказано:
+    UTF-8, визначене charset_normalizer кодування, cp1251 (типове для старих
+    українських та російських сайтів) і лише в крайньому разі UTF-8 із заміною
+    некоректних байтів
+    """
+    if not charset:
+        match = _META_CHARSET.search(body[:4096])
+        charset = match.group(1).decode('ascii') if match else None
+    
+    if charset:
+        try:
+            return body.decode(charset, errors='replace')
+        except LookupError:
+            pass
+    
+    try:
+        return body.decode('utf-8')
+    except UnicodeDecodeError:
+        pass
+    
+    # Короткі тексти визначаються ненадійно - без розпізнаної мови не довіряємо результату
+    detected = charset_normalizer.from_bytes(body[:CHARSET_DETECT_BYTES]).best()
+    if detected is not None and detected.coherence > 0:
+        return body.decode(detected.encoding, errors='replace')
+    
+    try:
+        return body.decode('cp1251')
+    except UnicodeDecodeError:
+        return body.decode('utf-8', errors='replace')
+
+def anchor_text(text: str) -> str:
+    """Текст посилання без зайвих пробілів, обрізаний до ANCHOR_TEXT_LENGTH символів"""
+    return ' '.join(text.split())[:ANCHOR_TEXT_LENGTH]
+
+def extract_links(soup: BeautifulSoup, current_url: str, domain: str) -> List[Tuple[str, str]]:
+    """Витягує очищені посилання того ж домену з HTML сторінки разом з текстом посилань"""
+    anchors = ((link['href'], anchor_text(link.get_text(' ', strip=True)))
+               for link in soup.find_all('a', href=True))
+    return filter_links(anchors, current_url, domain)
+
+def extract_text(soup: BeautifulSoup) -> str:
+    """Витягує очищений текст сторінки (без меню, скриптів тощо)"""
+    # Видаляємо непотрібні елементи
+    for element in soup(REMOVED_ELEMENTS):
+        element.decompose()
+    
+    text_content = soup.get_text(separator=' ', strip=True)
+    return re.sub(r'\s+', ' ', text_content)
+
+def filter_links(anchors: Iterable[Tuple[str, str]], current_url: str, domain: str) -> List[Tuple[str, str]]:
+    """Залишає канонічні посилання того ж домену: пари (URL, текст посилання)"""
+    links = []
+    
+    for href, text in anchors:
+        full_url = urljoin(current_url, href)
+        netloc = urlparse(full_url).netloc.lower()
+        
+        # Перевіряємо чи посилання з того ж домену
+        if not (netloc.endswith(domain) or
+                netloc == domain or
+                netloc == f"www.{domain}"):
+            continue
+        
+        # Фільтруємо небажані посилання
+        if any(skip in full_url.lower() for skip in SKIP_URL_PATTERNS):
+            continue
+        
+        canonical_url = canonicalize_url(full_url)
+        if canonical_url:
+            links.append((canonical_url, text))
+    
+    return links
+
+def canonical_link(href: Optional[str], current_url: str, domain: str) -> Optional[str]:
+    """Канонічна адреса сторінки з <link rel="canonical">, якщо вона на тому ж домені"""
+    if not href:
+        return None
+    links = filter_links([(href.strip(), '')], current_url, domain)
+    return links[0][0] if links else None
+
+def _parse_page_bs4(content: str, current_url: str, domain: str,
+                    with_links: bool, with_text: bool) -> ParsedPage:
+    """Розбір через BeautifulSoup з html.parser (чистий Python)"""
+    soup = BeautifulSoup(content, 'html.parser')
+    
+    canonical = soup.find(lambda tag: tag.name == 'link' and tag.get('href') and
+                          'canonical' in [rel.lower() for rel in tag.get('rel', [])])
+    canonical = canonical_link(canonical['href'] if canonical else None, current_url, domain)
+    
+    # Посилання збираємо до видалення меню та футера
+    links = extract_links(soup, current_url, domain) if with_links else []
+    text_content = extract_text(soup) if with_text else None
+    
+    return links, text_content, canonical
+
+def _lxml_markup_fix(match: re.Match) -> str:
+    cdata, tag, entity = match.groups()
+    if cdata is not None:
+        return f'<{_LXML_CDATA_TAG}>{html.escape(cdata, quote=False)}</{_LXML_CDATA_TAG}>'
+    if tag is not None:
+        return '' if _DOCUMENT_END_TAG.fullmatch(tag) else tag
+    
+    # Як html.parser у BeautifulSoup: відома назва - символ, невідома - "&назва" без ";"
+    character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(entity)
+    if character is None:
+        return f'&amp;{entity}'
+    return ''.join(f'&#x{ord(char):x};' for char in character)
+
+def _lxml_text(root, removed: Iterable[str] = REMOVED_ELEMENTS, hidden: bool = False) -> str:
+    """
+    Текст дерева lxml у тому ж вигляді, що й extract_text: текстові вузли в порядку
+    документа без removed елементів, коментарів та вмісту <template> (крім CDATA),
+    кожен обрізаний і розділений пробілом
+    """
+    chunks = []
+    stack = [(root, hidden)]
+    
+    # Обхід без рекурсії; drop_tree() не підходить - він зливає сусідні текстові вузли
+    while stack:
+        item, hidden = stack.pop()
+        if isinstance(item, str):
+            if not hidden:
+                chunks.append(item)
+            continue
+        
+        # Коментарі та інструкції обробки мають нерядковий tag - їх текст пропускаємо
+        if not isinstance(item.tag, str) or item.tag in removed:
+            continue
+        
+        if item.tag == 'template':
+            hidden = True
+        elif item.tag == _LXML_CDATA_TAG:
+            hidden = False
+        
+        if item.text and not hidden:
+            chunks.append(item.text)
+        for child in reversed(item):
+            if child.tail:
+                stack.append((child.tail, hidden))
+            stack.append((child, hidden))
+    
+    text_content = ' '.join(chunk.strip() for chunk in chunks if chunk.strip())
+    return re.sub(r'\s+', ' ', text_content)
+
+def _lxml_anchor_text(element) -> str:
+    # Посилання бере текст до видалення REMOVED_ELEMENTS, як extract_links
+    in_template = any(ancestor.tag == 'template' for ancestor in element.iterancestors())
+    return anchor_text(_lxml_text(element, _ANCHOR_REMOVED_ELEMENTS, in_template))
+
+def _parse_page_lxml(content: str, current_url: str, domain: str,
+                     with_links: bool, with_text: bool) -> ParsedPage:
+    """Швидкий розбір через lxml (libxml2)"""
+    markup = _LXML_MARKUP_FIXES.sub(_lxml_markup_fix, content)
+    try:
+        root = lxml.html.document_fromstring(markup.encode('utf-8'), parser=_LXML_PARSER)
+    except (lxml.etree.ParserError, ValueError):
+        return _parse_page_bs4(content, current_url, domain, with_links, with_text)
+    
+    canonical = next((element.get('href') for element in root.iter('link')
+                      if 'canonical' in (element.get('rel') or '').lower().split() and element.get('href')), None)
+    canonical = canonical_link(canonical, current_url, domain)
+    
+    links = []
+    if with_links:
+        anchors = ((element.get('href'), _lxml_anchor_text(element))
+                   for element in root.iter('a') if element.get('href') is not None)
+        links = filter_links(anchors, current_url, domain)
+    text_content = _lxml_text(root) if with_text else None
+    
+    return links, text_content, canonical
+
+# Бекенди парсингу; результат (посилання та текст) однаковий, крім неправильно вкладених тегів
+PARSER_BACKENDS = {
+    'html.parser': _parse_page_bs4,
+    'lxml': _parse_page_lxml,
+}
+
+# Бекенд за замовчуванням; lxml швидший, але неправильно вкладені теги розбирає інакше
+HTML_PARSER_BACKEND = os.getenv('HTML_PARSER_BACKEND', 'html.parser').lower()
+
+def parse_page(content: str, current_url: str, domain: str,
+               with_links: bool = True, with_text: bool = True,
+               backend: str = None) -> ParsedPage:
+    """
+    Один розбір HTML дає посилання (з текстом посилань), текст сторінки
+    та її канонічну адресу з <link rel="canonical">
+    """
+    parser = PARSER_BACKENDS.get(backend or HTML_PARSER_BACKEND, _parse_page_bs4)
+    return parser(content, current_url, domain, with_links, with_text)
+
+def available_cpus() -> int:
+    """
+    CPU, доступні процесу: з урахуванням прив'язки до ядер (cpuset) та квоти
+    cgroup v2 (docker --cpus), а не всі CPU хоста, як os.cpu_count()
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    
+    return cpus
+
+# Пул для парсингу: "process" (за замовчуванням), "thread" або "inline" (в event loop)
+PARSE_EXECUTOR = os.getenv('PARSE_EXECUTOR', 'process').lower()
+# Пул свій у кожному процесі (API та кожен воркер), тому за замовчуванням він невеликий
+PARSE_WORKERS_DEFAULT_MAX = 4
+PARSE_WORKERS = get_env_int('PARSE_WORKERS', 0) or min(available_cpus(), PARSE_WORKERS_DEFAULT_MAX)
+
+_parse_executor: Optional[Executor] = None
+
+def get_parse_executor() -> Optional[Executor]:
+    """Спільний на процес пул для парсингу (None - парсимо в event loop)"""
+    global _parse_executor
+    
+    if _parse_executor is None:
+        if PARSE_EXECUTOR == 'process':
+            _parse_executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        elif PARSE_EXECUTOR == 'thread':
+            _parse_executor = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix='html-parser')
+    
+    return _parse_executor
+
+def shutdown_parse_executor():
+    """Зупинка пулу парсингу"""
+    global _parse_executor
+    
+    if _parse_executor is not None:
+        _parse_executor.shutdown(wait=False, cancel_futures=True)
+        _parse_executor = None
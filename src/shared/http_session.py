@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Спільна на процес HTTP сесія aiohttp: пул з'єднань з keep-alive, кешем DNS
+та лімітами на всі хости і на один хост. З'єднання перевикористовуються між
+етапами аналізу та між одночасними аналізами.
+"""
+
+import asyncio
+from collections import Counter
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+from shared.utils import get_env_int, get_env_float
+
+# Налаштування пулу з'єднань
+HTTP_POOL_LIMIT = get_env_int('HTTP_POOL_LIMIT', 100)
+HTTP_POOL_LIMIT_PER_HOST = get_env_int('HTTP_POOL_LIMIT_PER_HOST', 10)
+HTTP_DNS_CACHE_TTL = get_env_int('HTTP_DNS_CACHE_TTL', 300)
+HTTP_KEEPALIVE_TIMEOUT = get_env_float('HTTP_KEEPALIVE_TIMEOUT', 30.0)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+_stats = Counter()
+
+def _count(name: str):
+    """Обробник трасування, що збільшує лічильник"""
+    async def handler(session, context, params):
+        _stats[name] += 1
+    return handler
+
+def _create_trace_config() -> aiohttp.TraceConfig:
+    """Лічильники запитів, з'єднань та звернень до кешу DNS"""
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_count('requests'))
+    trace_config.on_request_exception.append(_count('request_errors'))
+    trace_config.on_connection_create_end.append(_count('connections_created'))
+    trace_config.on_connection_reuseconn.append(_count('connections_reused'))
+    trace_config.on_connection_queued_start.append(_count('connections_queued'))
+    trace_config.on_dns_cache_hit.append(_count('dns_cache_hits'))
+    trace_config.on_dns_cache_miss.append(_count('dns_cache_misses'))
+    return trace_config
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Спільна сесія поточного event loop (створюється при першому зверненні)"""
+    global _session, _session_loop
+    
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            enable_cleanup_closed=True
+        )
+        _session = aiohttp.ClientSession(
+            headers=DEFAULT_HEADERS,
+            connector=connector,
+            trace_configs=[_create_trace_config()]
+        )
+        _session_loop = loop
+        _stats['sessions_created'] += 1
+    
+    return _session
+
+async def close_http_session():
+    """Закриття спільної сесії при зупинці сервісу"""
+    global _session, _session_loop
+    
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+def get_http_pool_stats() -> Dict[str, Any]:
+    """Статистика пулу з'єднань для підбору його розміру"""
+    stats = {
+        'limit': HTTP_POOL_LIMIT,
+        'limit_per_host': HTTP_POOL_LIMIT_PER_HOST,
+        'dns_cache_ttl': HTTP_DNS_CACHE_TTL,
+        'keepalive_timeout': HTTP_KEEPALIVE_TIMEOUT,
+        'active': False,
+        'connections_in_use': 0,
+        'connections_idle': 0,
+        'counters': dict(_stats)
+    }
+    
+    if _session is not None and not _session.closed:
+        connector = _session.connector
+        # Поточний стан пулу доступний лише через внутрішні атрибути з'єднувача
+        stats['active'] = True
+        stats['connections_in_use'] = len(getattr(connector, '_acquired', ()))
+        stats['connections_idle'] = sum(len(conns) for conns in getattr(connector, '_conns', {}).values())
+    
+    reused = _stats['connections_reused']
+    total = reused + _stats['connections_created']
+    stats['reuse_rate'] = round(reused / total, 3) if total else 0.0
+    
+    return stats
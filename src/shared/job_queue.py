@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Надійна черга задач у Redis: задача, взята воркером, лишається в черзі до
+підтвердження (ack); якщо воркер не підтвердив її за visibility_timeout
+(впав або завис), задача знову стає доступною іншим воркерам (at-least-once)
+"""
+
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from shared.redis_client import RedisClient
+
+# Повертає прострочені задачі в чергу та атомарно видає наступну з орендою
+_RESERVE = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, job_id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], job_id)
+    redis.call('LPUSH', KEYS[1], job_id)
+end
+
+while true do
+    local job_id = redis.call('LPOP', KEYS[1])
+    if not job_id then
+        return nil
+    end
+    local payload = redis.call('HGET', KEYS[3], job_id)
+    if payload then
+        redis.call('ZADD', KEYS[2], tonumber(ARGV[1]) + tonumber(ARGV[2]), job_id)
+        local attempts = redis.call('HINCRBY', KEYS[4], job_id, 1)
+        return {job_id, payload, attempts}
+    end
+end
+"""
+
+@dataclass
+class QueuedJob:
+    """Задача, видана воркеру"""
+    id: str
+    payload: Dict[str, Any]
+    attempts: int
+
+class JobQueue:
+    """
+    Черга на списку (pending), хешах з даними та кількістю спроб і відсортованій
+    множині оренд (leases) з часом, до якого воркер має підтвердити задачу.
+    Після max_attempts видач задача переходить у список dead, а on_bury(job_id, payload)
+    дозволяє записати її остаточний стан (задача вже не буде виконана).
+    """
+    
+    def __init__(self, redis: RedisClient, name: str, visibility_timeout: float = 300.0,
+                 max_attempts: int = 3,
+                 on_bury: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                 clock: Callable[[], float] = time.time):
+        self.redis = redis
+        self.name = name
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.on_bury = on_bury
+        # Час оренд; спільний для всіх воркерів, тому за годинником, а не monotonic
+        self.clock = clock
+    
+    def key(self, name: str) -> str:
+        return f"queue:{self.name}:{name}"
+    
+    def enqueue(self, job_id: str, payload: Dict[str, Any]) -> bool:
+        """Додає задачу в кінець черги; False, якщо Redis недоступний"""
+        if not self.redis.hset(self.key('jobs'), job_id, payload):
+            return False
+        return bool(self.redis.rpush(self.key('pending'), job_id))
+    
+    def reserve(self) -> Optional[QueuedJob]:
+        """Бере наступну задачу на visibility_timeout секунд або None, якщо черга порожня"""
+        result = self.redis.eval(
+            _RESERVE,
+            [self.key('pending'), self.key('leases'), self.key('jobs'), self.key('attempts')],
+            [self.clock(), self.visibility_timeout]
+        )
+        if not result:
+            return None
+        
+        job = QueuedJob(id=result[0], payload=json.loads(result[1]), attempts=int(result[2]))
+        if job.attempts > self.max_attempts:
+            # Задача вже кілька разів "вбивала" воркер - не видаємо її знову
+            self._bury(job.id, job.payload)
+            return None
+        return job
+    
+    def extend(self, job_id: str):
+        """Подовжує оренду задачі, яка ще виконується"""
+        self.redis.zadd(self.key('leases'), {job_id: self.clock() + self.visibility_timeout})
+    
+    def ack(self, job_id: str):
+        """Задачу виконано - видаляємо її з черги"""
+        self.redis.zrem(self.key('leases'), job_id)
+        self.redis.hdel(self.key('jobs'), job_id)
+        self.redis.hdel(self.key('attempts'), job_id)
+    
+    def release(self, job_id: str):
+        """Повертає задачу на початок черги (воркер зупиняється, не завершивши її)"""
+        if self.redis.zrem(self.key('leases'), job_id):
+            self.redis.hincrby(self.key('attempts'), job_id, -1)
+            self.redis.lpush(self.key('pending'), job_id)
+    
+    def fail(self, job_id: str):
+        """Невдала спроба: задача повторюється, поки не вичерпано max_attempts"""
+        self.redis.zrem(self.key('leases'), job_id)
+        attempts = int(self.redis.hget(self.key('attempts'), job_id) or 0)
+        if attempts >= self.max_attempts:
+            self._bury(job_id)
+        else:
+            self.redis.rpush(self.key('pending'), job_id)
+    
+    def _bury(self, job_id: str, payload: Optional[Dict[str, Any]] = None):
+        if payload is None:
+            payload = self.redis.hget(self.key('jobs'), job_id)
+        
+        self.redis.zrem(self.key('leases'), job_id)
+        self.redis.hdel(self.key('jobs'), job_id)
+        self.redis.hdel(self.key('attempts'), job_id)
+        self.redis.rpush(self.key('dead'), job_id)
+        
+        if self.on_bury is not None and payload is not None:
+            self.on_bury(job_id, payload)
+    
+    def stats(self) -> Dict[str, int]:
+        """Кількість задач у черзі, у виконанні та відкинутих"""
+        return {
+            'pending': self.redis.llen(self.key('pending')),
+            'in_progress': self.redis.zcard(self.key('leases')),
+            'dead': self.redis.llen(self.key('dead'))
+        }
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Багатошаблонний пошук ключових слів (Aho-Corasick)
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+def fold_case(text: str) -> str:
+    """Переводить текст у нижній регістр, зберігаючи позиції символів"""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    
+    # Деякі символи (напр. 'İ') при lower() розширюються - беремо перший символ, як і re.IGNORECASE
+    return ''.join(ch.lower()[0] for ch in text)
+
+class KeywordMatcher:
+    """
+    Автомат Aho-Corasick для регістронезалежного пошуку всіх ключових слів
+    за один прохід по тексту. Будується один раз на аналіз.
+    """
+    
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = list(dict.fromkeys(keyword for keyword in keywords if keyword))
+        
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+        
+        # Унікальні шаблони (у нижньому регістрі) та ключові слова, що їм відповідають
+        self._lengths: List[int] = []
+        self._pattern_keywords: List[List[str]] = []
+        
+        self._build()
+    
+    def _build(self):
+        """Побудова бору та суфіксних посилань"""
+        pattern_index: Dict[str, int] = {}
+        
+        for keyword in self.keywords:
+            pattern = fold_case(keyword)
+            index = pattern_index.get(pattern)
+            
+            if index is None:
+                index = pattern_index[pattern] = len(self._lengths)
+                self._lengths.append(len(pattern))
+                self._pattern_keywords.append([])
+                
+                state = 0
+                for ch in pattern:
+                    next_state = self._goto[state].get(ch)
+                    if next_state is None:
+                        next_state = len(self._goto)
+                        self._goto[state][ch] = next_state
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._output.append(())
+                    state = next_state
+                self._output[state] += (index,)
+            
+            self._pattern_keywords[index].append(keyword)
+        
+        # Суфіксні посилання обходом у ширину
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(ch, 0)
+                self._output[next_state] += self._output[self._fail[next_state]]
+    
+    def find_all(self, text: str) -> Dict[str, List[Tuple[int, int]]]:
+        """
+        Повертає для кожного знайденого ключового слова список позицій (start, end).
+        Як і re.findall, входження одного слова не перекриваються між собою.
+        """
+        if not self._lengths or not text:
+            return {}
+        
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        lengths = self._lengths
+        
+        spans: Dict[int, List[Tuple[int, int]]] = {}
+        last_end: Dict[int, int] = {}
+        state = 0
+        
+        for position, ch in enumerate(fold_case(text), 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            
+            if output[state]:
+                for index in output[state]:
+                    start = position - lengths[index]
+                    if start >= last_end.get(index, 0):
+                        last_end[index] = position
+                        spans.setdefault(index, []).append((start, position))
+        
+        result = {}
+        for index, positions in spans.items():
+            for keyword in self._pattern_keywords[index]:
+                result[keyword] = positions
+        return result
+
+def extract_snippet(text: str, start: int, end: int, context_length: int = 200, max_words: int = 40) -> str:
+    """Витягує контекст навколо входження ключового слова за його позицією в тексті"""
+    context = text[max(0, start - context_length):end + context_length].strip()
+    
+    # Обмежуємо кількість слів
+    words = context.split(maxsplit=max_words)
+    if len(words) > max_words:
+        context = ' '.join(words[:max_words]) + "..."
+    
+    return f"...{context}..."
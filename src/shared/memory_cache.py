@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Обмежений кеш у пам'яті процесу: LRU з TTL, лімітом кількості записів та
+бюджетом пам'яті за приблизним розміром об'єктів
+"""
+
+import heapq
+import itertools
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+def approximate_size(obj: Any) -> int:
+    """
+    Приблизний розмір об'єкта в пам'яті (байт): sys.getsizeof для самого об'єкта
+    та всіх вкладених контейнерів, рядків і полів pydantic моделей; спільні об'єкти
+    рахуються один раз
+    """
+    seen = set()
+    stack = [obj]
+    size = 0
+    
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        
+        if isinstance(item, BaseModel):
+            stack.extend(item.__dict__.values())
+        elif isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, '__dict__') and not isinstance(item, type):
+            stack.append(item.__dict__)
+    
+    return size
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    expires_at: float
+    # Номер запису в купі строків дії (старі елементи купи для ключа ігноруються)
+    seq: int
+    # Значення ніде більше не збережене - при витісненні передається в on_spill
+    spill: bool
+
+class BoundedCache:
+    """
+    LRU кеш: запис живе до свого TTL, а при перевищенні max_entries чи max_bytes
+    витісняються найдавніше використані. Записи з spill=True при витісненні
+    чи закінченні TTL передаються в on_spill(key, value), а не просто видаляються.
+    Строки дії - у купі (heapq): set() знімає з неї лише записи, що вже закінчились,
+    а не переглядає весь кеш.
+    """
+    
+    def __init__(self, max_bytes: int, max_entries: int = 0,
+                 on_spill: Optional[Callable[[Hashable, Any], None]] = None,
+                 sizeof: Callable[[Any], int] = approximate_size,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.on_spill = on_spill
+        self.sizeof = sizeof
+        self.clock = clock
+        
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        # (expires_at, seq, key); замінені та видалені записи лишаються в купі до її стиснення
+        self._expiry: List[Tuple[float, int, Hashable]] = []
+        self._seq = itertools.count()
+        self.bytes = 0
+        self.counters = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'spilled': 0
+        }
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Значення за ключем (і позначка нещодавнього використання) або None"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= self.clock():
+            self._remove(key, 'expirations')
+            entry = None
+        
+        self.counters['hits' if entry is not None else 'misses'] += 1
+        if entry is None:
+            return None
+        
+        self._entries.move_to_end(key)
+        return entry.value
+    
+    def set(self, key: Hashable, value: Any, ttl: float, spill: bool = False):
+        """Додає або замінює запис і витісняє старі, поки кеш не вкладеться в ліміти"""
+        self.pop(key)
+        entry = _Entry(value=value, size=self.sizeof(value), expires_at=self.clock() + ttl,
+                       seq=next(self._seq), spill=spill)
+        self._entries[key] = entry
+        self.bytes += entry.size
+        heapq.heappush(self._expiry, (entry.expires_at, entry.seq, key))
+        
+        self._expire()
+        while self._entries and (self.bytes > self.max_bytes or
+                                 (self.max_entries and len(self._entries) > self.max_entries)):
+            self._remove(next(iter(self._entries)), 'evictions')
+    
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Видаляє запис без передачі в on_spill"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self.bytes -= entry.size
+        return entry.value
+    
+    def stats(self) -> Dict[str, int]:
+        """Поточний розмір кешу та лічильники"""
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'max_entries': self.max_entries,
+            **self.counters
+        }
+    
+    def _expire(self):
+        now = self.clock()
+        while self._expiry and self._expiry[0][0] <= now:
+            _, seq, key = heapq.heappop(self._expiry)
+            entry = self._entries.get(key)
+            if entry is not None and entry.seq == seq:
+                self._remove(key, 'expirations')
+        
+        # Купа з елементами замінених і видалених записів не росте без меж
+        if len(self._expiry) > 2 * len(self._entries) + 64:
+            self._expiry = [(entry.expires_at, entry.seq, key) for key, entry in self._entries.items()]
+            heapq.heapify(self._expiry)
+    
+    def _remove(self, key: Hashable, counter: str):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        self.counters[counter] += 1
+        
+        if entry.spill and self.on_spill is not None:
+            self.on_spill(key, entry.value)
+            self.counters['spilled'] += 1
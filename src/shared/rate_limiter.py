@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Адаптивний ліміт запитів краулера по хостах: інтервал між запитами підлаштовується
+під затримку відповідей та 429/503 (з урахуванням Retry-After), а після серії
+збоїв хост вимикається (circuit breaker) на час охолодження
+"""
+
+import asyncio
+import random
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+# Відповіді, що означають перевантаження сервера - пригальмовуємо
+THROTTLE_STATUSES = {429, 503}
+
+# Тимчасові помилки, після яких запит варто повторити
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """Хост тимчасово вимкнено після серії збоїв"""
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Retry-After у секундах (число або HTTP дата відносно now, за замовчуванням time.time())"""
+    if not value:
+        return None
+    
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - (time.time() if now is None else now))
+    except (TypeError, ValueError):
+        return None
+
+class _HostState:
+    """Стан одного хоста"""
+    
+    def __init__(self, max_per_host: int, interval: float):
+        self.semaphore = asyncio.Semaphore(max_per_host)
+        self.interval = interval
+        self.next_allowed = 0.0
+        self.latency = None
+        self.failures = 0
+        self.open_until = 0.0
+        self.circuit_opened = 0
+        # Охолодження минуло, але успішної відповіді ще не було: один збій знову вимикає хост
+        self.half_open = False
+
+class HostRateLimiter:
+    """
+    Ввічливість краулера по хостах: ліміт одночасних запитів, інтервал між запитами
+    від min_delay до max_delay, що зростає при повільних відповідях та 429/503 і
+    поступово зменшується при швидких, та circuit breaker після failure_threshold
+    збоїв поспіль. Після охолодження хост напіввідкритий: перша успішна відповідь
+    його вмикає, перший збій - знову вимикає. schedule (з методом reserve(host,
+    interval) -> пауза в секундах) замінює локальний розклад запитів спільним,
+    напр. для кількох реплік
+    """
+    
+    def __init__(self, max_per_host: int = 5, min_delay: float = 0.1, max_delay: float = 30.0,
+                 target_latency: float = 2.0, failure_threshold: int = 5, circuit_cooldown: float = 60.0,
+                 stats: Dict[str, int] = None, schedule=None,
+                 clock: Callable[[], float] = time.monotonic, wall_clock: Callable[[], float] = time.time):
+        self.max_per_host = max(1, max_per_host)
+        self.min_delay = min_delay
+        self.max_delay = max(max_delay, min_delay)
+        self.target_latency = target_latency
+        self.failure_threshold = max(1, failure_threshold)
+        self.circuit_cooldown = circuit_cooldown
+        self._hosts: Dict[str, _HostState] = {}
+        # Лічильники rate_limited_responses та circuit_breaker_opened
+        self.stats = stats if stats is not None else defaultdict(int)
+        self.schedule = schedule
+        self.clock = clock
+        # Для Retry-After у вигляді HTTP дати
+        self.wall_clock = wall_clock
+    
+    def _state(self, url: str) -> _HostState:
+        host = urlparse(url).netloc.lower()
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.max_per_host, self.min_delay)
+        return state
+    
+    def is_open(self, url: str) -> bool:
+        """Чи вимкнено хост зараз"""
+        return self._state(url).open_until > self.clock()
+    
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """Займає слот для запиту до хоста з URL; CircuitOpenError, якщо хост вимкнено"""
+        state = self._state(url)
+        if state.open_until > self.clock():
+            raise CircuitOpenError(urlparse(url).netloc)
+        
+        async with state.semaphore:
+            # Резервуємо наступний час старту, щоб запити до хоста йшли з інтервалом
+            now = self.clock()
+            start_at = max(now, state.next_allowed)
+            interval = max(state.interval, self.min_delay)
+            if self.schedule is not None:
+                # Retry-After (next_allowed) враховуємо і для спільного розкладу
+                start_at += self.schedule.reserve(urlparse(url).netloc.lower(), interval)
+            else:
+                state.next_allowed = start_at + interval
+            if start_at > now:
+                await asyncio.sleep(start_at - now)
+            
+            # Поки чекали, хост могли вимкнути
+            if state.open_until > self.clock():
+                raise CircuitOpenError(urlparse(url).netloc)
+            yield
+    
+    def record_response(self, url: str, status: int, latency: float, retry_after: Optional[str] = None):
+        """Враховує відповідь сервера: затримку, 429/503 та Retry-After"""
+        state = self._state(url)
+        state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+        
+        if status in THROTTLE_STATUSES:
+            self.stats['rate_limited_responses'] += 1
+            state.interval = min(self.max_delay, max(state.interval * 2, self.min_delay * 2))
+            
+            wait = parse_retry_after(retry_after, self.wall_clock())
+            if wait is not None and wait > self.max_delay:
+                # Сервер просить чекати довше, ніж ми готові - вимикаємо хост
+                self._open(state, min(wait, self.circuit_cooldown))
+                return
+            if wait is not None:
+                state.next_allowed = max(state.next_allowed, self.clock() + wait)
+            self._fail(state)
+            return
+        
+        if status >= 500:
+            self._fail(state)
+            return
+        
+        state.failures = 0
+        state.half_open = False
+        # AIMD: повільні відповіді збільшують інтервал, швидкі - поступово зменшують
+        if state.latency > self.target_latency:
+            state.interval = min(self.max_delay, max(state.interval, self.min_delay) * 1.5)
+        else:
+            state.interval = max(self.min_delay, state.interval * 0.9)
+    
+    def record_failure(self, url: str):
+        """Враховує таймаут або помилку з'єднання"""
+        state = self._state(url)
+        state.interval = min(self.max_delay, max(state.interval, self.min_delay) * 1.5)
+        self._fail(state)
+    
+    def _fail(self, state: _HostState):
+        state.failures += 1
+        # Напіввідкритий хост (охолодження минуло) вимикається першим же збоєм
+        if state.failures >= self.failure_threshold or (state.half_open and state.open_until <= self.clock()):
+            self._open(state, self.circuit_cooldown)
+    
+    def _open(self, state: _HostState, duration: float):
+        state.open_until = self.clock() + duration
+        state.failures = 0
+        state.half_open = True
+        state.circuit_opened += 1
+        self.stats['circuit_breaker_opened'] += 1
+    
+    def backoff(self, attempt: int, base: float = 0.5) -> float:
+        """Пауза перед повтором: експоненційна з випадковим розкидом (jitter)"""
+        delay = min(self.max_delay, base * (2 ** attempt))
+        return random.uniform(delay / 2, delay * 1.5)
+    
+    def host_stats(self) -> Dict[str, Any]:
+        """Поточний стан хостів"""
+        now = self.clock()
+        return {
+            host: {
+                'interval': round(state.interval, 3),
+                'latency': round(state.latency, 3) if state.latency is not None else None,
+                'circuit_open': state.open_until > now,
+                'circuit_half_open': state.half_open and state.open_until <= now,
+                'circuit_opened': state.circuit_opened
+            }
+            for host, state in self._hosts.items()
+        }
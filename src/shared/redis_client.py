@@ -197,6 +197,17 @@ class RedisClient:
             print(f"Помилка hgetall з Redis: {e}")
             return {}
     
+    def hincrby(self, name: str, key: str, amount: int = 1) -> int:
+        """Збільшення числового значення в хеші"""
+        if not self._is_connected():
+            return 0
+            
+        try:
+            return self.client.hincrby(name, key, amount)
+        except Exception as e:
+            print(f"Помилка hincrby в Redis: {e}")
+            return 0
+    
     def hdel(self, name: str, key: str) -> bool:
         """Видалення ключа з хешу"""
         if not self._is_connected():
@@ -282,6 +293,174 @@ class RedisClient:
             print(f"Помилка llen з Redis: {e}")
             return 0
     
+    # Методи для роботи з відсортованими множинами
+    def zadd(self, name: str, mapping: Dict[str, float]) -> int:
+        """Додавання елементів у відсортовану множину"""
+        if not self._is_connected():
+            return 0
+            
+        try:
+            return self.client.zadd(name, mapping)
+        except Exception as e:
+            print(f"Помилка zadd в Redis: {e}")
+            return 0
+    
+    def zcard(self, name: str) -> int:
+        """Кількість елементів відсортованої множини"""
+        if not self._is_connected():
+            return 0
+            
+        try:
+            return self.client.zcard(name)
+        except Exception as e:
+            print(f"Помилка zcard з Redis: {e}")
+            return 0
+    
+    def zrange(self, name: str, start: int, end: int, withscores: bool = False) -> List[Any]:
+        """Елементи відсортованої множини за рангом (від меншого score); withscores - пари (елемент, score)"""
+        if not self._is_connected():
+            return []
+            
+        try:
+            return self.client.zrange(name, start, end, withscores=withscores)
+        except Exception as e:
+            print(f"Помилка zrange з Redis: {e}")
+            return []
+    
+    def zrem(self, name: str, *values: str) -> int:
+        """Видалення елементів з відсортованої множини"""
+        if not self._is_connected() or not values:
+            return 0
+            
+        try:
+            return self.client.zrem(name, *values)
+        except Exception as e:
+            print(f"Помилка zrem в Redis: {e}")
+            return 0
+    
+    def zremrangebyscore(self, name: str, min_score: float, max_score: float) -> int:
+        """Видалення елементів відсортованої множини з score у діапазоні"""
+        if not self._is_connected():
+            return 0
+            
+        try:
+            return self.client.zremrangebyscore(name, min_score, max_score)
+        except Exception as e:
+            print(f"Помилка zremrangebyscore в Redis: {e}")
+            return 0
+    
+    def zpopmin(self, name: str) -> Optional[tuple]:
+        """Вилучення елемента з найменшим score: (елемент, score) або None"""
+        if not self._is_connected():
+            return None
+            
+        try:
+            items = self.client.zpopmin(name)
+            return items[0] if items else None
+        except Exception as e:
+            print(f"Помилка zpopmin з Redis: {e}")
+            return None
+    
+    def bzpopmin(self, name: str, timeout: float) -> Optional[tuple]:
+        """Блокуюче вилучення елемента з найменшим score (чекає до timeout с): (елемент, score) або None"""
+        if not self._is_connected():
+            return None
+            
+        try:
+            item = self.client.bzpopmin(name, timeout)
+            return (item[1], item[2]) if item else None
+        except Exception as e:
+            print(f"Помилка bzpopmin з Redis: {e}")
+            return None
+    
+    # Методи для роботи з множинами
+    def sadd(self, name: str, *values: Any) -> int:
+        """Додавання елементів у множину; повертає кількість нових"""
+        if not self._is_connected() or not values:
+            return 0
+            
+        try:
+            return self.client.sadd(name, *values)
+        except Exception as e:
+            print(f"Помилка sadd в Redis: {e}")
+            return 0
+    
+    def srem(self, name: str, *values: Any) -> int:
+        """Видалення елементів з множини"""
+        if not self._is_connected() or not values:
+            return 0
+            
+        try:
+            return self.client.srem(name, *values)
+        except Exception as e:
+            print(f"Помилка srem в Redis: {e}")
+            return 0
+    
+    def sismember(self, name: str, value: Any) -> bool:
+        """Перевірка належності елемента множині"""
+        if not self._is_connected():
+            return False
+            
+        try:
+            return bool(self.client.sismember(name, value))
+        except Exception as e:
+            print(f"Помилка sismember з Redis: {e}")
+            return False
+    
+    def smembers(self, name: str) -> List[str]:
+        """Всі елементи множини"""
+        if not self._is_connected():
+            return []
+            
+        try:
+            return list(self.client.smembers(name))
+        except Exception as e:
+            print(f"Помилка smembers з Redis: {e}")
+            return []
+    
+    def scard(self, name: str) -> int:
+        """Кількість елементів множини"""
+        if not self._is_connected():
+            return 0
+            
+        try:
+            return self.client.scard(name)
+        except Exception as e:
+            print(f"Помилка scard з Redis: {e}")
+            return 0
+    
+    def eval(self, script: str, keys: List[str], args: List[Any]) -> Optional[Any]:
+        """Атомарне виконання Lua скрипта"""
+        if not self._is_connected():
+            return None
+            
+        try:
+            return self.client.eval(script, len(keys), *keys, *args)
+        except Exception as e:
+            print(f"Помилка eval в Redis: {e}")
+            return None
+    
+    # Pub/sub
+    def publish(self, channel: str, message: Any) -> bool:
+        """Публікація повідомлення в канал; False, якщо Redis недоступний"""
+        if not self._is_connected():
+            return False
+            
+        try:
+            if isinstance(message, (dict, list)):
+                message = json.dumps(message, ensure_ascii=False)
+            self.client.publish(channel, message)
+            return True
+        except Exception as e:
+            print(f"Помилка publish в Redis: {e}")
+            return False
+    
+    def pubsub(self):
+        """Об'єкт підписки redis-py (None, якщо Redis недоступний)"""
+        if not self._is_connected():
+            return None
+        return self.client.pubsub(ignore_subscribe_messages=True)
+    
     # Кешування з автоматичним TTL
     def cache_set(self, key: str, value: Any, ttl_minutes: int = 60):
         """Кешування з TTL в хвилинах"""
@@ -325,6 +504,23 @@ class RedisClient:
             print(f"Помилка отримання статистики Redis: {e}")
             return {}
 
+# Оренда контрольної точки: береться, якщо вільна або вже належить цьому власнику, з новим TTL
+_CLAIM_CHECKPOINT_LEASE = """
+local owner = redis.call('GET', KEYS[1])
+if owner and owner ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+_RELEASE_CHECKPOINT_LEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
 class CacheManager:
     """Менеджер кешування для різних типів даних"""
     
@@ -339,19 +535,141 @@ class CacheManager:
         """Отримання кешованого результату аналізу"""
         return self.redis.cache_get(f"analysis_result:{task_id}")
     
-    def cache_site_content(self, url: str, content: str, ttl_hours: int = 6):
-        """Кешування контенту сайту"""
+    def cache_task_status(self, task_id: str, status: Dict[str, Any], ttl_hours: int = 24):
+        """Статус задачі аналізу, спільний для API та воркерів"""
+        return self.redis.cache_set(f"analysis_status:{task_id}", status, ttl_hours * 60)
+    
+    def get_cached_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Отримання статусу задачі аналізу"""
+        return self.redis.cache_get(f"analysis_status:{task_id}")
+    
+    def index_task(self, task_id: str, started_at: float):
+        """Додає задачу аналізу до списку задач усіх процесів"""
+        return self.redis.zadd("analysis_tasks", {task_id: started_at})
+    
+    def get_task_ids(self, since: float) -> List[str]:
+        """ID задач аналізу, створених після since (старіші видаляються зі списку)"""
+        self.redis.zremrangebyscore("analysis_tasks", '-inf', f"({since}")
+        return self.redis.zrange("analysis_tasks", 0, -1)
+    
+    def delete_task_state(self, task_id: str) -> bool:
+        """Видалення статусу та результату задачі аналізу"""
+        deleted_status = self.redis.delete(f"analysis_status:{task_id}")
+        deleted_result = self.redis.delete(f"analysis_result:{task_id}")
+        self.redis.zrem("analysis_tasks", task_id)
+        return deleted_status or deleted_result
+    
+    def cache_site_content(self, url: str, content: Any, ttl_hours: int = 6):
+        """Кешування контенту сайту (текст або розібрана сторінка з валідаторами HTTP)"""
         # Хешування URL для безпечного ключа
         import hashlib
         url_hash = hashlib.md5(url.encode()).hexdigest()
         return self.redis.cache_set(f"site_content:{url_hash}", content, ttl_hours * 60)
     
-    def get_cached_site_content(self, url: str) -> Optional[str]:
+    def get_cached_site_content(self, url: str) -> Optional[Any]:
         """Отримання кешованого контенту сайту"""
         import hashlib
         url_hash = hashlib.md5(url.encode()).hexdigest()
         return self.redis.cache_get(f"site_content:{url_hash}")
     
+    def cache_page_matches(self, fingerprint: str, content_hash: str, matches: Dict[str, Any],
+                           ttl_hours: int = 168):
+        """Збіги ключових слів сторінки за хешем її тексту та відбитком набору слів"""
+        return self.redis.cache_set(f"page_matches:{fingerprint}:{content_hash}", matches, ttl_hours * 60)
+    
+    def get_cached_page_matches(self, fingerprint: str, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Отримання збережених збігів сторінки"""
+        return self.redis.cache_get(f"page_matches:{fingerprint}:{content_hash}")
+    
+    def save_crawl_job(self, task_id: str, job: Dict[str, Any], ttl_hours: int = 24):
+        """Параметри незавершеного аналізу для відновлення після перезапуску сервісу"""
+        self.redis.hset(f"crawl_checkpoint:{task_id}", 'job', job)
+        self.redis.sadd("crawl_checkpoints", task_id)
+        return self.redis.expire(f"crawl_checkpoint:{task_id}", ttl_hours * 3600)
+    
+    def save_crawl_checkpoint(self, task_id: str, state: Dict[str, Any], ttl_hours: int = 24):
+        """Контрольна точка краулу: черга, відвідані сторінки та проміжні збіги"""
+        self.redis.hset(f"crawl_checkpoint:{task_id}", 'state', state)
+        return self.redis.expire(f"crawl_checkpoint:{task_id}", ttl_hours * 3600)
+    
+    def get_crawl_checkpoint(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Параметри (job) та стан (state) незавершеного аналізу"""
+        return self.redis.hgetall(f"crawl_checkpoint:{task_id}") or None
+    
+    def claim_crawl_checkpoint(self, task_id: str, owner: str, lease_seconds: int) -> bool:
+        """
+        Оренда контрольної точки процесом, що виконує аналіз: береться, лише якщо
+        попередній власник її не продовжив (процес зупинився), і продовжується тим самим викликом
+        """
+        return self.redis.eval(_CLAIM_CHECKPOINT_LEASE, [f"crawl_checkpoint_lease:{task_id}"],
+                               [owner, int(lease_seconds)]) == 1
+    
+    def release_crawl_checkpoint(self, task_id: str, owner: str):
+        """Звільнення оренди: аналіз відразу зможе продовжити інший процес"""
+        return self.redis.eval(_RELEASE_CHECKPOINT_LEASE, [f"crawl_checkpoint_lease:{task_id}"], [owner])
+    
+    def get_unclaimed_crawl_jobs(self) -> Dict[str, Dict[str, Any]]:
+        """Незавершені аналізи без живого власника: task_id -> параметри (job)"""
+        jobs = {}
+        for task_id in self.redis.smembers("crawl_checkpoints"):
+            if self.redis.exists(f"crawl_checkpoint_lease:{task_id}"):
+                continue
+            
+            job = self.redis.hget(f"crawl_checkpoint:{task_id}", 'job')
+            if job:
+                jobs[task_id] = job
+            elif not self.redis.exists(f"crawl_checkpoint:{task_id}"):
+                # Контрольна точка застаріла (ttl_hours)
+                self.redis.srem("crawl_checkpoints", task_id)
+        return jobs
+    
+    def delete_crawl_checkpoint(self, task_id: str):
+        """Видалення контрольної точки завершеного аналізу"""
+        self.redis.srem("crawl_checkpoints", task_id)
+        self.redis.delete(f"crawl_checkpoint_lease:{task_id}")
+        return self.redis.delete(f"crawl_checkpoint:{task_id}")
+    
+    def cache_llm_response(self, request_hash: str, response: str, ttl_hours: int = 168,
+                           max_entries: int = 1000):
+        """
+        Кешування відповіді LLM за хешем запиту (модель, промпт, параметри).
+        Понад max_entries витісняються записи, які найдовше не використовувались.
+        """
+        self.redis.cache_set(f"llm_response:{request_hash}", {'response': response}, ttl_hours * 60)
+        self.redis.zadd("llm_response:index", {request_hash: time.time()})
+        
+        excess = self.redis.zcard("llm_response:index") - max_entries
+        if excess > 0:
+            evicted = self.redis.zrange("llm_response:index", 0, excess - 1)
+            for evicted_hash in evicted:
+                self.redis.delete(f"llm_response:{evicted_hash}")
+            self.redis.zrem("llm_response:index", *evicted)
+            self.redis.increment("llm_response:stats:evictions", len(evicted))
+    
+    def get_cached_llm_response(self, request_hash: str) -> Optional[str]:
+        """Отримання кешованої відповіді LLM з підрахунком влучань/промахів"""
+        cached = self.redis.cache_get(f"llm_response:{request_hash}")
+        
+        if not isinstance(cached, dict) or 'response' not in cached:
+            self.redis.increment("llm_response:stats:misses")
+            return None
+        
+        self.redis.increment("llm_response:stats:hits")
+        self.redis.zadd("llm_response:index", {request_hash: time.time()})
+        return cached['response']
+    
+    def get_llm_cache_stats(self) -> Dict[str, Any]:
+        """Статистика кешу відповідей LLM"""
+        hits = int(self.redis.get("llm_response:stats:hits") or 0)
+        misses = int(self.redis.get("llm_response:stats:misses") or 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'evictions': int(self.redis.get("llm_response:stats:evictions") or 0),
+            'entries': self.redis.zcard("llm_response:index"),
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0
+        }
+    
     def cache_email_template(self, template_id: str, rendered_html: str, ttl_hours: int = 12):
         """Кешування відрендереного email шаблону"""
         return self.redis.cache_set(f"email_template:{template_id}", rendered_html, ttl_hours * 60)
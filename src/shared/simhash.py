@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Пошук майже однакових сторінок (SimHash): шаблонні сторінки списків та тегів,
+текст яких відрізняється на кілька відсотків, мають близькі 64-бітні відбитки
+"""
+
+import hashlib
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r'\w+')
+
+# Хеші слів спільні для всіх сторінок (словник сайту сильно повторюється)
+_TOKEN_HASH_CACHE_SIZE = 200000
+_token_hashes: Dict[str, int] = {}
+
+def _token_hash(token: str) -> int:
+    value = _token_hashes.get(token)
+    if value is None:
+        if len(_token_hashes) >= _TOKEN_HASH_CACHE_SIZE:
+            _token_hashes.clear()
+        value = _token_hashes[token] = int.from_bytes(
+            hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big'
+        )
+    return value
+
+def _rotate(values: np.ndarray, shift: int) -> np.ndarray:
+    """Циклічний зсув 64-бітних значень вліво"""
+    if not shift:
+        return values
+    return (values << np.uint64(shift)) | (values >> np.uint64(64 - shift))
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """64-бітний SimHash тексту за шинглами з shingle_size слів"""
+    tokens = _TOKEN.findall(text.lower())
+    if not tokens:
+        return 0
+    
+    token_hashes = np.fromiter((_token_hash(token) for token in tokens), dtype=np.uint64, count=len(tokens))
+    
+    # Хеш шингла - комбінація хешів його слів зі зсувами (залежить від порядку слів)
+    count = max(1, len(tokens) - shingle_size + 1)
+    hashes = token_hashes[:count].copy()
+    for offset in range(1, min(shingle_size, len(tokens))):
+        hashes ^= _rotate(token_hashes[offset:offset + count], (offset * 21) % 64)
+    
+    # Кожен біт відбитка - біт, що встановлений у більшості хешів шинглів
+    bits = np.unpackbits(hashes.view(np.uint8)).reshape(count, 64)
+    majority = bits.sum(axis=0) * 2 > count
+    return int.from_bytes(np.packbits(majority).tobytes(), 'big')
+
+class NearDuplicateIndex:
+    """
+    Індекс відбитків з розбиттям на смуги: відбиток ділиться на max_distance + 1
+    частин, і відбитки, що відрізняються не більше ніж на max_distance бітів, мають
+    хоча б одну однакову частину. Тож порівнюються лише кандидати з тих самих кошиків.
+    """
+    
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max(0, max_distance)
+        self.bands = min(64, self.max_distance + 1)
+        
+        # Межі смуг у бітах
+        step = 64 // self.bands
+        self._band_bounds = [(band * step, 64 if band == self.bands - 1 else (band + 1) * step)
+                             for band in range(self.bands)]
+        
+        self._buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._fingerprints: List[int] = []
+        self._urls: List[str] = []
+    
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+    
+    def _band_keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        return [(band, (fingerprint >> start) & ((1 << (end - start)) - 1))
+                for band, (start, end) in enumerate(self._band_bounds)]
+    
+    def find(self, fingerprint: int) -> Optional[str]:
+        """URL вже доданої майже однакової сторінки або None"""
+        for key in self._band_keys(fingerprint):
+            for index in self._buckets.get(key, ()):
+                if (fingerprint ^ self._fingerprints[index]).bit_count() <= self.max_distance:
+                    return self._urls[index]
+        return None
+    
+    def add(self, url: str, fingerprint: int):
+        index = len(self._fingerprints)
+        self._fingerprints.append(fingerprint)
+        self._urls.append(url)
+        for key in self._band_keys(fingerprint):
+            self._buckets[key].append(index)
+    
+    def get_state(self) -> Dict[str, list]:
+        """Відбитки та URL для контрольної точки"""
+        return {'fingerprints': list(self._fingerprints), 'urls': list(self._urls)}
+    
+    def load_state(self, state: Dict[str, list]):
+        """Відновлює індекс зі стану get_state()"""
+        for url, fingerprint in zip(state['urls'], state['fingerprints']):
+            self.add(url, fingerprint)
+    
+    def check(self, url: str, text: str) -> Optional[str]:
+        """
+        Повертає URL сторінки, майже однакової з текстом, або None - тоді сторінка
+        додається в індекс як нова
+        """
+        fingerprint = simhash(text)
+        duplicate_of = self.find(fingerprint)
+        if duplicate_of is None:
+            self.add(url, fingerprint)
+        return duplicate_of
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+robots.txt (Disallow, Crawl-delay, Sitemap) та потоковий розбір sitemap.xml:
+індекси sitemap та стиснуті gzip файли читаються частинами, без завантаження
+цілого файлу в пам'ять
+"""
+
+import asyncio
+import zlib
+from collections import deque
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+import lxml.etree
+
+# Максимальний розмір robots.txt, який читаємо
+ROBOTS_MAX_BYTES = 512 * 1024
+
+# Максимальний розмір одного sitemap після розпакування (обмеження протоколу sitemaps.org)
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024
+
+_GZIP_MAGIC = b'\x1f\x8b'
+
+def parse_robots(text: str) -> RobotFileParser:
+    """Розбір вмісту robots.txt"""
+    robots = RobotFileParser()
+    robots.parse(text.splitlines())
+    return robots
+
+async def fetch_robots(session: aiohttp.ClientSession, base_url: str,
+                       timeout: float = 10) -> Optional[RobotFileParser]:
+    """Завантажує robots.txt сайту; None, якщо його немає або він недоступний"""
+    parsed = urlparse(base_url)
+    robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
+    
+    try:
+        async with session.get(robots_url, timeout=timeout) as response:
+            if response.status != 200:
+                return None
+            body = await response.content.read(ROBOTS_MAX_BYTES)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+    
+    return parse_robots(body.decode('utf-8', errors='replace'))
+
+def _local_name(tag) -> str:
+    """Назва тега без простору імен"""
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+class SitemapStreamParser:
+    """
+    Інкрементальний розбір sitemap: feed() приймає частини відповіді (звичайний
+    XML або gzip) і повертає записи ('url' | 'sitemap', loc, priority), щойно
+    відповідний елемент закрито. Розібрані елементи одразу звільняються.
+    """
+    
+    def __init__(self, max_bytes: int = SITEMAP_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes_parsed = 0
+        self._parser = lxml.etree.XMLPullParser(
+            events=('end',), resolve_entities=False, no_network=True, remove_comments=True
+        )
+        self._decompressor = None
+        self._started = False
+    
+    def feed(self, chunk: bytes) -> List[Tuple[str, str, Optional[float]]]:
+        if not self._started:
+            self._started = True
+            if chunk.startswith(_GZIP_MAGIC):
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        
+        if self._decompressor is not None:
+            # Розпаковуємо не більше, ніж лишилось до ліміту (захист від gzip-бомб)
+            chunk = self._decompressor.decompress(chunk, self.max_bytes - self.bytes_parsed + 1)
+        
+        self.bytes_parsed += len(chunk)
+        if self.bytes_parsed > self.max_bytes:
+            raise ValueError(f"sitemap більший за {self.max_bytes} байт")
+        
+        self._parser.feed(chunk)
+        return self._read_entries()
+    
+    def close(self) -> List[Tuple[str, str, Optional[float]]]:
+        self._parser.close()
+        return self._read_entries()
+    
+    def _read_entries(self) -> List[Tuple[str, str, Optional[float]]]:
+        entries = []
+        
+        for _, element in self._parser.read_events():
+            kind = _local_name(element.tag)
+            if kind not in ('url', 'sitemap'):
+                continue
+            
+            loc = None
+            priority = None
+            for child in element:
+                name = _local_name(child.tag)
+                if name == 'loc' and child.text:
+                    loc = child.text.strip()
+                elif name == 'priority' and child.text:
+                    try:
+                        priority = min(1.0, max(0.0, float(child.text)))
+                    except ValueError:
+                        pass
+            
+            if loc:
+                entries.append((kind, loc, priority))
+            
+            # Звільняємо пам'ять: сам елемент і вже оброблені попередні
+            element.clear()
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+        
+        return entries
+
+async def _stream_entries(response: aiohttp.ClientResponse,
+                          parser: SitemapStreamParser) -> AsyncIterator[Tuple[str, str, Optional[float]]]:
+    """Записи sitemap по мірі надходження частин відповіді"""
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        for entry in parser.feed(chunk):
+            yield entry
+    for entry in parser.close():
+        yield entry
+
+async def iter_sitemap_urls(session: aiohttp.ClientSession, sitemap_urls: Iterable[str],
+                            max_urls: int, max_files: int = 20, timeout: float = 15,
+                            stats: Dict[str, int] = None) -> AsyncIterator[Tuple[str, Optional[float]]]:
+    """
+    Обходить sitemap та вкладені індекси, повертаючи (URL сторінки, priority)
+    по мірі розбору. Зупиняється після max_urls сторінок або max_files файлів.
+    """
+    pending = deque(dict.fromkeys(sitemap_urls))
+    visited = set(pending)
+    urls_found = 0
+    files_fetched = 0
+    
+    while pending and urls_found < max_urls and files_fetched < max_files:
+        sitemap_url = pending.popleft()
+        files_fetched += 1
+        
+        try:
+            async with session.get(sitemap_url, timeout=timeout) as response:
+                if response.status != 200:
+                    continue
+                if stats is not None:
+                    stats['sitemaps_fetched'] += 1
+                
+                async for kind, loc, priority in _stream_entries(response, SitemapStreamParser()):
+                    loc = urljoin(sitemap_url, loc)
+                    if kind == 'sitemap':
+                        if loc not in visited:
+                            visited.add(loc)
+                            pending.append(loc)
+                        continue
+                    
+                    urls_found += 1
+                    yield loc, priority
+                    if urls_found >= max_urls:
+                        return
+        except (aiohttp.ClientError, asyncio.TimeoutError, lxml.etree.XMLSyntaxError, ValueError, zlib.error):
+            # Пошкоджений або недоступний sitemap пропускаємо; вже знайдені URL лишаються
+            continue
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Події задач аналізу (зміни статусу) для потоків Server-Sent Events: pub/sub
+у межах процесу, між процесами та репліками - через Redis pub/sub
+"""
+
+import asyncio
+import json
+import os
+import socket
+import threading
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional, Set
+
+from shared.logger import setup_logger
+from shared.redis_client import RedisClient
+
+logger = setup_logger('task_events')
+
+class TaskEvents:
+    """
+    Підписник отримує asyncio.Queue з подіями обраних задач. Подія доставляється
+    підписникам цього процесу одразу і публікується в Redis; потік-слухач
+    передає в event loop події інших процесів (свої пропускає за source).
+    Черга підписника обмежена queue_size - повільний клієнт втрачає найстаріші
+    події, а не пам'ять сервісу (кожна подія містить повний статус).
+    """
+    
+    def __init__(self, redis: RedisClient, channel: str = "analysis_events", queue_size: int = 100):
+        self.redis = redis
+        self.channel = channel
+        self.queue_size = queue_size
+        self.source = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+    
+    def subscribe(self, task_ids: Iterable[str]) -> asyncio.Queue:
+        """Черга подій для задач task_ids (викликається з event loop)"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        for task_id in task_ids:
+            self._subscribers[task_id].add(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue, task_ids: Iterable[str]):
+        for task_id in task_ids:
+            subscribers = self._subscribers.get(task_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[task_id]
+    
+    def publish(self, task_id: str, event: Dict[str, Any]):
+        """Подія задачі для підписників цього та інших процесів"""
+        self._dispatch(task_id, event)
+        self.redis.publish(self.channel, {'source': self.source, 'task_id': task_id, 'event': event})
+    
+    def subscribers(self) -> int:
+        """Кількість задач з підписниками в цьому процесі"""
+        return len(self._subscribers)
+    
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Запускає потік, що слухає події інших процесів з Redis"""
+        if self._listener is not None:
+            return
+        self._loop = loop
+        self._stopped.clear()
+        self._listener = threading.Thread(target=self._listen, name='task-events', daemon=True)
+        self._listener.start()
+    
+    def stop(self):
+        self._stopped.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+            self._listener = None
+    
+    def _dispatch(self, task_id: str, event: Dict[str, Any]):
+        for queue in list(self._subscribers.get(task_id, ())):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+    
+    def _listen(self):
+        """Слухає канал Redis; після помилки перепідключається"""
+        while not self._stopped.is_set():
+            pubsub = self.redis.pubsub()
+            if pubsub is None:
+                self._stopped.wait(5)
+                continue
+            
+            try:
+                pubsub.subscribe(self.channel)
+                while not self._stopped.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    
+                    data = json.loads(message['data'])
+                    if data.get('source') != self.source:
+                        self._loop.call_soon_threadsafe(self._dispatch, data['task_id'], data['event'])
+            except Exception as e:
+                logger.warning(f"⚠️ Підписку на події задач перервано: {e}")
+                self._stopped.wait(5)
+            finally:
+                pubsub.close()
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сховище статусів та результатів задач аналізу, спільне для всіх процесів
+(uvicorn --workers, репліки analysis-service, воркери черги)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, List, Optional, Type
+
+from pydantic import BaseModel
+from sqlalchemy.exc import OperationalError
+
+from shared.database import DatabaseManager
+from shared.logger import setup_logger
+from shared.memory_cache import BoundedCache
+from shared.redis_client import CacheManager
+from shared.utils import sanitize_filename
+
+logger = setup_logger('task_store')
+
+# Статуси, після яких задача не змінюється
+FINAL_STATUSES = ("completed", "failed")
+
+# Позначка в кеші пам'яті: задачі немає ніде (негативний кеш)
+_MISSING = object()
+
+class TaskStore:
+    """
+    Три рівні стану задач:
+    - пам'ять процесу: задачі, які виконує цей процес, та обмежений кеш (LRU, TTL,
+      бюджет пам'яті) завершених і прочитаних статусів та результатів;
+    - Redis: поточні статуси й результати, видимі всім процесам (ttl_hours);
+    - PostgreSQL (db_manager): завершені результати надовго, коли Redis їх вже забув.
+    Статус незавершеної задачі кешується на state_cache_seconds, завершені статуси
+    та результати незмінні - на result_cache_seconds, відсутність задачі - на
+    missing_cache_seconds (невідомий task_id не звертається до БД при кожному запиті).
+    Те, що не вдалося записати ні в Redis, ні в БД, при витісненні з пам'яті
+    зберігається у файли spill_dir - окремим потоком, не блокуючи event loop.
+    on_update(task_id, status) викликається при кожній зміні статусу задачі цього процесу.
+    """
+    
+    def __init__(self, cache: CacheManager, status_model: Type[BaseModel], result_model: Type[BaseModel],
+                 db: Optional[DatabaseManager] = None, ttl_hours: int = 24,
+                 state_cache_seconds: float = 2.0, result_cache_seconds: float = 300.0,
+                 missing_cache_seconds: float = 1.0,
+                 memory_max_bytes: int = 64 * 1024 * 1024, memory_max_entries: int = 1000,
+                 spill_dir: Optional[str] = None, db_retry_seconds: float = 60.0,
+                 on_update: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.cache = cache
+        self.status_model = status_model
+        self.result_model = result_model
+        self.db = db
+        self.ttl_hours = ttl_hours
+        self.state_cache_seconds = state_cache_seconds
+        self.result_cache_seconds = result_cache_seconds
+        self.missing_cache_seconds = missing_cache_seconds
+        self.spill_dir = spill_dir
+        self.db_retry_seconds = db_retry_seconds
+        self.on_update = on_update
+        self.clock = clock
+        
+        # Задачі, які виконує цей процес (джерело істини для них)
+        self.statuses: Dict[str, BaseModel] = {}
+        # Задачі, останній статус яких не вдалося записати в Redis
+        self._unshared = set()
+        # (тип, task_id) -> статус або результат
+        self.memory = BoundedCache(memory_max_bytes, memory_max_entries,
+                                   on_spill=self._spill, clock=clock)
+        self._db_retry_at = 0.0
+        self._spill_pruned_at = None
+        # Витіснений стан, який ще записується в БД/файл: читається звідси, поки запис не завершено
+        self._spilling: Dict[Hashable, BaseModel] = {}
+        self._spill_lock = threading.Lock()
+        # Запис і видалення файлів витісненого стану
+        self._spill_file_lock = threading.Lock()
+        self._spill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='task-spill')
+    
+    # Задачі цього процесу
+    def create(self, status: BaseModel) -> BaseModel:
+        """Реєструє нову задачу, яку виконуватиме цей процес"""
+        self.statuses[status.task_id] = status
+        self.memory.pop(('status', status.task_id))
+        self.cache.index_task(status.task_id, status.started_at.timestamp())
+        self._publish_status(status)
+        return status
+    
+    def update(self, task_id: str, **fields) -> BaseModel:
+        """Оновлює статус задачі цього процесу та публікує його"""
+        status = self.statuses[task_id]
+        for name, value in fields.items():
+            setattr(status, name, value)
+        self._publish_status(status)
+        return status
+    
+    def save_result(self, result: BaseModel, started_at: Optional[datetime] = None):
+        """Зберігає результат у Redis, (надовго) у PostgreSQL та в кеші процесу"""
+        shared = self.cache.cache_analysis_result(result.task_id, result.model_dump(mode='json'),
+                                                  ttl_hours=self.ttl_hours)
+        stored = self._db_call(self.db.upsert_analysis_result if self.db else None,
+                               self._result_row(result, started_at))
+        self.memory.set(('result', result.task_id), result, self.result_cache_seconds,
+                        spill=not (shared or stored))
+    
+    def release(self, task_id: str):
+        """
+        Задача завершена або передана іншому процесу: її статус переходить у кеш,
+        далі він читається з Redis/БД (або з файлу, якщо Redis був недоступний)
+        """
+        status = self.statuses.pop(task_id, None)
+        if status is not None:
+            self.memory.set(('status', task_id), status, self._status_ttl(status),
+                            spill=task_id in self._unshared)
+        self._unshared.discard(task_id)
+    
+    # Читання з будь-якого процесу
+    def get_status(self, task_id: str) -> Optional[BaseModel]:
+        """Статус задачі: цей процес -> кеш -> Redis -> PostgreSQL -> файл"""
+        status = self._cached('status', task_id)
+        if status is None:
+            status = self._remember('status', task_id, self._load_status(task_id))
+        return None if status is _MISSING else status
+    
+    def get_result(self, task_id: str) -> Optional[BaseModel]:
+        """Результат задачі: кеш -> Redis -> PostgreSQL -> файл"""
+        result = self._cached('result', task_id)
+        if result is None:
+            result = self._remember('result', task_id, self._load_result(task_id))
+        return None if result is _MISSING else result
+    
+    async def get_status_async(self, task_id: str) -> Optional[BaseModel]:
+        """get_status для async коду: Redis/PostgreSQL/файл читаються в потоці, не блокуючи event loop"""
+        status = self._cached('status', task_id)
+        if status is None:
+            status = self._remember('status', task_id, await asyncio.to_thread(self._load_status, task_id))
+        return None if status is _MISSING else status
+    
+    async def get_result_async(self, task_id: str) -> Optional[BaseModel]:
+        """get_result для async коду: Redis/PostgreSQL/файл читаються в потоці, не блокуючи event loop"""
+        result = self._cached('result', task_id)
+        if result is None:
+            result = self._remember('result', task_id, await asyncio.to_thread(self._load_result, task_id))
+        return None if result is _MISSING else result
+    
+    def task_ids(self) -> List[str]:
+        """ID задач усіх процесів за останні ttl_hours (та задач цього процесу)"""
+        since = (datetime.now() - timedelta(hours=self.ttl_hours)).timestamp()
+        task_ids = self.cache.get_task_ids(since)
+        shared = set(task_ids)
+        return task_ids + [task_id for task_id in self.statuses if task_id not in shared]
+    
+    def delete(self, task_id: str) -> bool:
+        """Видаляє статус і результат задачі з усіх рівнів"""
+        deleted = self.statuses.pop(task_id, None) is not None
+        self._unshared.discard(task_id)
+        for kind in ('status', 'result'):
+            if self.memory.pop((kind, task_id)) is not None:
+                deleted = True
+            with self._spill_lock:
+                if self._spilling.pop((kind, task_id), None) is not None:
+                    deleted = True
+            with self._spill_file_lock:
+                path = self._spill_path(kind, task_id)
+                if path:
+                    try:
+                        os.remove(path)
+                        deleted = True
+                    except FileNotFoundError:
+                        pass
+        
+        if self.cache.delete_task_state(task_id):
+            deleted = True
+        if self._db_call(self.db.delete_analysis_result if self.db else None, task_id):
+            deleted = True
+        return deleted
+    
+    def stats(self) -> Dict[str, int]:
+        """Задачі цього процесу та стан кешу в пам'яті"""
+        return {
+            'local_tasks': len(self.statuses),
+            'unshared_tasks': len(self._unshared),
+            'memory_cache': self.memory.stats(),
+            'spilling': len(self._spilling)
+        }
+    
+    def close(self):
+        """Дочікується запису витісненого стану (при зупинці процесу)"""
+        self._spill_executor.shutdown(wait=True)
+    
+    # Внутрішні методи
+    def _cached(self, kind: str, task_id: str) -> Any:
+        """Стан з пам'яті процесу, _MISSING (відомо, що задачі немає) або None"""
+        if kind == 'status' and task_id in self.statuses:
+            return self.statuses[task_id]
+        return self.memory.get((kind, task_id))
+    
+    def _remember(self, kind: str, task_id: str, item: Optional[BaseModel]) -> Any:
+        # Поки стан читався (в потоці), задача могла з'явитись у цьому процесі
+        current = self._cached(kind, task_id)
+        if current is not None:
+            return current
+        
+        if item is None:
+            self.memory.set((kind, task_id), _MISSING, self.missing_cache_seconds)
+            return _MISSING
+        ttl = self._status_ttl(item) if kind == 'status' else self.result_cache_seconds
+        self.memory.set((kind, task_id), item, ttl)
+        return item
+    
+    def _load_status(self, task_id: str) -> Optional[BaseModel]:
+        data = self.cache.get_cached_task_status(task_id)
+        if data:
+            return self.status_model.model_validate(data)
+        row = self._db_call(self.db.get_analysis_result if self.db else None, task_id)
+        return self._status_from_row(row) if row else self._load_spilled('status', task_id)
+    
+    def _load_result(self, task_id: str) -> Optional[BaseModel]:
+        data = self.cache.get_cached_analysis_result(task_id)
+        if data:
+            return self.result_model.model_validate(data)
+        row = self._db_call(self.db.get_analysis_result if self.db else None, task_id)
+        return (self.result_model.model_validate(self._result_from_row(row)) if row
+                else self._load_spilled('result', task_id))
+    
+    def _publish_status(self, status: BaseModel):
+        data = status.model_dump(mode='json')
+        if self.cache.cache_task_status(status.task_id, data, ttl_hours=self.ttl_hours):
+            self._unshared.discard(status.task_id)
+        else:
+            self._unshared.add(status.task_id)
+        
+        if self.on_update is not None:
+            self.on_update(status.task_id, data)
+    
+    def _status_ttl(self, status: BaseModel) -> float:
+        return self.result_cache_seconds if status.status in FINAL_STATUSES else self.state_cache_seconds
+    
+    def _spill(self, key: Hashable, item: BaseModel):
+        """
+        Витіснений з пам'яті стан, якого немає ні в Redis, ні в БД. Витіснення
+        відбувається всередині set() (зокрема з async коду), тому БД та файл - у потоці
+        """
+        with self._spill_lock:
+            self._spilling[key] = item
+        self._spill_executor.submit(self._write_spilled, key, item)
+    
+    def _write_spilled(self, key: Hashable, item: BaseModel):
+        kind, task_id = key
+        try:
+            if kind == 'result' and self._db_call(self.db.upsert_analysis_result if self.db else None,
+                                                  self._result_row(item, None)):
+                return
+            
+            path = self._spill_path(kind, task_id)
+            if not path:
+                logger.warning(f"⚠️ Стан задачі {task_id} ({kind}) витіснено з пам'яті без збереження")
+                return
+            with self._spill_file_lock:
+                # Задачу видалили, поки запис чекав у черзі
+                with self._spill_lock:
+                    if self._spilling.get(key) is not item:
+                        return
+                try:
+                    os.makedirs(self.spill_dir, exist_ok=True)
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write(item.model_dump_json())
+                    self._prune_spilled()
+                except OSError as e:
+                    logger.error(f"❌ Не вдалося зберегти стан задачі {task_id} у файл: {e}")
+        finally:
+            with self._spill_lock:
+                if self._spilling.get(key) is item:
+                    del self._spilling[key]
+    
+    def _load_spilled(self, kind: str, task_id: str) -> Optional[BaseModel]:
+        with self._spill_lock:
+            item = self._spilling.get((kind, task_id))
+        if item is not None:
+            return item
+        
+        path = self._spill_path(kind, task_id)
+        if not path:
+            return None
+        model = self.result_model if kind == 'result' else self.status_model
+        try:
+            with open(path, encoding='utf-8') as f:
+                return model.model_validate_json(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Не вдалося прочитати стан задачі {task_id} з файлу: {e}")
+            return None
+    
+    def _spill_path(self, kind: str, task_id: str) -> Optional[str]:
+        if not self.spill_dir:
+            return None
+        return os.path.join(self.spill_dir, sanitize_filename(f"{kind}-{task_id}.json"))
+    
+    def _prune_spilled(self):
+        """Раз на годину видаляє файли, старші за ttl_hours"""
+        now = self.clock()
+        if self._spill_pruned_at is not None and now - self._spill_pruned_at < 3600:
+            return
+        self._spill_pruned_at = now
+        
+        expired_before = time.time() - self.ttl_hours * 3600
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            # Файл міг видалити delete() або інший процес з тим самим spill_dir
+            try:
+                if os.path.getmtime(path) < expired_before:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+    
+    def _db_call(self, method: Optional[Callable], *args) -> Any:
+        """Виклик PostgreSQL; після втрати з'єднання БД не використовується db_retry_seconds"""
+        if method is None or self.clock() < self._db_retry_at:
+            return None
+        try:
+            return method(*args)
+        except OperationalError as e:
+            self._db_retry_at = self.clock() + self.db_retry_seconds
+            logger.warning(f"⚠️ PostgreSQL недоступний для задач аналізу: {e}")
+        except Exception as e:
+            logger.error(f"❌ Помилка PostgreSQL для задач аналізу: {e}")
+        return None
+    
+    @staticmethod
+    def _result_row(result: BaseModel, started_at: Optional[datetime]) -> Dict[str, Any]:
+        """Рядок analysis_results; решта полів результату відновлюється з цих"""
+        data = result.model_dump(mode='json')
+        return {
+            'task_id': data['task_id'],
+            'site_url': data['site_url'],
+            'status': data['status'],
+            'pages_analyzed': data['pages_analyzed'],
+            'positive_matches': data['positive_matches'],
+            'negative_matches': data['negative_matches'],
+            'detailed_stats': data['detailed_stats'],
+            'ai_analysis': data['ai_analysis'],
+            'analysis_time': data['analysis_time'],
+            'created_at': started_at or result.completed_at,
+            'completed_at': result.completed_at
+        }
+    
+    @staticmethod
+    def _result_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+        positive_matches = row['positive_matches'] or []
+        negative_matches = row['negative_matches'] or []
+        pages_with_positive = list(dict.fromkeys(match['url'] for match in positive_matches))
+        pages_with_negative = list(dict.fromkeys(match['url'] for match in negative_matches))
+        
+        return {
+            'task_id': row['task_id'],
+            'site_url': row['site_url'],
+            'status': row['status'],
+            'pages_analyzed': row['pages_analyzed'],
+            'positive_matches': positive_matches,
+            'negative_matches': negative_matches,
+            'ai_analysis': row['ai_analysis'],
+            'analysis_time': row['analysis_time'],
+            'pages_with_positive': pages_with_positive,
+            'pages_with_negative': pages_with_negative,
+            'summary_stats': {
+                "pages_analyzed": row['pages_analyzed'],
+                "positive_keywords_found": len(positive_matches),
+                "negative_keywords_found": len(negative_matches),
+                "pages_with_positive": len(pages_with_positive),
+                "pages_with_negative": len(pages_with_negative),
+                "analysis_time_seconds": int(row['analysis_time'] or 0)
+            },
+            'detailed_stats': row['detailed_stats'] or {},
+            'completed_at': row['completed_at'] or row['created_at']
+        }
+    
+    def _status_from_row(self, row: Dict[str, Any]) -> BaseModel:
+        completed = row['status'] == "completed"
+        return self.status_model(
+            task_id=row['task_id'],
+            status=row['status'],
+            progress=100 if completed else 0,
+            message="Аналіз завершено успішно" if completed else "Аналіз не завершено",
+            started_at=row['created_at'],
+            completed_at=row['completed_at']
+        )
@@ -34,6 +34,41 @@ def clean_url(url: str) -> str:
     clean = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
     return clean.rstrip('/')
 
+# Перша сторінка пагінації (/page/1) та індексні файли - дублікати основної сторінки;
+# подальші сторінки списку (/page/2...) мають інші товари, тож лишаються окремими
+_PAGINATION_SUFFIX = re.compile(r'/page/0*1$', re.IGNORECASE)
+_INDEX_SUFFIX = re.compile(r'/index\.(?:html?|php)$', re.IGNORECASE)
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def canonicalize_url(url: str, collapse_pagination: bool = True) -> str:
+    """
+    Канонічний URL сторінки: схема і хост у нижньому регістрі, без стандартного порту,
+    параметрів, фрагмента, повторних та кінцевих слешів, index.html і (опційно) /page/1
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').rstrip('.')
+    
+    netloc = f"[{host}]" if ':' in host else host
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    if port and port != _DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    
+    path = re.sub(r'/{2,}', '/', parsed.path).rstrip('/')
+    path = _INDEX_SUFFIX.sub('', path)
+    if collapse_pagination:
+        path = _PAGINATION_SUFFIX.sub('', path)
+    
+    return f"{scheme}://{netloc}{path}".rstrip('/')
+
+def url_key(url: str) -> str:
+    """Ключ сторінки для порівняння: канонічний URL без схеми та www."""
+    key = canonicalize_url(url).split('://', 1)[-1]
+    return key[4:] if key.startswith('www.') else key
+
 def is_valid_url(url: str) -> bool:
     """Перевірка валідності URL"""
     try:
@@ -211,6 +246,8 @@ def merge_dicts(*dicts) -> Dict[str, Any]:
 def get_env_bool(env_var: str, default: bool = False) -> bool:
     """Отримання boolean значення зі змінної середовища"""
     value = os.getenv(env_var, "").lower()
+    if not value:
+        return default
     return value in ('true', '1', 'yes', 'on')
 
 def get_env_int(env_var: str, default: int = 0) -> int:
@@ -220,6 +257,13 @@ def get_env_int(env_var: str, default: int = 0) -> int:
     except (ValueError, TypeError):
         return default
 
+def get_env_float(env_var: str, default: float = 0.0) -> float:
+    """Отримання float значення зі змінної середовища"""
+    try:
+        return float(os.getenv(env_var, default))
+    except (ValueError, TypeError):
+        return default
+
 def get_env_list(env_var: str, separator: str = ',', default: List[str] = None) -> List[str]:
     """Отримання списку зі змінної середовища"""
     if default is None:
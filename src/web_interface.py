@@ -364,6 +364,63 @@ async def perform_batch_analysis(batch_id: str, config: SiteAnalysisConfig):
         batch_analysis_results[batch_id]["status"] = "failed"
         batch_analysis_results[batch_id]["error"] = str(e)
 
+def apply_task_status(batch_result: dict, site_url: str, task_info: dict, status_data: dict):
+    """Оновлює стан сайту в пакетному аналізі за статусом задачі аналізу"""
+    if task_info["status"] != "pending":
+        return
+    
+    if status_data["status"] == "completed":
+        task_info["status"] = "completed"
+        batch_result["completed_sites"] += 1
+        logger.info(f"Аналіз {site_url} завершено")
+    elif status_data["status"] == "failed":
+        task_info["status"] = "failed"
+        task_info["error"] = status_data.get("message", "Невідома помилка")
+        batch_result["failed_sites"] += 1
+        logger.error(f"Аналіз {site_url} провалився")
+
+def follow_batch_status_stream(batch_result: dict, max_wait_time: float):
+    """
+    Отримує статуси задач пакету одним потоком /tasks/stream (Server-Sent Events)
+    замість запиту /status на кожен сайт; повертається, коли всі задачі завершено
+    """
+    sites = {
+        task_info["task_id"]: (site_url, task_info)
+        for site_url, task_info in batch_result["analysis_tasks"].items()
+        if task_info["status"] == "pending" and task_info["task_id"]
+    }
+    if not sites:
+        return
+    
+    start_time = datetime.now()
+    with requests.get(
+        f"{ANALYSIS_SERVICE_URL}/tasks/stream",
+        params={"task_ids": ",".join(sites)},
+        stream=True,
+        timeout=(10, 60)  # Сервіс надсилає keep-alive кожні 15 секунд
+    ) as response:
+        response.raise_for_status()
+        event = None
+        
+        for line in response.iter_lines():
+            line = line.decode('utf-8')
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                if event == "done":
+                    return
+                
+                data = json.loads(line[len("data:"):])
+                if data.get("task_id") in sites:
+                    site_url, task_info = sites[data["task_id"]]
+                    if event == "error":
+                        data = {"status": "failed", "message": data.get("detail")}
+                    apply_task_status(batch_result, site_url, task_info, data)
+            
+            if (datetime.now() - start_time).total_seconds() > max_wait_time:
+                logger.warning("Перевищено максимальний час очікування потоку статусів")
+                return
+
 async def monitor_batch_analysis(batch_id: str):
     """Моніторить виконання пакетного аналізу"""
     batch_result = batch_analysis_results[batch_id]
@@ -372,6 +429,13 @@ async def monitor_batch_analysis(batch_id: str):
     
     logger.info(f"Починаємо моніторинг аналізу {batch_id}")
     
+    # Статуси надходять потоком одразу після змін; якщо потік недоступний
+    # або обірвався - продовжуємо опитуванням
+    try:
+        await asyncio.to_thread(follow_batch_status_stream, batch_result, max_wait_time)
+    except Exception as e:
+        logger.warning(f"Потік статусів недоступний для {batch_id}, переходимо на опитування: {e}")
+    
     while batch_result["completed_sites"] + batch_result["failed_sites"] < batch_result["total_sites"]:
         # Перевіряємо час очікування
         elapsed_time = (datetime.now() - start_time).total_seconds()
@@ -390,16 +454,7 @@ async def monitor_batch_analysis(batch_id: str):
                         timeout=30
                     )
                     if response.status_code == 200:
-                        status_data = response.json()
-                        if status_data["status"] == "completed":
-                            task_info["status"] = "completed"
-                            batch_result["completed_sites"] += 1
-                            logger.info(f"Аналіз {site_url} завершено")
-                        elif status_data["status"] == "failed":
-                            task_info["status"] = "failed"
-                            task_info["error"] = status_data.get("message", "Невідома помилка")
-                            batch_result["failed_sites"] += 1
-                            logger.error(f"Аналіз {site_url} провалився")
+                        apply_task_status(batch_result, site_url, task_info, response.json())
                 except Exception as e:
                     logger.error(f"Помилка перевірки статусу {site_url}: {e}")
 
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тести декодування сторінок (shared.html_parser.decode_html) та однакового
+результату бекендів парсингу (shared.html_parser.parse_page)
+"""
+
+import pytest
+
+from shared.html_parser import PARSER_BACKENDS, decode_html, parse_page
+
+UKRAINIAN_PAGE = (
+    "<html><head><title>Інтернет-магазин</title></head><body>"
+    "<p>Купуйте смартфони Samsung Galaxy в нашому інтернет-магазині. "
+    "Доставка по всій Україні, гарантія якості, знижки для постійних покупців.</p>"
+    "</body></html>"
+)
+
+def test_undeclared_cp1251_page_keeps_cyrillic():
+    text = decode_html(UKRAINIAN_PAGE.encode('cp1251'))
+    
+    assert text == UKRAINIAN_PAGE
+    assert '�' not in text
+
+def test_short_undeclared_cp1251_page_falls_back_to_cp1251():
+    page = "<html><body><p>Купуйте смартфони</p></body></html>"
+    
+    assert decode_html(page.encode('cp1251')) == page
+
+def test_undeclared_utf8_page():
+    assert decode_html(UKRAINIAN_PAGE.encode('utf-8')) == UKRAINIAN_PAGE
+
+def test_declared_charset_wins():
+    page = '<html><head><meta charset="windows-1251"></head><body>Привіт</body></html>'
+    
+    assert decode_html(page.encode('cp1251')) == page
+    assert decode_html("Привіт".encode('koi8-u'), 'koi8-u') == "Привіт"
+
+# Розмітка, яку html.parser та libxml2 розбирають по-різному
+PARITY_PAGES = {
+    'content_after_html': '<html><body><p>a</p></body></html><p>b <a href="/late">late link</a></p>',
+    'content_after_body': '<html><body><p>a</p></body><p>b</p></html>',
+    'template': '<html><body><p>a</p><template><p>hidden <a href="/tpl">tpl</a></p></template><p>c</p></body></html>',
+    'cdata': '<html><body><p>a <![CDATA[x < y]]> b</p></body></html>',
+    'cdata_in_template': '<html><body><template>hidden <![CDATA[shown]]> hidden</template></body></html>',
+    'anchor_with_menu': '<html><body><a href="/a">a <nav>n</nav><script>s</script> b</a></body></html>',
+    'entities': ('<html><body><p>a &unknown; b &amp; c &copy d &#39; e &#x41; &nbsp;f &notit; g &lt;i&gt;</p>'
+                 '<a href="/x?a=1&b=2">q &hellip;</a></body></html>'),
+    'removed_elements': ('<html><head><title>T</title><script>var a = "<p>";</script></head><body>'
+                         '<header>h</header><nav><a href="/menu">menu</a></nav><p>a<!-- c --> b</p>'
+                         '<footer>f</footer></body></html>'),
+    'canonical': ('<html><head><link rel="Canonical" href="https://ex.com/page/"></head>'
+                  '<body><a href="/a">A</a> <a href="https://other.com/">x</a></body></html>'),
+    'fragment': '<p>only <a href="page.html">page</a></p>',
+}
+
+@pytest.mark.parametrize('name', PARITY_PAGES)
+def test_backends_give_same_result(name):
+    content = PARITY_PAGES[name]
+    results = {backend: parse_page(content, 'https://ex.com/dir/', 'ex.com', backend=backend)
+               for backend in PARSER_BACKENDS}
+    
+    assert results['lxml'] == results['html.parser']
+
+def test_content_after_html_is_kept():
+    links, text, _ = parse_page(PARITY_PAGES['content_after_html'], 'https://ex.com/', 'ex.com', backend='lxml')
+    
+    assert links == [('https://ex.com/late', 'late link')]
+    assert text == 'a b late link'
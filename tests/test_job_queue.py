@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тести надійної черги задач (shared.job_queue.JobQueue) на fakeredis
+"""
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+pytest.importorskip('lupa')
+
+from shared.job_queue import JobQueue
+from shared.redis_client import RedisClient
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000.0
+    
+    def __call__(self):
+        return self.now
+
+def fake_redis_client():
+    client = RedisClient.__new__(RedisClient)
+    client.redis_url = 'redis://fakeredis/0'
+    client.client = fakeredis.FakeRedis(decode_responses=True)
+    return client
+
+def make_queue(max_attempts=3):
+    clock, buried = Clock(), []
+    queue = JobQueue(fake_redis_client(), 'analysis', visibility_timeout=60, max_attempts=max_attempts,
+                     on_bury=lambda job_id, payload: buried.append((job_id, payload)), clock=clock)
+    return queue, clock, buried
+
+def test_jobs_are_reserved_in_order_and_acked():
+    queue, clock, buried = make_queue()
+    queue.enqueue('a', {'url': 'https://a.example'})
+    queue.enqueue('b', {'url': 'https://b.example'})
+    
+    job = queue.reserve()
+    assert (job.id, job.payload, job.attempts) == ('a', {'url': 'https://a.example'}, 1)
+    assert queue.stats() == {'pending': 1, 'in_progress': 1, 'dead': 0}
+    
+    queue.ack('a')
+    assert queue.reserve().id == 'b'
+    assert queue.reserve() is None
+    assert queue.stats() == {'pending': 0, 'in_progress': 1, 'dead': 0}
+
+def test_expired_lease_is_redelivered():
+    queue, clock, buried = make_queue()
+    queue.enqueue('a', {'n': 1})
+    queue.reserve()
+    
+    clock.now += 59
+    assert queue.reserve() is None
+    
+    clock.now += 2
+    job = queue.reserve()
+    assert (job.id, job.attempts) == ('a', 2)
+    assert queue.stats()['in_progress'] == 1
+
+def test_extended_lease_is_not_redelivered():
+    queue, clock, buried = make_queue()
+    queue.enqueue('a', {'n': 1})
+    queue.reserve()
+    
+    clock.now += 50
+    queue.extend('a')
+    clock.now += 50
+    assert queue.reserve() is None
+    
+    clock.now += 11
+    assert queue.reserve().id == 'a'
+
+def test_released_job_does_not_use_up_an_attempt():
+    queue, clock, buried = make_queue()
+    queue.enqueue('a', {'n': 1})
+    queue.reserve()
+    
+    queue.release('a')
+    job = queue.reserve()
+    assert (job.id, job.attempts) == ('a', 1)
+
+def test_failed_job_is_retried_until_max_attempts_then_buried():
+    queue, clock, buried = make_queue(max_attempts=2)
+    queue.enqueue('a', {'n': 1})
+    
+    assert queue.reserve().attempts == 1
+    queue.fail('a')
+    assert queue.stats() == {'pending': 1, 'in_progress': 0, 'dead': 0}
+    
+    assert queue.reserve().attempts == 2
+    queue.fail('a')
+    
+    assert buried == [('a', {'n': 1})]
+    assert queue.stats() == {'pending': 0, 'in_progress': 0, 'dead': 1}
+    assert queue.reserve() is None
+
+def test_job_whose_leases_keep_expiring_is_buried():
+    # Воркер падає на задачі: оренда спливає max_attempts разів, далі задача не видається
+    queue, clock, buried = make_queue(max_attempts=2)
+    queue.enqueue('a', {'n': 1})
+    
+    for attempt in (1, 2):
+        assert queue.reserve().attempts == attempt
+        clock.now += 61
+    
+    assert queue.reserve() is None
+    assert buried == [('a', {'n': 1})]
+    assert queue.stats() == {'pending': 0, 'in_progress': 0, 'dead': 1}
+
+def test_acked_job_is_not_redelivered():
+    queue, clock, buried = make_queue()
+    queue.enqueue('a', {'n': 1})
+    queue.reserve()
+    queue.ack('a')
+    
+    clock.now += 120
+    assert queue.reserve() is None
+    assert buried == []
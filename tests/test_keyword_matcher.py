@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тести пошуку ключових слів (shared.keyword_matcher): результат KeywordMatcher і
+контекст extract_snippet мають збігатися з попереднім пошуком окремим
+re.IGNORECASE виразом на кожне слово
+"""
+
+import random
+import re
+
+import pytest
+
+from shared.keyword_matcher import KeywordMatcher, extract_snippet
+
+def regex_spans(text, keywords):
+    """Попередній шлях: re.findall(re.escape(keyword), text, re.IGNORECASE) для кожного слова"""
+    result = {}
+    for keyword in keywords:
+        spans = [match.span() for match in re.finditer(re.escape(keyword), text, re.IGNORECASE)]
+        if spans:
+            result[keyword] = spans
+    return result
+
+CASES = [
+    # Входження одного слова не перекриваються, різних - перекриваються
+    (['aa'], 'aaaaa'),
+    (['he', 'she', 'his', 'hers'], 'ushers and his sheep'),
+    (['abc', 'bc', 'c', 'abcabc'], 'abcabcabc'),
+    (['Galaxy', 'galaxy s', 'Galaxy S24'], 'GALAXY S24, galaxy s23 і Galaxy'),
+    # Кирилиця без урахування регістру
+    (['Київ', 'київська', 'Ґанок', 'ЇЖАК'], 'КИЇВ, Київська область, ґанок та їжак. київ!'),
+    (['Самсунг', 'самсунг галаксі'], 'САМСУНГ Галаксі, Самсунг галаксі та самсунг'),
+    # Однакові слова та слова, що відрізняються лише регістром
+    (['samsung', 'samsung', 'Samsung', 'SAMSUNG'], 'Samsung samsung SaMsUnG'),
+    (['apple', 'Apple', 'яблуко', 'Яблуко'], 'APPLE Яблуко apple'),
+    # Спецсимволи регулярних виразів у ключових словах
+    (['c++', 'a.b', '(x)'], 'C++ a.b axb (X) c+'),
+    # Символ, що розширюється при lower()
+    (['İstanbul', 'i̇stanbul'], 'İSTANBUL İstanbul istanbul'),
+    (['samsung'], ''),
+]
+
+@pytest.mark.parametrize('keywords, text', CASES)
+def test_find_all_matches_regex_path(keywords, text):
+    assert KeywordMatcher(keywords).find_all(text) == regex_spans(text, keywords)
+
+def test_repeated_keyword_is_counted_once():
+    found = KeywordMatcher(['samsung', 'samsung']).find_all('samsung, Samsung')
+    
+    assert list(found) == ['samsung']
+    assert len(found['samsung']) == 2
+
+def test_random_texts_match_regex_path():
+    rng = random.Random(4)
+    alphabet = 'aAbBаАбБіІїЇ .'
+    
+    def word(length):
+        return ''.join(rng.choice(alphabet) for _ in range(length))
+    
+    for _ in range(300):
+        keywords = [word(rng.randint(1, 4)) for _ in range(rng.randint(1, 6))]
+        text = word(rng.randint(0, 80))
+        
+        assert KeywordMatcher(keywords).find_all(text) == regex_spans(text, keywords), (keywords, text)
+
+def legacy_extract_context(text, keyword, context_length=200):
+    """Попередній AsyncPartnerSiteAnalyzer._extract_context (шукав слово заново)"""
+    match = re.compile(re.escape(keyword), re.IGNORECASE).search(text)
+    if not match:
+        return ""
+    
+    start = max(0, match.start() - context_length)
+    end = min(len(text), match.end() + context_length)
+    context = text[start:end].strip()
+    
+    words = context.split()
+    if len(words) > 40:
+        context = ' '.join(words[:40]) + "..."
+    return f"...{context}..."
+
+SNIPPET_CASES = [
+    # Слово на початку та в кінці тексту, текст коротший за контекст
+    ('samsung', 'Samsung на початку тексту'),
+    ('samsung', 'текст закінчується словом SAMSUNG'),
+    ('samsung', 'samsung'),
+    ('samsung', '   samsung   '),
+    # Межі контексту всередині довгого тексту, пробіли на межі вирізаються
+    ('samsung', 'x' * 300 + ' samsung ' + 'y' * 300),
+    ('samsung', ' ' * 199 + 'a samsung b' + ' ' * 199 + 'c'),
+    # Багатобайтові символи: позиції - у символах, а не байтах
+    ('київ', 'Місто ' * 60 + 'КИЇВ 🇺🇦 ' + 'дуже гарне ' * 60),
+    ('galaxy', '日本語のテキスト' * 40 + ' Galaxy ' + '😀' * 250),
+    ('ґанок', 'Ґанок' + '\u0301' * 10 + ' ї' * 150),
+    # Обмеження в 40 слів (рівно 40 слів - без обрізання)
+    ('samsung', ' '.join(['слово'] * 20 + ['samsung'] + ['слово'] * 19)),
+    ('samsung', ' '.join(['слово'] * 20 + ['samsung'] + ['слово'] * 20)),
+    ('samsung', 'a\tb\n' * 50 + 'samsung' + '\n c' * 50),
+]
+
+@pytest.mark.parametrize('keyword, text', SNIPPET_CASES)
+def test_snippet_matches_legacy_context(keyword, text):
+    (start, end), *_ = KeywordMatcher([keyword]).find_all(text)[keyword]
+    
+    assert extract_snippet(text, start, end, 200) == legacy_extract_context(text, keyword, 200)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тести обмеженого кешу в пам'яті (shared.memory_cache.BoundedCache)
+"""
+
+from shared.memory_cache import BoundedCache
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def make_cache(max_bytes=1000, max_entries=0, on_spill=None):
+    clock = Clock()
+    cache = BoundedCache(max_bytes, max_entries, on_spill=on_spill, sizeof=len, clock=clock)
+    return cache, clock
+
+def test_least_recently_used_is_evicted_first():
+    cache, clock = make_cache(max_entries=2)
+    cache.set('a', 'x', ttl=60)
+    cache.set('b', 'x', ttl=60)
+    assert cache.get('a') == 'x'
+    
+    cache.set('c', 'x', ttl=60)
+    
+    assert cache.get('b') is None
+    assert cache.get('a') == 'x' and cache.get('c') == 'x'
+    assert cache.stats()['evictions'] == 1
+
+def test_byte_budget_evicts_until_it_fits():
+    cache, clock = make_cache(max_bytes=10)
+    cache.set('a', 'aaaa', ttl=60)
+    cache.set('b', 'bbbb', ttl=60)
+    cache.set('c', 'cccccc', ttl=60)
+    
+    assert cache.get('a') is None
+    assert cache.get('b') == 'bbbb' and cache.get('c') == 'cccccc'
+    assert cache.bytes == 10
+    
+    cache.set('c', 'cc', ttl=60)
+    assert cache.bytes == 6
+
+def test_entry_expires_after_its_own_ttl():
+    cache, clock = make_cache()
+    cache.set('short', 'x', ttl=1)
+    cache.set('long', 'x', ttl=10)
+    
+    clock.now = 5
+    assert cache.get('short') is None
+    assert cache.get('long') == 'x'
+    
+    clock.now = 11
+    assert cache.get('long') is None
+    assert cache.stats()['expirations'] == 2
+
+def test_set_expires_without_touching_live_entries():
+    cache, clock = make_cache()
+    cache.set('old', 'x', ttl=1)
+    cache.set('live', 'x', ttl=100)
+    # Заміна лишає в купі застарілий строк, який не має видалити новий запис
+    cache.set('live', 'y', ttl=1)
+    cache.set('live', 'z', ttl=100)
+    
+    clock.now = 2
+    cache.set('new', 'x', ttl=100)
+    
+    assert len(cache) == 2
+    assert cache.get('live') == 'z'
+    assert cache.stats()['expirations'] == 1
+    assert cache.bytes == 2
+
+def test_expiry_heap_is_compacted():
+    cache, clock = make_cache()
+    for i in range(1000):
+        cache.set('key', str(i), ttl=100)
+    
+    assert len(cache._expiry) <= 2 * len(cache) + 65
+
+def test_spill_entries_are_handed_over_on_eviction_and_expiry():
+    spilled = []
+    cache, clock = make_cache(max_entries=1, on_spill=lambda key, value: spilled.append((key, value)))
+    cache.set('kept', 'x', ttl=1, spill=True)
+    cache.set('plain', 'y', ttl=1)
+    
+    assert spilled == [('kept', 'x')]
+    
+    cache.set('expiring', 'z', ttl=1, spill=True)
+    clock.now = 2
+    cache.set('other', 'w', ttl=1)
+    
+    assert spilled == [('kept', 'x'), ('expiring', 'z')]
+    assert cache.stats()['spilled'] == 2
+
+def test_pop_does_not_spill():
+    spilled = []
+    cache, clock = make_cache(on_spill=lambda key, value: spilled.append(key))
+    cache.set('a', 'x', ttl=60, spill=True)
+    
+    assert cache.pop('a') == 'x'
+    assert spilled == [] and cache.bytes == 0
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тести адаптивного ліміту запитів по хостах (shared.rate_limiter.HostRateLimiter)
+"""
+
+import asyncio
+from email.utils import formatdate
+
+import pytest
+
+from shared import rate_limiter
+from shared.rate_limiter import CircuitOpenError, HostRateLimiter, parse_retry_after
+
+URL = 'https://example.com/page'
+NOW = 1_700_000_000.0
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def make_limiter(**kwargs):
+    clock = Clock()
+    options = dict(min_delay=0.1, max_delay=10.0, target_latency=1.0, failure_threshold=3, circuit_cooldown=60.0)
+    options.update(kwargs)
+    return HostRateLimiter(clock=clock, wall_clock=lambda: NOW, **options), clock
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Паузи slot() без реального очікування"""
+    calls = []
+    
+    async def fake_sleep(seconds):
+        calls.append(round(seconds, 3))
+    
+    monkeypatch.setattr(rate_limiter.asyncio, 'sleep', fake_sleep)
+    return calls
+
+def take_slot(limiter):
+    async def request():
+        async with limiter.slot(URL):
+            pass
+    asyncio.run(request())
+
+def interval(limiter):
+    return limiter.host_stats()['example.com']['interval']
+
+def test_slow_responses_increase_and_fast_responses_decrease_interval():
+    limiter, clock = make_limiter()
+    
+    limiter.record_response(URL, 200, latency=5.0)
+    assert interval(limiter) == 0.15
+    
+    for _ in range(20):
+        limiter.record_response(URL, 200, latency=5.0)
+    assert interval(limiter) == 10.0
+    
+    # Середня затримка знижується поступово, тож і інтервал - не одразу
+    limiter.record_response(URL, 200, latency=0.1)
+    assert interval(limiter) == 10.0
+    
+    for _ in range(100):
+        limiter.record_response(URL, 200, latency=0.1)
+    assert interval(limiter) == 0.1
+
+def test_throttle_response_doubles_interval():
+    limiter, clock = make_limiter()
+    
+    limiter.record_response(URL, 429, latency=0.1)
+    assert interval(limiter) == 0.2
+    limiter.record_response(URL, 503, latency=0.1)
+    assert interval(limiter) == 0.4
+    assert limiter.stats['rate_limited_responses'] == 2
+
+def test_requests_are_spaced_by_interval(sleeps):
+    limiter, clock = make_limiter()
+    
+    take_slot(limiter)
+    take_slot(limiter)
+    clock.now = 1.0
+    take_slot(limiter)
+    
+    assert sleeps == [0.1]
+
+def test_retry_after_seconds_delays_next_request(sleeps):
+    limiter, clock = make_limiter()
+    
+    limiter.record_response(URL, 429, latency=0.1, retry_after='5')
+    clock.now = 1.0
+    take_slot(limiter)
+    
+    assert sleeps == [4.0]
+
+def test_retry_after_http_date_delays_next_request(sleeps):
+    limiter, clock = make_limiter()
+    
+    limiter.record_response(URL, 503, latency=0.1, retry_after=formatdate(NOW + 8, usegmt=True))
+    take_slot(limiter)
+    
+    assert sleeps == [8.0]
+
+def test_retry_after_longer_than_max_delay_opens_circuit():
+    limiter, clock = make_limiter()
+    
+    limiter.record_response(URL, 429, latency=0.1, retry_after='30')
+    
+    assert limiter.is_open(URL)
+    clock.now = 31.0
+    assert not limiter.is_open(URL)
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120.0
+    assert parse_retry_after(formatdate(NOW + 90, usegmt=True), NOW) == 90.0
+    assert parse_retry_after(formatdate(NOW - 90, usegmt=True), NOW) == 0.0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+def test_circuit_opens_after_consecutive_failures():
+    limiter, clock = make_limiter()
+    
+    limiter.record_failure(URL)
+    limiter.record_response(URL, 500, latency=0.1)
+    assert not limiter.is_open(URL)
+    
+    limiter.record_failure(URL)
+    assert limiter.is_open(URL)
+    assert limiter.stats['circuit_breaker_opened'] == 1
+    with pytest.raises(CircuitOpenError):
+        take_slot(limiter)
+
+def test_success_resets_failure_count():
+    limiter, clock = make_limiter()
+    
+    for _ in range(5):
+        limiter.record_failure(URL)
+        limiter.record_failure(URL)
+        limiter.record_response(URL, 200, latency=0.1)
+    
+    assert not limiter.is_open(URL)
+
+def test_half_open_circuit_reopens_on_first_failure():
+    limiter, clock = make_limiter()
+    for _ in range(3):
+        limiter.record_failure(URL)
+    
+    clock.now = 61.0
+    assert not limiter.is_open(URL)
+    assert limiter.host_stats()['example.com']['circuit_half_open']
+    
+    limiter.record_failure(URL)
+    assert limiter.is_open(URL)
+    assert limiter.host_stats()['example.com']['circuit_opened'] == 2
+
+def test_half_open_circuit_closes_on_success(sleeps):
+    limiter, clock = make_limiter()
+    for _ in range(3):
+        limiter.record_failure(URL)
+    
+    clock.now = 61.0
+    take_slot(limiter)
+    limiter.record_response(URL, 200, latency=0.1)
+    assert not limiter.host_stats()['example.com']['circuit_half_open']
+    
+    # Закритий хост знову терпить failure_threshold - 1 збоїв
+    limiter.record_failure(URL)
+    limiter.record_failure(URL)
+    assert not limiter.is_open(URL)
+
+def test_failures_of_requests_started_before_opening_do_not_extend_cooldown():
+    limiter, clock = make_limiter()
+    for _ in range(3):
+        limiter.record_failure(URL)
+    
+    clock.now = 30.0
+    limiter.record_failure(URL)
+    
+    clock.now = 61.0
+    assert not limiter.is_open(URL)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тести читання стану задач (shared.task_store.TaskStore)
+"""
+
+import asyncio
+from datetime import datetime
+
+from pydantic import BaseModel
+
+from shared.task_store import TaskStore
+
+class Status(BaseModel):
+    task_id: str
+    status: str
+    started_at: datetime
+
+class Result(BaseModel):
+    task_id: str
+
+class FakeCache:
+    """Redis, у якому задач немає; рахує звернення"""
+    
+    def __init__(self, shared=True):
+        self.reads = 0
+        self.shared = shared
+    
+    def get_cached_task_status(self, task_id):
+        self.reads += 1
+        return None
+    
+    def get_cached_analysis_result(self, task_id):
+        self.reads += 1
+        return None
+    
+    def index_task(self, task_id, started_at):
+        pass
+    
+    def cache_task_status(self, task_id, status, ttl_hours=24):
+        return self.shared
+    
+    def delete_task_state(self, task_id):
+        return False
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def make_store():
+    cache, clock = FakeCache(), Clock()
+    return TaskStore(cache, Status, Result, missing_cache_seconds=1.0, clock=clock), cache, clock
+
+def test_unknown_task_is_negative_cached():
+    store, cache, clock = make_store()
+    
+    assert store.get_status('nope') is None
+    assert store.get_status('nope') is None
+    assert cache.reads == 1
+    
+    clock.now = 2.0
+    assert store.get_status('nope') is None
+    assert cache.reads == 2
+
+def test_created_task_replaces_negative_cache():
+    store, cache, clock = make_store()
+    assert store.get_status('t1') is None
+    
+    store.create(Status(task_id='t1', status='pending', started_at=datetime.now()))
+    store.release('t1')
+    
+    assert store.get_status('t1').status == 'pending'
+
+def test_async_reads_share_negative_cache():
+    store, cache, clock = make_store()
+    
+    async def read_twice():
+        return [await store.get_result_async('nope'), await store.get_result_async('nope')]
+    
+    assert asyncio.run(read_twice()) == [None, None]
+    assert cache.reads == 1
+
+def test_evicted_unshared_status_is_spilled_and_reloaded(tmp_path):
+    # Redis недоступний: статус є лише в пам'яті і при витісненні записується у файл
+    cache = FakeCache(shared=False)
+    store = TaskStore(cache, Status, Result, memory_max_entries=1, spill_dir=str(tmp_path), clock=Clock())
+    for task_id in ('t1', 't2'):
+        store.create(Status(task_id=task_id, status='pending', started_at=datetime.now()))
+        store.release(task_id)
+    
+    assert store.get_status('t1').status == 'pending'
+    store.close()
+    assert len(list(tmp_path.iterdir())) == 2
+    
+    restarted = TaskStore(cache, Status, Result, spill_dir=str(tmp_path), clock=Clock())
+    assert restarted.get_status('t1').task_id == 't1'
+    assert restarted.delete('t1')
+    assert not restarted.delete('t1')
+    assert len(list(tmp_path.iterdir())) == 1
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тести канонізації адрес (shared.utils.canonicalize_url, url_key)
+"""
+
+from shared.utils import canonicalize_url, url_key
+
+def test_listing_pages_after_the_first_stay_separate():
+    assert canonicalize_url('https://shop.ua/catalog/page/7/') == 'https://shop.ua/catalog/page/7'
+    assert url_key('https://shop.ua/catalog/page/2') != url_key('https://shop.ua/catalog')
+
+def test_first_listing_page_collapses_into_listing():
+    assert canonicalize_url('https://shop.ua/catalog/page/1/') == 'https://shop.ua/catalog'
+
+def test_page_like_paths_are_not_mangled():
+    assert canonicalize_url('https://shop.ua/landing/page-404') == 'https://shop.ua/landing/page-404'
+    assert canonicalize_url('https://shop.ua/help/page10') == 'https://shop.ua/help/page10'
+
+def test_url_variants_share_a_key():
+    assert url_key('http://www.shop.ua/catalog/index.html') == url_key('https://shop.ua/catalog/')
+    assert canonicalize_url('HTTPS://Shop.ua:443//catalog//?sort=price#top') == 'https://shop.ua/catalog'